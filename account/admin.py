@@ -2,7 +2,7 @@ from django.contrib import admin
 from django.http import HttpRequest
 from simple_history.admin import SimpleHistoryAdmin
 
-from .models import BankAccount, Profile,  Wallet, BankAccount, Card
+from .models import BankAccount, Profile,  Wallet, BankAccount, Card, LedgerEntry
 
 
 # Register your models here.
@@ -24,12 +24,13 @@ class ProfileAdmin(SimpleHistoryAdmin):
 
 
 class WalletAdmin(SimpleHistoryAdmin):
-    list_display       = ["pin", "user_email", "amount", "total_cards", "maximum_cards", "last_amount_received", "created_on", "modified_on"]
-    list_display_links = ["pin", "user_email"]
-    list_filter        = ["wallet_id"]
-    list_per_page      = 25
-    search_fields      = ["wallet_id", "amount", "maximum_cards", "pin"]
-    readonly_fields    = ["wallet_id", "created_on", "modified_on", "user_email"]
+    list_display        = ["pin", "user_email", "amount", "total_cards", "maximum_cards", "last_amount_received", "created_on", "modified_on"]
+    list_display_links  = ["pin", "user_email"]
+    list_filter         = ["wallet_id"]
+    list_per_page       = 25
+    list_select_related = ["user"]   # `pin` and `user_email` read the user of every row
+    search_fields       = ["wallet_id", "amount", "maximum_cards", "pin"]
+    readonly_fields     = ["wallet_id", "created_on", "modified_on", "user_email"]
 
     def get_readonly_fields(self, request, obj=None):   
         readonly = ["wallet_id", "created_on", "modified_on", "user_email",]
@@ -79,6 +80,7 @@ class BankAdmin(SimpleHistoryAdmin):
     list_display        = ["id", "username", "email", "masked_sort_code", "masked_account_number", "amount", "created_on"]
     list_display_links  = ["id", "username", "email"]
     list_per_page       = 25
+    list_select_related = ["user"]   # `username` and `email` read the user of every row
     search_fields       = ["username", "email"]
 
     def get_fieldsets(self, request, obj=None):
@@ -195,7 +197,26 @@ class CardAdmin(SimpleHistoryAdmin):
         return obj.masked_cvc
 
 
+class LedgerEntryAdmin(admin.ModelAdmin):
+    list_display         = ["id", "transfer_id", "leg", "account_type", "account_id", "amount", "running_balance", "created_on"]
+    list_display_links   = ["id", "transfer_id"]
+    list_per_page        = 25
+    list_filter          = ["leg", "account_type"]
+    search_fields        = ["transfer_id"]
+
+    # The ledger is append-only, entries are only ever written by the TransferService
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
 admin.site.register(Profile, ProfileAdmin)
 admin.site.register(Wallet, WalletAdmin)
 admin.site.register(BankAccount, BankAdmin)
-admin.site.register(Card, CardAdmin)
\ No newline at end of file
+admin.site.register(Card, CardAdmin)
+admin.site.register(LedgerEntry, LedgerEntryAdmin)
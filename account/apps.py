@@ -1,4 +1,6 @@
 from django.apps import AppConfig
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_migrate
 
 
 class AccountConfig(AppConfig):
@@ -6,4 +8,11 @@ class AccountConfig(AppConfig):
     name = 'account'
 
     def ready(self):
-        import account.signals
\ No newline at end of file
+        import account.signals
+        from account.lookup_cache import clear_lookup_cache_after_migrate
+        from account.sharding import prepare_shard_after_migrate
+        from utils.sqlite import apply_sqlite_pragmas
+
+        post_migrate.connect(prepare_shard_after_migrate, sender=self)
+        post_migrate.connect(clear_lookup_cache_after_migrate, sender=self)
+        connection_created.connect(apply_sqlite_pragmas)
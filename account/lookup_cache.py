@@ -0,0 +1,316 @@
+"""
+A read-through cache of the account lookups, e.g. `Wallet.get_by_user`.
+
+The lookups run on most pages, and their rows rarely change apart from
+their balances. So a lookup is answered from the `lookups` cache when it
+can be, and from the database otherwise, which then fills the cache:
+
+    - an entry holds the fields of the row, and of the rows fetched with
+      it by `select_related`, but never the fields in `NEVER_CACHED`. The
+      balances and the card counters are written with an UPDATE, which
+      sends no signal, so an instance built from the cache leaves them
+      deferred and reads them from the database when they are first used.
+      Code moving money therefore always sees the stored balance,
+    - the keys are versioned per user. Saving or deleting a profile, bank
+      account, wallet or card gives its user a new version, straight away
+      and again when the transaction commits, so every entry of that user
+      is ignored from then on, including one filled from a read that
+      raced with the change,
+    - only one process fills a missing entry at a time. The others wait
+      up to `LOOKUP_CACHE_LOCK_WAIT` seconds for it rather than all
+      running the same query when a popular entry expires,
+    - a lookup inside a transaction reads the cache but doesn't fill it,
+      the rows it reads may still be rolled back,
+    - a lookup sent to the read replica doesn't use the cache at all. The
+      replica changes through `sync_replica`, which sends no signal.
+
+The default `lookups` cache is in memory, so with more than one server
+process set `ACCOUNT_LOOKUP_CACHE_BACKEND` to a shared cache, otherwise a
+change made by one process isn't seen by the others until the entry expires.
+
+Bump `LOOKUP_CACHE_VERSION` whenever the cached fields of a model change
+so that entries written by an older release are ignored.
+"""
+
+import time
+from secrets import token_hex
+from typing import Callable, Iterable, Optional
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.base import BaseCache
+from django.db import DEFAULT_DB_ALIAS, models, router, transaction
+
+from .sharding import get_shards, shard_for_user
+
+
+LOOKUP_CACHE_VERSION   = 1
+LOOKUP_CACHE_LOCK_WAIT = 0.5    # seconds a lookup waits for another process to fill the entry
+LOOKUP_CACHE_LOCK_POLL = 0.01   # seconds between two looks at the entry while waiting
+LOOKUP_CACHE_LOCK_TTL  = 5      # seconds before the lock of a process that died while filling an entry expires
+
+# Written with an UPDATE that bypasses the signals, or too sensitive to copy into a cache
+NEVER_CACHED = {
+    "account.bankaccount": ("amount", "modified_on"),
+    "account.wallet":      ("amount", "modified_on", "total_cards"),
+    "account.card":        ("amount", "modified_on", "cvc"),
+}
+
+# Unique fields a lookup can be made by without knowing the user, see `cached_lookup`
+OWNER_LOOKUP_FIELDS = {
+    "account.wallet": ("wallet_id",),
+}
+
+
+def get_lookup_cache() -> BaseCache:
+    return caches[getattr(settings, "ACCOUNT_LOOKUP_CACHE_ALIAS", "lookups")]
+
+
+def get_user_version_key(user_id: int) -> str:
+    return f"account-lookup:v{LOOKUP_CACHE_VERSION}:user:{user_id}"
+
+
+def get_owner_cache_key(model, field_name: str, value) -> str:
+    return f"account-lookup:v{LOOKUP_CACHE_VERSION}:owner:{model._meta.label_lower}:{field_name}:{value}"
+
+
+def get_lookup_cache_key(model, field_name: str, value, user_id: int, user_version: str) -> str:
+    return (f"account-lookup:v{LOOKUP_CACHE_VERSION}:{user_id}.{user_version}:"
+            f"{model._meta.label_lower}:{field_name}:{value}")
+
+
+def cached_lookup(model,
+                  field_name: str,
+                  value,
+                  load: Callable[[], Optional[models.Model]],
+                  user_id: Optional[int] = None,
+                  related: Iterable[str] = (),
+                  ) -> Optional[models.Model]:
+    """
+    Return the instance `load` returns, from the cache when it holds it.
+
+    Example usage:
+
+        wallet = cached_lookup(Wallet, "user", user.pk,
+                               lambda: Wallet.objects.select_related("bank_account").get(user=user),
+                               user_id=user.pk,
+                               related=["bank_account"],
+                               )
+        wallet.bank_account.sort_code   # from the cache
+        wallet.amount                   # read from the database
+
+    Args:
+        model: The model `load` returns an instance of.
+        field_name (str): The name of the lookup, part of the cache key.
+        value: The value looked up, part of the cache key.
+        load (Callable): Runs the query, returning the instance or None. A
+                         `DoesNotExist` it raises is taken as None.
+        user_id (int): The user owning the row. When None, the user is found
+                       through `OWNER_LOOKUP_FIELDS`, and the lookup isn't
+                       cached if `field_name` isn't one of them.
+        related (Iterable[str]): The forward relations `load` fetches with
+                                 `select_related`, cached along with the row.
+
+    Returns:
+        The instance, or None if there is no such row.
+    """
+    timeout = getattr(settings, "ACCOUNT_LOOKUP_CACHE_TIMEOUT", 5 * 60)
+    related = list(related)
+
+    if not timeout or value is None or not _reads_the_primary(model):
+        return _load(model, load)
+
+    cache = get_lookup_cache()
+
+    if user_id is None:
+        if field_name not in OWNER_LOOKUP_FIELDS.get(model._meta.label_lower, ()):
+            return _load(model, load)
+
+        owner_key = get_owner_cache_key(model, field_name, value)
+        user_id   = cache.get(owner_key)
+        if user_id is None:
+            instance = _load(model, load)
+            if instance is not None and _can_fill(instance.user_id):
+                cache.set(owner_key, instance.user_id, timeout=timeout)
+                cache.set(_get_key(cache, model, field_name, value, instance.user_id),
+                          _to_entry(instance, related),
+                          timeout=timeout,
+                          )
+            return instance
+
+    key   = _get_key(cache, model, field_name, value, user_id)
+    entry = cache.get(key)
+
+    if entry is None:
+        entry, instance = _fill(cache, key, timeout, lambda: _load(model, load), related, _can_fill(user_id))
+        if entry is None:
+            # loaded here, with every field
+            return instance
+    return _from_entry(model, entry, shard_for_user(user_id))
+
+
+def invalidate_account_lookups(instance: models.Model, using: str = None) -> None:
+    """
+    Make the cache forget every lookup of the users owning `instance`.
+
+    Called by the post_save/post_delete signals of the cached models. The
+    users are invalidated now, so the rest of the transaction doesn't read
+    the old rows, and again when it commits, in case another request filled
+    the cache with the old rows in between.
+    """
+    cache      = get_lookup_cache()
+    user_ids   = _get_owner_ids(instance, using)
+    owner_keys = [get_owner_cache_key(type(instance), name, value)
+                  for name in OWNER_LOOKUP_FIELDS.get(instance._meta.label_lower, ())
+                  for value in _get_current_and_saved_values(instance, name)
+                  ]
+
+    def invalidate() -> None:
+        cache.set_many({get_user_version_key(user_id): token_hex(8) for user_id in user_ids}, timeout=None)
+        cache.delete_many(owner_keys)
+
+    invalidate()
+    if transaction.get_connection(using).in_atomic_block:
+        transaction.on_commit(invalidate, using=using)
+
+
+def clear_lookup_cache_after_migrate(sender, **kwargs):
+    """`post_migrate` handler, a migration or a `flush` changes rows without sending their signals"""
+    get_lookup_cache().clear()
+
+
+def _load(model, load: Callable[[], Optional[models.Model]]) -> Optional[models.Model]:
+    try:
+        return load()
+    except model.DoesNotExist:
+        return None
+
+
+def _reads_the_primary(model) -> bool:
+    # a sharded lookup always goes to the shard of its user
+    return bool(get_shards()) or router.db_for_read(model) == DEFAULT_DB_ALIAS
+
+
+def _can_fill(user_id: int) -> bool:
+    # rows read inside a transaction may be rolled back
+    return not transaction.get_connection(shard_for_user(user_id)).in_atomic_block
+
+
+def _get_key(cache: BaseCache, model, field_name: str, value, user_id: int) -> str:
+    version_key = get_user_version_key(user_id)
+    version     = cache.get(version_key)
+
+    if version is None:
+        # `add`, so that two processes starting a user's version agree on it
+        cache.add(version_key, token_hex(8), timeout=None)
+        version = cache.get(version_key)
+    return get_lookup_cache_key(model, field_name, value, user_id, version)
+
+
+def _fill(cache: BaseCache,
+          key: str,
+          timeout: int,
+          load: Callable[[], Optional[models.Model]],
+          related: list[str],
+          can_fill: bool,
+          ) -> tuple[Optional[dict], Optional[models.Model]]:
+    """
+    Load the instance for `key` and cache it, or wait for the process already doing so.
+
+    Returns `(None, instance)` when the instance was loaded here, or
+    `(entry, None)` when another process cached the entry in the meantime.
+    """
+    if not can_fill:
+        return None, load()
+
+    lock_key = f"{key}:lock"
+    if cache.add(lock_key, 1, timeout=LOOKUP_CACHE_LOCK_TTL):
+        try:
+            instance = load()
+            cache.set(key, _to_entry(instance, related), timeout=timeout)
+            return None, instance
+        finally:
+            cache.delete(lock_key)
+
+    deadline = time.monotonic() + LOOKUP_CACHE_LOCK_WAIT
+    while time.monotonic() < deadline:
+        time.sleep(LOOKUP_CACHE_LOCK_POLL)
+        entry = cache.get(key)
+        if entry is not None:
+            return entry, None
+
+    # the other process is slow or gone, don't wait any longer
+    return None, load()
+
+
+def _to_entry(instance: Optional[models.Model], related: list[str]) -> dict:
+    if instance is None:
+        return {"fields": None, "related": {}}
+
+    return {"fields": _get_cached_values(instance),
+            "related": {name: _get_cached_values(getattr(instance, name)) for name in related},
+            }
+
+
+def _from_entry(model, entry: dict, db: str) -> Optional[models.Model]:
+    if entry["fields"] is None:
+        return None
+
+    instance = _from_values(model, entry["fields"], db)
+    for name, values in entry["related"].items():
+        field = model._meta.get_field(name)
+        field.set_cached_value(instance, _from_values(field.related_model, values, db))
+    return instance
+
+
+def _get_cached_values(instance: Optional[models.Model]) -> Optional[dict]:
+    if instance is None:
+        return None
+
+    never_cached = NEVER_CACHED.get(instance._meta.label_lower, ())
+    # in the order of the concrete fields, which `from_db` expects
+    return {field.attname: instance.__dict__[field.attname]
+            for field in instance._meta.concrete_fields
+            if field.attname in instance.__dict__ and field.name not in never_cached
+            }
+
+
+def _from_values(model, values: Optional[dict], db: str) -> Optional[models.Model]:
+    if values is None:
+        return None
+    # the fields left out are deferred, and loaded from `db` when they are first used
+    return model.from_db(db, list(values), list(values.values()))
+
+
+def _get_current_and_saved_values(instance: models.Model, attname: str) -> set:
+    saved  = instance.__dict__.get("_saved_field_values", {})
+    values = {instance.__dict__.get(attname), saved.get(attname)}
+    values.discard(None)
+    return values
+
+
+def _get_owner_ids(instance: models.Model, using: str = None) -> set:
+    """
+    Returns the ids of the users owning `instance`, before and after the change.
+
+    A card has no user of its own, it belongs to the user of its wallet or bank account.
+    """
+    if hasattr(instance, "user_id"):
+        return _get_current_and_saved_values(instance, "user_id")
+
+    user_ids = set()
+    for name in ("wallet", "bank_account"):
+        field = instance._meta.get_field(name)
+        pks   = _get_current_and_saved_values(instance, field.attname)
+        if name == "wallet" and getattr(instance, "_loaded_wallet_id", None) is not None:
+            pks.add(instance._loaded_wallet_id)
+
+        related = field.get_cached_value(instance, default=None)
+        if related is not None and related.pk in pks:
+            pks.discard(related.pk)
+            user_ids.add(related.user_id)
+        if pks:
+            user_ids.update(field.related_model._base_manager.using(using)
+                                                            .filter(pk__in=pks)
+                                                            .values_list("user_id", flat=True))
+    return user_ids
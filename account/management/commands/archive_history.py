@@ -0,0 +1,56 @@
+import time
+from datetime import timedelta
+
+from django.apps import apps
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from utils.history_archive import archive_history, get_archive_dir, get_historical_models
+
+
+class Command(BaseCommand):
+    help = (
+        "Move history rows older than a cutoff into gzipped, day-partitioned JSON Lines files and delete "
+        "them from the database in batches. Read them back with utils.history_archive.read_history_archive."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--older-than-days", type=int, default=getattr(settings, "HISTORY_ARCHIVE_AFTER_DAYS", 365),
+                            help="Archive history rows older than this many days")
+        parser.add_argument("--model", action="append", dest="models", default=[],
+                            help="Only archive the history of this model, e.g. account.Wallet. Can be repeated")
+        parser.add_argument("--archive-dir", default=None, help="Defaults to the HISTORY_ARCHIVE_DIR setting")
+        parser.add_argument("--batch-size", type=int, default=5000, help="Rows written and deleted per transaction")
+        parser.add_argument("--chunk-size", type=int, default=1000, help="Rows fetched from the database at a time")
+
+    def handle(self, *args, **options):
+        before      = timezone.now() - timedelta(days=options["older_than_days"])
+        archive_dir = options["archive_dir"] or get_archive_dir()
+        models      = [self._get_model(label) for label in options["models"]] or get_historical_models()
+        start       = time.perf_counter()
+        total       = 0
+
+        self.stdout.write(f"Archiving history older than {before:%Y-%m-%d %H:%M} UTC into {archive_dir}")
+
+        for model in models:
+            result = archive_history(model,
+                                     before=before,
+                                     archive_dir=archive_dir,
+                                     batch_size=options["batch_size"],
+                                     chunk_size=options["chunk_size"],
+                                     )
+            total += result.archived
+            self.stdout.write(f"{result.model:<35} : {result.archived:,} row(s) into {result.files:,} file(s)")
+
+        self.stdout.write(self.style.SUCCESS(f"Archived {total:,} history row(s) in {time.perf_counter() - start:.3f}s"))
+
+    def _get_model(self, label: str):
+        try:
+            model = apps.get_model(label)
+        except (LookupError, ValueError):
+            raise CommandError(f"Unknown model '{label}'")
+
+        if not hasattr(model, "history") and model not in get_historical_models():
+            raise CommandError(f"'{label}' has no history")
+        return model
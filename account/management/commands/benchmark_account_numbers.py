@@ -0,0 +1,54 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from account.models import BankAccount
+from account.utils.allocators import account_number_allocator, sort_code_allocator
+from authentication.models import User
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark onboarding bank accounts with block-allocated account numbers and sort codes. "
+        "All rows created by the benchmark are rolled back when it finishes."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--accounts", type=int, default=100_000, help="Number of bank accounts to create")
+        parser.add_argument("--batch-size", type=int, default=1000, help="Rows per INSERT statement")
+
+    def handle(self, *args, **options):
+        num_of_accounts = options["accounts"]
+        batch_size      = options["batch_size"]
+
+        with transaction.atomic():
+            users = User.objects.bulk_create(
+                (User(username=f"benchmark-{i}", email=f"benchmark-{i}@example.com", first_name="Bench", surname="Mark")
+                 for i in range(num_of_accounts)),
+                batch_size=batch_size,
+            )
+
+            start           = time.perf_counter()
+            account_numbers = account_number_allocator.allocate_many(num_of_accounts)
+            sort_codes      = sort_code_allocator.allocate_many(num_of_accounts)
+            allocated       = time.perf_counter() - start
+
+            BankAccount.objects.bulk_create(
+                (BankAccount(user=user, account_number=account_number, sort_code=sort_code)
+                 for user, account_number, sort_code in zip(users, account_numbers, sort_codes)),
+                batch_size=batch_size,
+            )
+            elapsed = time.perf_counter() - start
+
+            transaction.set_rollback(True)
+
+        account_number_allocator.reset()
+        sort_code_allocator.reset()
+
+        duplicates = (num_of_accounts - len(set(account_numbers))) + (num_of_accounts - len(set(sort_codes)))
+
+        self.stdout.write(f"Accounts created  : {num_of_accounts:,}")
+        self.stdout.write(f"Duplicate numbers : {duplicates}")
+        self.stdout.write(f"Allocation        : {allocated:.3f}s ({num_of_accounts / allocated:,.0f} accounts/s)")
+        self.stdout.write(self.style.SUCCESS(f"Allocate + insert : {elapsed:.3f}s ({num_of_accounts / elapsed:,.0f} accounts/s)"))
@@ -0,0 +1,98 @@
+import time
+from datetime import datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from random import Random
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from account.models import BankAccount, LedgerEntry
+from authentication.models import User
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare computing the month-end balance of every bank account by walking its history in Python "
+        "with BankAccount.balances_at. All rows created by the benchmark are rolled back when it finishes."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--accounts", type=int, default=5000, help="Number of bank accounts")
+        parser.add_argument("--changes", type=int, default=60, help="Balance changes per account, half saves and half postings")
+        parser.add_argument("--seed", type=int, default=0)
+
+    def handle(self, *args, **options):
+        num_of_accounts = options["accounts"]
+        num_of_changes  = options["changes"]
+        start_date      = datetime(2024, 1, 1, tzinfo=dt_timezone.utc)
+        month_end       = start_date + timedelta(days=180)
+
+        with transaction.atomic():
+            self.stdout.write(f"Writing {num_of_accounts * num_of_changes:,} history rows and ledger entries...")
+            accounts = self._create_accounts(num_of_accounts, num_of_changes, start_date, Random(options["seed"]))
+
+            start    = time.perf_counter()
+            expected = {account.pk: self._balance_at_by_walking_history(account, month_end) for account in accounts}
+            walking  = time.perf_counter() - start
+
+            start    = time.perf_counter()
+            balances = BankAccount.balances_at(timestamp=month_end)
+            querying = time.perf_counter() - start
+
+            transaction.set_rollback(True)
+
+        if {pk: balances.get(pk) for pk in expected} != expected:
+            self.stderr.write(self.style.ERROR("The two methods returned different balances"))
+
+        self.stdout.write(f"Accounts        : {num_of_accounts:,}, {num_of_changes} balance changes each")
+        self.stdout.write(f"Walking history : {walking:.3f}s")
+        self.stdout.write(f"balances_at     : {querying:.3f}s")
+        self.stdout.write(self.style.SUCCESS(f"{walking / querying:.1f}x faster, "
+                                             f"{num_of_accounts / querying:,.0f} month-end balances/s"))
+
+    def _balance_at_by_walking_history(self, account: BankAccount, timestamp: datetime):
+        # how support answered it until now: every change of the account, newest first, in Python
+        changes = [(row.history_date, row.amount) for row in account.history.all()]
+        changes += [(entry.created_on, entry.running_balance) for entry in LedgerEntry.get_by_account(account)]
+
+        past = [change for change in changes if change[0] <= timestamp]
+        return max(past, key=lambda change: change[0])[1] if past else None
+
+    def _create_accounts(self, num_of_accounts: int, num_of_changes: int, start_date: datetime, random: Random) -> list:
+        users = User.objects.bulk_create(
+            User(username=f"benchmark-{i}", email=f"benchmark-{i}@example.com", first_name="Bench", surname="Mark")
+            for i in range(num_of_accounts)
+        )
+        accounts = BankAccount.objects.bulk_create(
+            BankAccount(bank_id=f"benchmark-{i}", sort_code=f"B{i:06}", account_number=f"B{i:08}", user=user)
+            for i, user in enumerate(users)
+        )
+
+        history = []
+        ledger  = []
+        for account in accounts:
+            for change in range(num_of_changes):
+                # spread over a year, so about half of the changes come after the month end that is queried
+                changed_on = start_date + timedelta(days=change * 365 / num_of_changes, seconds=random.randint(0, 3600))
+                amount     = Decimal(random.randint(0, 100000)) / 100
+
+                if change % 2:
+                    ledger.append(LedgerEntry(transfer_id=f"benchmark-{account.pk}-{change}",
+                                              leg=LedgerEntry.Leg.CREDIT,
+                                              account_type=LedgerEntry.AccountType.BANK_ACCOUNT,
+                                              account_id=account.pk,
+                                              amount=1,
+                                              running_balance=amount,
+                                              created_on=changed_on,
+                                              ))
+                else:
+                    account.amount = amount
+                    history.append(BankAccount.history.model(history_date=changed_on,
+                                                             history_type="~",
+                                                             **{field.attname: getattr(account, field.attname)
+                                                                for field in BankAccount._meta.concrete_fields},
+                                                             ))
+
+        BankAccount.history.model.objects.bulk_create(history, batch_size=5000)
+        LedgerEntry.objects.bulk_create(ledger, batch_size=5000)
+        return accounts
@@ -0,0 +1,63 @@
+import time
+from random import Random
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from account.models import BankAccount, Wallet, TransferService, TransferInstruction
+from authentication.models import User
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark TransferService.bulk_transfer against the configured database. "
+        "All rows created by the benchmark are rolled back when it finishes."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--transfers", type=int, default=20000, help="Number of transfers to post")
+        parser.add_argument("--accounts", type=int, default=1000, help="Number of bank accounts and wallets to spread them over")
+        parser.add_argument("--batch-size", type=int, default=500, help="Rows per INSERT/UPDATE statement")
+        parser.add_argument("--seed", type=int, default=0)
+
+    def handle(self, *args, **options):
+        num_of_transfers = options["transfers"]
+        num_of_accounts  = options["accounts"]
+        random           = Random(options["seed"])
+
+        with transaction.atomic():
+            bank_accounts, wallets = self._create_accounts(num_of_accounts)
+
+            instructions = []
+            for _ in range(num_of_transfers):
+                bank_account = random.choice(bank_accounts)
+                wallet       = random.choice(wallets)
+                source, target = (bank_account, wallet) if random.random() < 0.5 else (wallet, bank_account)
+                instructions.append(TransferInstruction(source, target, random.randint(1, 100)))
+
+            start   = time.perf_counter()
+            results = TransferService.bulk_transfer(instructions, batch_size=options["batch_size"])
+            elapsed = time.perf_counter() - start
+
+            transaction.set_rollback(True)
+
+        accepted = sum(result.success for result in results)
+        self.stdout.write(f"Transfers posted : {num_of_transfers} ({accepted} accepted, {num_of_transfers - accepted} rejected)")
+        self.stdout.write(f"Accounts         : {num_of_accounts} bank accounts, {num_of_accounts} wallets")
+        self.stdout.write(f"Elapsed          : {elapsed:.3f}s")
+        self.stdout.write(self.style.SUCCESS(f"Throughput       : {num_of_transfers / elapsed:,.0f} transfers/s"))
+
+    def _create_accounts(self, num_of_accounts):
+        users = User.objects.bulk_create(
+            User(username=f"benchmark-{i}", email=f"benchmark-{i}@example.com", first_name="Bench", surname="Mark")
+            for i in range(num_of_accounts)
+        )
+        bank_accounts = BankAccount.objects.bulk_create(
+            BankAccount(bank_id=f"benchmark-{i}", sort_code=f"B{i:06}", account_number=f"B{i:08}", amount=10000, user=user)
+            for i, user in enumerate(users)
+        )
+        wallets = Wallet.objects.bulk_create(
+            Wallet(wallet_id=f"benchmark-{i}", amount=10000, user=user, bank_account=bank_account)
+            for i, (user, bank_account) in enumerate(zip(users, bank_accounts))
+        )
+        return bank_accounts, wallets
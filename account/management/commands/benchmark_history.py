@@ -0,0 +1,130 @@
+import time
+from random import Random
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import override_settings
+
+from account.models import BankAccount, Wallet
+from authentication.models import User
+from utils.history import batch_history
+
+
+HISTORY_MODELS = [User, BankAccount, Wallet]
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare the history rows and INSERT statements written by a mix of saves with the history "
+        "policies switched off and on. The saves are made in committed transactions, like requests or "
+        "admin actions would be, so the rows created by the benchmark are deleted again when it finishes."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=2000, help="Number of requests per run")
+        parser.add_argument("--requests-per-transaction", type=int, default=1,
+                            help="Requests handled in the same transaction, e.g. by a bulk admin action")
+        parser.add_argument("--accounts", type=int, default=200, help="Number of users with a bank account and wallet")
+        parser.add_argument("--seed", type=int, default=0)
+
+    def handle(self, *args, **options):
+        num_of_requests = options["requests"]
+        per_transaction = options["requests_per_transaction"]
+        runs            = [
+            ("before", {"HISTORY_SKIP_UNCHANGED": False, "HISTORY_BATCH_WRITES": False}),
+            ("after", {"HISTORY_SKIP_UNCHANGED": True, "HISTORY_BATCH_WRITES": True}),
+        ]
+
+        results = []
+        for name, policy in runs:
+            users = self._create_accounts(name, options["accounts"])
+            try:
+                with override_settings(**policy):
+                    results.append((name, *self._run(users, num_of_requests, per_transaction, Random(options["seed"]))))
+            finally:
+                self._delete_accounts(users)
+
+        self.stdout.write(f"Requests per run : {num_of_requests:,}, {per_transaction} per transaction")
+        for name, rows, inserts, elapsed in results:
+            self.stdout.write(f"{name:<6} : {rows:,} history rows in {inserts:,} INSERTs, "
+                              f"{rows / num_of_requests:.2f} rows per request, {elapsed:.3f}s")
+
+        (_, old_rows, old_inserts, old_elapsed), (_, new_rows, new_inserts, new_elapsed) = results
+        self.stdout.write(self.style.SUCCESS(f"History rows {old_rows / max(new_rows, 1):.1f}x fewer, "
+                                             f"INSERTs {old_inserts / max(new_inserts, 1):.1f}x fewer, "
+                                             f"elapsed {old_elapsed / new_elapsed:.1f}x lower"))
+
+    def _run(self, users: list, num_of_requests: int, per_transaction: int, random: Random):
+        history_count = self._count_history(users)
+        inserts       = []
+
+        def count_history_inserts(execute, sql, params, many, context):
+            if sql.startswith("INSERT INTO") and "historical" in sql.split("(", 1)[0]:
+                inserts.append(sql)
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(count_history_inserts):
+            start = time.perf_counter()
+            for first in range(0, num_of_requests, per_transaction):
+                with batch_history():
+                    for _ in range(min(per_transaction, num_of_requests - first)):
+                        self._handle_request(random.choice(users), random)
+            elapsed = time.perf_counter() - start
+
+        return self._count_history(users) - history_count, len(inserts), elapsed
+
+    def _handle_request(self, user: User, random: Random) -> None:
+        wallet       = Wallet.objects.select_related("bank_account", "user").get(user=user)
+        bank_account = wallet.bank_account
+        choice       = random.random()
+
+        if choice < 0.4:
+            # a settings form saved without changes
+            wallet.user.save(update_fields=["first_name", "surname"])
+            bank_account.save(update_fields=["sort_code", "account_number"])
+        elif choice < 0.7:
+            # a card was issued or cancelled, only the wallet's card counter changes
+            wallet.total_cards = random.randint(0, wallet.maximum_cards)
+            wallet.save(update_fields=["total_cards"])
+        else:
+            # a real change that has to be recorded, together with the usual unchanged saves around it
+            wallet.maximum_cards = random.randint(1, 5)
+            wallet.save()
+            bank_account.save(update_fields=["sort_code", "account_number"])
+            wallet.user.save(update_fields=["first_name", "surname"])
+
+    def _create_accounts(self, name: str, num_of_accounts: int) -> list:
+        with transaction.atomic():
+            users = User.objects.bulk_create(
+                User(username=f"benchmark-{name}-{i}", email=f"benchmark-{name}-{i}@example.com", first_name="Bench", surname="Mark")
+                for i in range(num_of_accounts)
+            )
+            bank_accounts = BankAccount.objects.bulk_create(
+                BankAccount(bank_id=f"benchmark-{name}-{i}", sort_code=f"B{i:06}", account_number=f"B{i:08}", user=user)
+                for i, user in enumerate(users)
+            )
+            Wallet.objects.bulk_create(
+                Wallet(wallet_id=f"benchmark-{name}-{i}", user=user, bank_account=bank_account)
+                for i, (user, bank_account) in enumerate(zip(users, bank_accounts))
+            )
+        return users
+
+    def _delete_accounts(self, users: list) -> None:
+        user_ids = [user.pk for user in users]
+
+        with transaction.atomic():
+            Wallet.objects.filter(user_id__in=user_ids).delete()
+            BankAccount.objects.filter(user_id__in=user_ids).delete()
+            User.objects.filter(pk__in=user_ids).delete()
+
+        for model in HISTORY_MODELS:
+            self._history_of(model, user_ids).delete()
+
+    def _count_history(self, users: list) -> int:
+        user_ids = [user.pk for user in users]
+        return sum(self._history_of(model, user_ids).count() for model in HISTORY_MODELS)
+
+    def _history_of(self, model, user_ids: list):
+        if model is User:
+            return model.history.filter(id__in=user_ids)
+        return model.history.filter(user_id__in=user_ids)
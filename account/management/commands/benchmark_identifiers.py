@@ -0,0 +1,69 @@
+import time
+from secrets import token_hex
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from utils.fields import TimeOrderedIdField
+from utils.generator import generate_time_ordered_id
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare insert throughput and unique index size of 64-character token_hex() "
+        "identifiers against 16-byte time-ordered ones. The benchmark tables are "
+        "created and dropped inside a transaction that is rolled back when it finishes."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=1_000_000, help="Number of identifiers inserted into each table")
+        parser.add_argument("--batch-size", type=int, default=10_000, help="Rows per INSERT statement")
+
+    def handle(self, *args, **options):
+        if connection.vendor not in ("sqlite", "postgresql"):
+            raise CommandError("Index sizes can only be measured on SQLite or PostgreSQL")
+
+        num_of_rows = options["rows"]
+        batch_size  = options["batch_size"]
+        compact     = TimeOrderedIdField()
+
+        candidates = [
+            ("token_hex()", "varchar(64)", lambda: token_hex()),
+            ("time-ordered", compact.db_type(connection), lambda: compact.get_db_prep_value(generate_time_ordered_id(), connection)),
+        ]
+
+        results = []
+        with transaction.atomic():
+            with connection.cursor() as cursor:
+                for i, (name, column_type, generate) in enumerate(candidates):
+                    table = f"benchmark_identifier_{i}"
+                    cursor.execute(f"CREATE TABLE {table} (identifier {column_type} NOT NULL)")
+                    cursor.execute(f"CREATE UNIQUE INDEX {table}_idx ON {table} (identifier)")
+
+                    # generated up front so only the database work is timed
+                    rows = [(generate(),) for _ in range(num_of_rows)]
+
+                    start = time.perf_counter()
+                    for offset in range(0, num_of_rows, batch_size):
+                        cursor.executemany(f"INSERT INTO {table} (identifier) VALUES (%s)", rows[offset:offset + batch_size])
+                    elapsed = time.perf_counter() - start
+
+                    results.append((name, num_of_rows / elapsed, self._get_index_size(cursor, f"{table}_idx")))
+
+            transaction.set_rollback(True)
+
+        self.stdout.write(f"Rows per table : {num_of_rows:,}")
+        for name, throughput, index_size in results:
+            self.stdout.write(f"{name:<13}: {throughput:>12,.0f} inserts/s, index {index_size / 1024 / 1024:,.1f} MiB")
+
+        (_, old_throughput, old_size), (_, new_throughput, new_size) = results
+        self.stdout.write(self.style.SUCCESS(f"Time-ordered identifiers: {new_throughput / old_throughput:.2f}x insert throughput, "
+                                             f"{new_size / old_size:.0%} of the index size"))
+
+    def _get_index_size(self, cursor, index_name: str) -> int:
+        if connection.vendor == "postgresql":
+            cursor.execute("SELECT pg_relation_size(%s::regclass)", [index_name])
+        else:
+            # needs SQLite built with SQLITE_ENABLE_DBSTAT_VTAB, which the Python builds are
+            cursor.execute("SELECT SUM(pgsize) FROM dbstat WHERE name = %s", [index_name])
+        return cursor.fetchone()[0] or 0
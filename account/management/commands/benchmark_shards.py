@@ -0,0 +1,147 @@
+import multiprocessing
+import tempfile
+import time
+from pathlib import Path
+from random import Random
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.db.models import F
+from django.test.utils import override_settings
+
+from account.models import BankAccount, Wallet
+from account.sharding import prepare_shard, shard_for_user
+from utils.db_router import sync_replica
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure the write throughput of the account data split over 1, 2, 4... SQLite shards. Writer processes "
+        "move money between the wallet and bank account of random users, one committed transaction each, "
+        "so they only wait for each other when they write to the same file. The shards are temporary files, "
+        "the configured databases aren't touched."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--shards", default="1,2,4", help="Comma separated shard counts to compare")
+        parser.add_argument("--writers", type=int, default=4, help="Number of concurrent writer processes")
+        parser.add_argument("--transactions", type=int, default=2000, help="Transactions per run, over all writers")
+        parser.add_argument("--users", type=int, default=1000, help="Number of users with a bank account and wallet")
+        parser.add_argument("--hold-ms", type=float, default=2.0,
+                            help="How long a transaction keeps its write lock after its first write, standing in for "
+                                 "the rest of the request's work or a slower disk. 0 measures the ORM alone")
+        parser.add_argument("--seed", type=int, default=0)
+
+    def handle(self, *args, **options):
+        try:
+            shard_counts = [int(count) for count in options["shards"].split(",")]
+        except ValueError:
+            raise CommandError(f"--shards must be comma separated numbers, got '{options['shards']}'")
+
+        aliases = []
+        results = []
+
+        with tempfile.TemporaryDirectory() as directory:
+            try:
+                template = self._add_database("benchmark_template", Path(directory), aliases)
+                with override_settings(ACCOUNT_SHARDS=[template]):
+                    call_command("migrate", database=template, verbosity=0)
+
+                for count in shard_counts:
+                    shards = [self._add_database(f"benchmark_{count}_{i}", Path(directory), aliases) for i in range(count)]
+                    for alias in shards:
+                        sync_replica(source=template, target=alias)
+
+                    with override_settings(ACCOUNT_SHARDS=shards):
+                        for alias in shards:
+                            prepare_shard(alias)
+                        user_ids = self._create_accounts(options["users"])
+                        elapsed  = self._run(user_ids, options["writers"], options["transactions"], options["hold_ms"] / 1000,
+                                             options["seed"])
+                    results.append((count, elapsed))
+            finally:
+                for alias in aliases:
+                    connections[alias].close()
+                    del connections.settings[alias]
+
+        transactions = options["transactions"]
+        base_rate    = transactions / results[0][1]
+
+        self.stdout.write(f"Transactions per run : {transactions:,}, {options['writers']} writer processes, "
+                          f"write lock held {options['hold_ms']}ms per transaction")
+        for count, elapsed in results:
+            rate = transactions / elapsed
+            self.stdout.write(f"{count} shard(s) : {elapsed:.3f}s, {rate:,.0f} transactions/s, {rate / base_rate:.2f}x")
+
+    def _add_database(self, alias: str, directory: Path, aliases: list) -> str:
+        """Add a SQLite database in `directory` to the connections, configured like `default`"""
+        settings = connections.settings[DEFAULT_DB_ALIAS]
+        # a writer queueing behind the others on a single shard can wait longer than SQLite's default 5 seconds
+        connections.settings[alias] = {**settings,
+                                       "NAME": str(directory / f"{alias}.sqlite3"),
+                                       "OPTIONS": {**settings["OPTIONS"], "timeout": 120},
+                                       }
+        aliases.append(alias)
+        return alias
+
+    def _create_accounts(self, num_of_users: int) -> list:
+        """Create a bank account and wallet for the user ids 1..num_of_users on their shards, without any User rows"""
+        user_ids = list(range(1, num_of_users + 1))
+        by_shard = {}
+        for user_id in user_ids:
+            by_shard.setdefault(shard_for_user(user_id), []).append(user_id)
+
+        for alias, shard_user_ids in by_shard.items():
+            with transaction.atomic(using=alias):
+                bank_accounts = BankAccount.objects.using(alias).bulk_create(
+                    BankAccount(bank_id=f"benchmark-{i}", sort_code=f"B{i:06}", account_number=f"B{i:08}", amount=1000, user_id=i)
+                    for i in shard_user_ids
+                )
+                Wallet.objects.using(alias).bulk_create(
+                    Wallet(wallet_id=f"benchmark-{bank_account.user_id}", user_id=bank_account.user_id, bank_account=bank_account)
+                    for bank_account in bank_accounts
+                )
+        return user_ids
+
+    def _run(self, user_ids: list, num_of_writers: int, num_of_transactions: int, hold: float, seed: int) -> float:
+        # forked, so the writers inherit the temporary databases and the overridden settings
+        context = multiprocessing.get_context("fork")
+        barrier = context.Barrier(num_of_writers + 1)
+        errors  = context.Queue()
+
+        def write(index: int, num_of_writes: int) -> None:
+            random = Random(seed + index)
+            try:
+                barrier.wait()
+                for _ in range(num_of_writes):
+                    self._move_money(random.choice(user_ids), hold)
+            except Exception as e:
+                errors.put(str(e))
+            finally:
+                connections.close_all()
+
+        # a connection can't be shared with a child process
+        connections.close_all()
+
+        writers = [context.Process(target=write, args=(index, len(range(index, num_of_transactions, num_of_writers))))
+                   for index in range(num_of_writers)]
+        for writer in writers:
+            writer.start()
+
+        barrier.wait()
+        start = time.perf_counter()
+        for writer in writers:
+            writer.join()
+        elapsed = time.perf_counter() - start
+
+        if not errors.empty():
+            raise CommandError(f"A writer failed with: {errors.get()}")
+        return elapsed
+
+    def _move_money(self, user_id: int, hold: float) -> None:
+        with transaction.atomic(using=shard_for_user(user_id)):
+            Wallet.objects.for_user(user_id).filter(user_id=user_id).update(amount=F("amount") + 1)
+            if hold:
+                time.sleep(hold)
+            BankAccount.objects.for_user(user_id).filter(user_id=user_id).update(amount=F("amount") - 1)
@@ -0,0 +1,150 @@
+import multiprocessing
+import tempfile
+import time
+from pathlib import Path
+from random import Random
+
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.core.signals import request_finished, request_started
+from django.db import DEFAULT_DB_ALIAS, OperationalError, connections, transaction
+from django.test.utils import override_settings
+
+from account.models import BankAccount, LedgerEntry, TransferService, Wallet
+
+
+class Command(BaseCommand):
+    help = (
+        "Run concurrent transfers and balance reads against a temporary SQLite database, first with the stock "
+        "SQLite configuration, then with the pragmas of SQLITE_PRAGMAS, BEGIN IMMEDIATE and persistent "
+        "connections. Every transfer and read is handled like a request, opening and closing its connection "
+        "as CONN_MAX_AGE says. The configured database isn't touched."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--writers", type=int, default=4, help="Number of processes making transfers")
+        parser.add_argument("--readers", type=int, default=4, help="Number of processes reading balances")
+        parser.add_argument("--seconds", type=float, default=5, help="How long each run lasts")
+        parser.add_argument("--accounts", type=int, default=200, help="Number of bank accounts with a wallet")
+        parser.add_argument("--seed", type=int, default=0)
+
+    def handle(self, *args, **options):
+        runs = [
+            ("stock", {"SQLITE_PRAGMAS": {}, "SQLITE_IMMEDIATE_TRANSACTIONS": False}, 0),
+            ("tuned", {"SQLITE_PRAGMAS": settings.SQLITE_PRAGMAS, "SQLITE_IMMEDIATE_TRANSACTIONS": True}, 600),
+        ]
+        database = connections.settings[DEFAULT_DB_ALIAS]
+        original = dict(database)
+        results  = []
+
+        with tempfile.TemporaryDirectory() as directory:
+            try:
+                for name, layer, conn_max_age in runs:
+                    connections[DEFAULT_DB_ALIAS].close()
+                    # the stock run keeps SQLite's default rollback journal, the mode is stored in the file
+                    database.update(NAME=str(Path(directory) / f"{name}.sqlite3"), CONN_MAX_AGE=conn_max_age)
+
+                    with override_settings(**layer):
+                        call_command("migrate", verbosity=0)
+                        pairs = self._create_accounts(options["accounts"])
+                        results.append((name, *self._run(pairs, options)))
+            finally:
+                connections[DEFAULT_DB_ALIAS].close()
+                database.clear()
+                database.update(original)
+
+        self.stdout.write(f"{options['writers']} writers and {options['readers']} readers for {options['seconds']}s per run")
+        for name, transfers, locked, reads in results:
+            seconds = options["seconds"]
+            self.stdout.write(f"{name:<5} : {transfers / seconds:,.0f} transfers/s, {reads / seconds:,.0f} reads/s, "
+                              f"{locked:,} transfers failed with 'database is locked'")
+
+        (_, stock_transfers, _, stock_reads), (_, tuned_transfers, _, tuned_reads) = results
+        summary = f"Transfers {tuned_transfers / max(stock_transfers, 1):.1f}x"
+        if options["readers"]:
+            summary += f", reads {tuned_reads / max(stock_reads, 1):.1f}x"
+        self.stdout.write(self.style.SUCCESS(summary))
+
+    def _create_accounts(self, num_of_accounts: int) -> list[tuple]:
+        """Create bank accounts with a connected wallet, without any User rows, and return their primary keys"""
+        with transaction.atomic():
+            bank_accounts = BankAccount.objects.bulk_create(
+                BankAccount(bank_id=f"benchmark-{i}", sort_code=f"B{i:06}", account_number=f"B{i:08}", amount=1000, user_id=i)
+                for i in range(1, num_of_accounts + 1)
+            )
+            wallets = Wallet.objects.bulk_create(
+                Wallet(wallet_id=f"benchmark-{bank_account.pk}", user_id=bank_account.user_id, bank_account=bank_account, amount=1000)
+                for bank_account in bank_accounts
+            )
+        return [(bank_account.pk, wallet.pk) for bank_account, wallet in zip(bank_accounts, wallets)]
+
+    def _run(self, pairs: list[tuple], options: dict) -> tuple:
+        # forked, so the processes inherit the temporary database and the overridden settings
+        context  = multiprocessing.get_context("fork")
+        barrier  = context.Barrier(options["writers"] + options["readers"] + 1)
+        counts   = context.Queue()
+        seconds  = options["seconds"]
+
+        def work(index: int, handle_request) -> None:
+            random    = Random(options["seed"] + index)
+            completed = locked = 0
+            try:
+                barrier.wait()
+                deadline = time.perf_counter() + seconds
+                while time.perf_counter() < deadline:
+                    request_started.send(sender=self.__class__)
+                    try:
+                        handle_request(random.choice(pairs), random)
+                        completed += 1
+                    except OperationalError as e:
+                        if "locked" not in str(e):
+                            raise
+                        locked += 1
+                    finally:
+                        request_finished.send(sender=self.__class__)
+                counts.put((handle_request.__name__, completed, locked, None))
+            except Exception as e:
+                counts.put((handle_request.__name__, completed, locked, str(e)))
+            finally:
+                connections.close_all()
+
+        # a connection can't be shared with a child process
+        connections.close_all()
+
+        processes = [context.Process(target=work, args=(index, self._transfer)) for index in range(options["writers"])]
+        processes += [context.Process(target=work, args=(1000 + index, self._read_balance)) for index in range(options["readers"])]
+        for process in processes:
+            process.start()
+        barrier.wait()
+
+        totals = {"_transfer": [0, 0], "_read_balance": [0, 0]}
+        for _ in processes:
+            name, completed, locked, error = counts.get()
+            if error:
+                raise CommandError(f"A {name.strip('_')} process failed with: {error}")
+            totals[name][0] += completed
+            totals[name][1] += locked
+        for process in processes:
+            process.join()
+
+        return totals["_transfer"][0], totals["_transfer"][1], totals["_read_balance"][0]
+
+    def _transfer(self, pair: tuple, random: Random) -> None:
+        _, wallet_id = pair
+        wallet       = Wallet.objects.select_related("bank_account").get(pk=wallet_id)
+
+        if random.random() < 0.25:
+            # a small batch, which reads the balances before it writes them
+            TransferService.bulk_transfer([(wallet.bank_account, wallet, 1), (wallet, wallet.bank_account, 1)])
+        elif random.random() < 0.5:
+            TransferService.transfer_from_bank_to_wallet(wallet.bank_account, wallet, 1)
+        else:
+            TransferService.transfer_from_wallet_to_bank(wallet.bank_account, wallet, 1)
+
+    def _read_balance(self, pair: tuple, random: Random) -> None:
+        bank_id, wallet_id = pair
+
+        BankAccount.objects.filter(pk=bank_id).values_list("amount", flat=True).get()
+        list(LedgerEntry.objects.filter(account_type=LedgerEntry.AccountType.WALLET, account_id=wallet_id)
+                                .order_by("-created_on")[:20])
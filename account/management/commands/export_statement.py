@@ -0,0 +1,55 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from account.statements import get_statement_account, parse_statement_range, stream_statement
+
+
+class Command(BaseCommand):
+    help = (
+        "Write the statement of a bank account or wallet as CSV or JSON Lines, optionally gzipped. "
+        "The statement is streamed from the database, so memory use doesn't grow with its length."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("account", choices=["bank", "wallet"], help="The type of account")
+        parser.add_argument("id", help="The bank_id or wallet_id of the account")
+        parser.add_argument("--start", help="The first day included, YYYY-MM-DD")
+        parser.add_argument("--end", help="The last day included, YYYY-MM-DD")
+        parser.add_argument("--format", choices=["csv", "jsonl"], default="csv")
+        parser.add_argument("--gzip", action="store_true", help="Compress the output with gzip")
+        parser.add_argument("--output", default="-", help="The file to write to, or '-' for stdout")
+        parser.add_argument("--chunk-size", type=int, default=2000, help="Rows fetched from the database at a time")
+
+    def handle(self, *args, **options):
+        try:
+            start, end = parse_statement_range(options["start"], options["end"])
+            account    = get_statement_account(options["account"], options["id"])
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        if account is None:
+            raise CommandError(f"No {options['account']} account with the id '{options['id']}'")
+
+        chunks = stream_statement(account,
+                                  start=start,
+                                  end=end,
+                                  file_format=options["format"],
+                                  compress=options["gzip"],
+                                  chunk_size=options["chunk_size"],
+                                  )
+        output = options["output"]
+
+        try:
+            file = sys.stdout.buffer if output == "-" else open(output, "wb")
+        except OSError as e:
+            raise CommandError(f"Could not open {output}: {e}")
+
+        try:
+            for chunk in chunks:
+                file.write(chunk)
+        finally:
+            if output == "-":
+                file.flush()
+            else:
+                file.close()
@@ -0,0 +1,44 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from account.provisioning import provision_users, read_users
+
+
+class Command(BaseCommand):
+    help = (
+        "Create users with their profile, bank account and wallet from a CSV or JSON Lines file, "
+        "in bulk and one chunk at a time. Pass '-' to read from stdin."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="The CSV or JSON Lines file to read, or '-' for stdin")
+        parser.add_argument("--format", choices=["csv", "jsonl"], help="The file format, guessed from the file name if not given")
+        parser.add_argument("--chunk-size", type=int, default=1000, help="Number of users written per transaction")
+
+    def handle(self, *args, **options):
+        path           = options["path"]
+        self.verbosity = options["verbosity"]
+
+        try:
+            file = sys.stdin if path == "-" else open(path, newline="", encoding="utf-8")
+        except OSError as e:
+            raise CommandError(f"Could not open {path}: {e}")
+
+        try:
+            rows   = read_users(file, options["format"] or ("csv" if path == "-" else None))
+            result = provision_users(rows, chunk_size=options["chunk_size"], on_chunk=self._report_progress)
+        except ValueError as e:
+            raise CommandError(str(e))
+        finally:
+            if file is not sys.stdin:
+                file.close()
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Created {result.created:,} user(s), skipped {result.skipped:,} in {result.elapsed:.2f}s "
+            f"({result.throughput:,.0f} users/s)"
+        ))
+
+    def _report_progress(self, result):
+        if self.verbosity > 1:
+            self.stdout.write(f"{result.created:,} created, {result.skipped:,} skipped ({result.throughput:,.0f} users/s)")
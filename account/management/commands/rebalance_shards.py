@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from account.sharding import UserMove, rebalance_shards
+
+
+class Command(BaseCommand):
+    help = (
+        "Move the account data of every user that isn't on the shard it hashes to, e.g. after adding a shard "
+        "to ACCOUNT_SHARDS, or to move the data created on `default` before sharding was turned on. "
+        "Run it while the users being moved aren't making changes, a change that races a move makes it fail "
+        "rather than being lost, and running the command again picks up where it stopped."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--user", type=int, action="append", dest="user_ids",
+                            help="Only move this user, can be given more than once")
+        parser.add_argument("--dry-run", action="store_true", help="Only report the users that would be moved")
+
+    def handle(self, *args, **options):
+        dry_run = options["dry_run"]
+
+        def report(move: UserMove) -> None:
+            if options["verbosity"] > 1:
+                self.stdout.write(f"User {move.user_id}: {move.source} -> {move.target}, {move.rows} rows")
+
+        try:
+            moves = rebalance_shards(user_ids=options["user_ids"], dry_run=dry_run, on_move=report)
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        rows = sum(move.rows for move in moves)
+        self.stdout.write(self.style.SUCCESS(f"{'Would move' if dry_run else 'Moved'} {len(moves):,} users, {rows:,} rows"))
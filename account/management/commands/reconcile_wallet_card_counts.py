@@ -0,0 +1,62 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db.models import Count, OuterRef, Subquery, IntegerField
+from django.db.models.functions import Coalesce
+
+from account.models import Wallet, Card
+
+
+class Command(BaseCommand):
+    help = (
+        "Repair drift between Wallet.total_cards and the number of cards actually "
+        "attached to each wallet, one batch of wallets at a time."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000, help="Number of wallets checked per batch")
+        parser.add_argument("--dry-run", action="store_true", help="Report the drifted wallets without fixing them")
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        dry_run    = options["dry_run"]
+        last_pk    = 0
+        checked    = 0
+        repaired   = 0
+        start      = time.perf_counter()
+
+        actual_count = Coalesce(
+            Subquery(Card.objects.filter(wallet=OuterRef("pk"))
+                                 .order_by()
+                                 .values("wallet")
+                                 .annotate(count=Count("pk"))
+                                 .values("count"),
+                     output_field=IntegerField()),
+            0,
+        )
+
+        while True:
+            # keyset pagination on the primary key keeps every batch an index range scan
+            batch = list(Wallet.objects.filter(pk__gt=last_pk)
+                                       .order_by("pk")
+                                       .annotate(actual_count=actual_count)
+                                       .values_list("pk", "total_cards", "actual_count")[:batch_size])
+            if not batch:
+                break
+
+            last_pk  = batch[-1][0]
+            checked += len(batch)
+            drifted  = [pk for pk, total_cards, count in batch if total_cards != count]
+
+            if drifted:
+                for pk in drifted:
+                    self.stdout.write(f"Wallet {pk} has drifted")
+                if not dry_run:
+                    # recomputed inside the UPDATE so a card added since the SELECT is still counted
+                    repaired += Wallet.objects.filter(pk__in=drifted).update(total_cards=actual_count)
+                else:
+                    repaired += len(drifted)
+
+        elapsed = time.perf_counter() - start
+        action  = "would be repaired" if dry_run else "repaired"
+        self.stdout.write(self.style.SUCCESS(f"Checked {checked} wallets, {repaired} {action} in {elapsed:.2f}s"))
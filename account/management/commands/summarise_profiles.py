@@ -0,0 +1,39 @@
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from utils.profiler import get_profile_dir, summarise_profiles
+
+
+class Command(BaseCommand):
+    help = (
+        "List the hottest functions across the request profiles written by utils.profiler.ProfilerMiddleware, "
+        "with the average latency, queries and SQL time of each URL name profiled."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--profile-dir", default=None, help="Defaults to the REQUEST_PROFILER_DIR setting")
+        parser.add_argument("--url-name", default=None, help="Only the profiles of this URL name, e.g. home")
+        parser.add_argument("--top", type=int, default=20, help="Number of functions listed")
+        parser.add_argument("--sort", choices=["own", "total"], default="own",
+                            help="Rank the functions by the time spent in them, or in them and what they call")
+
+    def handle(self, *args, **options):
+        directory = Path(options["profile_dir"] or get_profile_dir())
+        summary   = None
+
+        if directory.is_dir():
+            summary = summarise_profiles(directory, url_name=options["url_name"], top=options["top"], sort=options["sort"])
+        if summary is None or not summary.profiles:
+            raise CommandError(f"No profiles in {directory}")
+
+        self.stdout.write(f"{summary.profiles:,} profile(s) in {directory}\n")
+        self.stdout.write(f"{'URL name':<40} {'profiles':>8} {'latency ms':>11} {'queries':>8} {'SQL ms':>8}")
+        for url_name, averages in sorted(summary.requests.items(), key=lambda item: -item[1]["latency_ms"]):
+            self.stdout.write(f"{url_name or '-':<40} {averages['count']:>8,} {averages['latency_ms']:>11.1f} "
+                              f"{averages['queries']:>8.1f} {averages['sql_ms']:>8.1f}")
+
+        self.stdout.write(f"\n{'own s':>9} {'total s':>9} {'calls':>9}  function")
+        for function in summary.functions:
+            calls = "-" if function.calls is None else f"{function.calls:,}"
+            self.stdout.write(f"{function.own_seconds:>9.4f} {function.total_seconds:>9.4f} {calls:>9}  {function.function}")
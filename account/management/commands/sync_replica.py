@@ -0,0 +1,32 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS
+
+from utils.db_router import sync_replica
+
+
+class Command(BaseCommand):
+    help = (
+        "Copy the default SQLite database into the read replica, once or every --interval seconds. "
+        "Stands in for replication when both databases are local SQLite files."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--source", default=DEFAULT_DB_ALIAS, help="The database alias to copy from")
+        parser.add_argument("--target", default=None, help="The database alias to copy to, defaults to READ_REPLICA_ALIAS")
+        parser.add_argument("--interval", type=float, default=None, help="Keep syncing every this many seconds")
+
+    def handle(self, *args, **options):
+        while True:
+            start = time.perf_counter()
+            try:
+                sync_replica(source=options["source"], target=options["target"])
+            except ValueError as e:
+                raise CommandError(str(e))
+
+            self.stdout.write(f"Synced the replica in {time.perf_counter() - start:.3f}s")
+
+            if not options["interval"]:
+                return
+            time.sleep(options["interval"])
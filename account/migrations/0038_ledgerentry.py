@@ -0,0 +1,32 @@
+# Generated by Django 5.2.3 on 2026-10-18 02:37
+
+import django.core.validators
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('account', '0037_card_amount_historicalcard_amount'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LedgerEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('transfer_id', models.CharField(db_index=True, editable=False, max_length=32)),
+                ('leg', models.CharField(choices=[('D', 'Debit'), ('C', 'Credit')], editable=False, max_length=1)),
+                ('account_type', models.CharField(choices=[('B', 'Bank account'), ('W', 'Wallet'), ('C', 'Card')], editable=False, max_length=1)),
+                ('account_id', models.PositiveBigIntegerField(editable=False)),
+                ('amount', models.DecimalField(decimal_places=2, editable=False, max_digits=10, validators=[django.core.validators.MinValueValidator(0)])),
+                ('running_balance', models.DecimalField(decimal_places=2, editable=False, max_digits=10)),
+                ('created_on', models.DateTimeField(default=django.utils.timezone.now, editable=False)),
+            ],
+            options={
+                'verbose_name_plural': 'Ledger entries',
+                'indexes': [models.Index(fields=['account_type', 'account_id', 'created_on'], name='account_led_account_b21065_idx')],
+            },
+        ),
+    ]
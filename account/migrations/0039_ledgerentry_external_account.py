@@ -0,0 +1,23 @@
+# Generated by Django 5.2.3 on 2026-10-18 02:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('account', '0038_ledgerentry'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='ledgerentry',
+            name='account_type',
+            field=models.CharField(choices=[('B', 'Bank account'), ('W', 'Wallet'), ('C', 'Card'), ('E', 'External')], editable=False, max_length=1),
+        ),
+        migrations.AlterField(
+            model_name='ledgerentry',
+            name='running_balance',
+            field=models.DecimalField(blank=True, decimal_places=2, editable=False, max_digits=10, null=True),
+        ),
+    ]
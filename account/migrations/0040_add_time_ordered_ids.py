@@ -0,0 +1,92 @@
+# Generated by Django 5.2.3 on 2026-10-18 02:48
+
+import utils.fields
+from django.db import migrations
+from django.db.models import OuterRef, Subquery
+
+from utils.generator import generate_time_ordered_id
+
+
+BATCH_SIZE = 1000
+
+
+def backfill_time_ordered_ids(apps, schema_editor):
+    """
+    Give every existing row its own identifier, built from the time the row
+    was created so that the identifiers sort in the same order as the rows.
+
+    Adding the column filled every row with the same value, so this walks each
+    table in primary key batches, then points the history rows of live objects
+    at the identifier of their object.
+    """
+    db = schema_editor.connection.alias
+
+    for model_name in ("BankAccount", "Card", "Wallet", "Profile"):
+        model      = apps.get_model("account", model_name)
+        historical = apps.get_model("account", f"Historical{model_name}")
+        last_pk    = 0
+
+        while True:
+            batch = list(model.objects.using(db).filter(pk__gt=last_pk).order_by("pk").only("pk", "created_on")[:BATCH_SIZE])
+            if not batch:
+                break
+
+            for obj in batch:
+                obj.uid = generate_time_ordered_id(obj.created_on)
+            model.objects.using(db).bulk_update(batch, ["uid"])
+            last_pk = batch[-1].pk
+
+        historical.objects.using(db).filter(id__in=model.objects.values("pk")).update(
+            uid=Subquery(model.objects.filter(pk=OuterRef("id")).values("uid")[:1])
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('account', '0039_ledgerentry_external_account'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='bankaccount',
+            name='uid',
+            field=utils.fields.TimeOrderedIdField(null=True),
+        ),
+        migrations.AddField(
+            model_name='card',
+            name='uid',
+            field=utils.fields.TimeOrderedIdField(null=True),
+        ),
+        migrations.AddField(
+            model_name='historicalbankaccount',
+            name='uid',
+            field=utils.fields.TimeOrderedIdField(null=True),
+        ),
+        migrations.AddField(
+            model_name='historicalcard',
+            name='uid',
+            field=utils.fields.TimeOrderedIdField(null=True),
+        ),
+        migrations.AddField(
+            model_name='historicalprofile',
+            name='uid',
+            field=utils.fields.TimeOrderedIdField(null=True),
+        ),
+        migrations.AddField(
+            model_name='historicalwallet',
+            name='uid',
+            field=utils.fields.TimeOrderedIdField(null=True),
+        ),
+        migrations.AddField(
+            model_name='profile',
+            name='uid',
+            field=utils.fields.TimeOrderedIdField(null=True),
+        ),
+        migrations.AddField(
+            model_name='wallet',
+            name='uid',
+            field=utils.fields.TimeOrderedIdField(null=True),
+        ),
+        migrations.RunPython(backfill_time_ordered_ids, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,54 @@
+# Generated by Django 5.2.3 on 2026-10-18 02:48
+
+import utils.fields
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('account', '0040_add_time_ordered_ids'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='bankaccount',
+            name='uid',
+            field=utils.fields.TimeOrderedIdField(unique=True),
+        ),
+        migrations.AlterField(
+            model_name='card',
+            name='uid',
+            field=utils.fields.TimeOrderedIdField(unique=True),
+        ),
+        migrations.AlterField(
+            model_name='historicalbankaccount',
+            name='uid',
+            field=utils.fields.TimeOrderedIdField(db_index=True),
+        ),
+        migrations.AlterField(
+            model_name='historicalcard',
+            name='uid',
+            field=utils.fields.TimeOrderedIdField(db_index=True),
+        ),
+        migrations.AlterField(
+            model_name='historicalprofile',
+            name='uid',
+            field=utils.fields.TimeOrderedIdField(db_index=True),
+        ),
+        migrations.AlterField(
+            model_name='historicalwallet',
+            name='uid',
+            field=utils.fields.TimeOrderedIdField(db_index=True),
+        ),
+        migrations.AlterField(
+            model_name='profile',
+            name='uid',
+            field=utils.fields.TimeOrderedIdField(unique=True),
+        ),
+        migrations.AlterField(
+            model_name='wallet',
+            name='uid',
+            field=utils.fields.TimeOrderedIdField(unique=True),
+        ),
+    ]
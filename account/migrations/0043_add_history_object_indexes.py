@@ -0,0 +1,23 @@
+# Generated by Django 5.2.3 on 2026-10-18 03:08
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('account', '0042_numbersequence'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='historicalbankaccount',
+            index=models.Index(fields=['id', 'history_date'], name='account_his_id_a7a745_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='historicalwallet',
+            index=models.Index(fields=['id', 'history_date'], name='account_his_id_12cecc_idx'),
+        ),
+    ]
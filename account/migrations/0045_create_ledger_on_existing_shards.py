@@ -0,0 +1,24 @@
+from django.db import migrations
+
+
+def create_ledger_table(apps, schema_editor):
+    """
+    Create the ledger table on a shard that was migrated before the ledger
+    entries moved to the shards, so `0038_ledgerentry` left it out there.
+
+    A shard migrated from scratch, and `default`, already have the table.
+    """
+    model = apps.get_model("account", "LedgerEntry")
+    if model._meta.db_table not in schema_editor.connection.introspection.table_names():
+        schema_editor.create_model(model)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('account', '0044_account_data_without_cross_database_constraints'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_ledger_table, migrations.RunPython.noop, hints={"model_name": "ledgerentry"}),
+    ]
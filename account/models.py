@@ -1,18 +1,31 @@
-from typing import Optional
-from django.db import models
+from typing import Optional, Iterable, NamedTuple, Any, Callable, Union
+from secrets import token_hex
+from django.db import DEFAULT_DB_ALIAS, models, router, transaction, connections, IntegrityError
+from django.db.models import F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
 from django.core.validators import MinValueValidator
-from simple_history.models import HistoricalRecords
 from decimal import Decimal
 
 from authentication.models import User
 from utils.generator import generate_code
+from utils.fields import TimeOrderedIdField
+from utils.history import PolicyHistoricalRecords
+from utils.mixins import SaveChangedFieldsMixin
+from utils.sqlite import immediate_atomic, immediate_atomic_on
 from utils.utils import mask_number
+from .lookup_cache import cached_lookup
+from .sharding import ShardedManager, get_shards, shard_for_account, use_shard
 from .utils.utils import current_year_choices, profile_to_dict
 from .utils.errors import (BankInsufficientFundsError, WalletCardLimitExceededError,
                             WalletInsufficientFundsError, 
                             BankAccountIsNotConnectedToWalletError,
                             IncorrectBankTypeError,
                             IncorrectWalletTypeError,
+                            IncorrectCardTypeError,
+                            CardInsufficientFundsError,
+                            LedgerEntryIsImmutableError,
+                            CrossShardTransferError,
                             )
 
 
@@ -20,31 +33,190 @@ from .utils.errors import (BankInsufficientFundsError, WalletCardLimitExceededEr
 
 
 class BalanceMixin:
+    """
+    Adds atomic balance mutation to any model with a numeric amount column.
+
+    Balance changes are applied with a single conditional UPDATE
+    (`SET amount = amount +/- x WHERE amount >= x`) instead of reading the
+    amount into Python, doing the maths and saving it back. Two requests
+    mutating the same row can therefore never overwrite each other's changes,
+    and an overdraft is rejected by the database itself when no row matches.
+
+    Note:
+        Like any `QuerySet.update`, the UPDATE bypasses `save()`, so no
+        `pre_save`/`post_save` signals fire for a balance change.
+    """
     amount_field: str = "amount"  # Default, but can be overridden in child classes
 
     def _get_amount(self) -> float:
         self._validate_amount_field()
         return getattr(self, self.amount_field)
 
-    def _set_amount(self, new_amount: float) -> None:
-        self._is_amount_valid(new_amount)
-        setattr(self, self.amount_field, new_amount)
-        self.save(update_fields=[self.amount_field])
+    def add_amount(self, amount: float, refresh: bool = False) -> None:
+        """
+        Atomically add `amount` to the balance.
 
-    def add_amount(self, amount: float) -> None:
-        current = self._get_amount()
-        self._set_amount(current + amount)
+        Args:
+            amount (float | int | Decimal): The amount to add.
+            refresh (bool): Re-read the stored balance into the instance after the
+                            update. When False the in-memory value is simply
+                            incremented, which saves a query but may be stale if
+                            another request changed the row in the meantime.
+        """
+        self._validate_amount(amount)
+        self._apply_amount_change(amount, refresh=refresh)
+
+    def deduct_amount(self,
+                      amount: float,
+                      ExceptionErrorClass: type[Exception],
+                      message: Union[str, Callable[[Decimal], str]] = None,
+                      refresh: bool = False,
+                      ) -> None:
+        """
+        Atomically deduct `amount` from the balance.
 
-    def deduct_amount(self, amount: float, ExceptionErrorClass: type[Exception], message: str = None) -> None:
-        current = self._get_amount()
-        if amount > current:
+        The UPDATE only matches when the stored balance covers the amount, so if
+        zero rows are updated `ExceptionErrorClass` is raised and nothing changes.
+        The instance's balance is then re-read, so it holds the balance the
+        UPDATE saw rather than a possibly stale in-memory value.
+
+        Args:
+            amount (float | int | Decimal): The amount to deduct.
+            ExceptionErrorClass (type[Exception]): The error raised on insufficient funds.
+            message (str | Callable): The error message passed to `ExceptionErrorClass`,
+                                      or a function building it from the stored balance.
+            refresh (bool): Re-read the stored balance into the instance after the update.
+        """
+        self._validate_amount(amount)
+        if not self._apply_amount_change(-self._to_decimal(amount), refresh=refresh):
+            self.refresh_from_db(fields=[self.amount_field])
+            if callable(message):
+                message = message(self._get_amount())
             raise ExceptionErrorClass(message)
-        self._set_amount(current - amount)
+
+    def balance_at(self, timestamp) -> Optional[Decimal]:
+        """
+        Return the balance as it was at `timestamp`, or None if it isn't known.
+
+        See `balances_at`, this is the same single query for one account,
+        run on the database holding it.
+        """
+        using = shard_for_account(self) if get_shards() else None
+        return type(self).balances_at([self.pk], timestamp, using=using).get(self.pk)
+
+    @classmethod
+    def balances_at(cls, accounts: Iterable = None, timestamp=None, using: str = None) -> dict:
+        """
+        Return the balance of many accounts as it was at `timestamp` in one query.
+
+        A balance changes in two ways: a `save()`, which writes a history row,
+        and a posting through `TransferService`, which updates the balance
+        with an UPDATE and records it in the `running_balance` of a
+        `LedgerEntry`. So the balance at `timestamp` is the amount of the
+        latest of the two that is no later than `timestamp`. Both are read
+        with correlated subqueries that use the `(id, history_date)` index of
+        the history table and the `(account_type, account_id, created_on)`
+        index of the ledger, so the cost per account doesn't depend on how
+        long its history is. While the data is sharded, the query runs on
+        `default` and on every shard, each answering for the accounts it holds.
+
+        Example usage:
+
+            month_end = datetime(2025, 1, 31, 23, 59, 59, tzinfo=timezone.utc)
+            balances  = BankAccount.balances_at(timestamp=month_end)  # every bank account
+
+        Args:
+            accounts (Iterable): Account instances or primary keys. Every account if None.
+            timestamp (datetime): The point in time. Now if None.
+            using (str): The database to read. Every database holding accounts if None.
+
+        Returns:
+            dict: `pk -> Decimal` for every account, None for an account with no
+                  history or ledger entry at `timestamp`, e.g. one created later.
+        """
+        timestamp = timestamp or timezone.now()
+        history   = (cls.history.model.objects.filter(**{cls._meta.pk.attname: OuterRef("pk")}, history_date__lte=timestamp)
+                                              .order_by("-history_date", "-history_id")
+                                              )
+        ledger    = (LedgerEntry.objects.filter(account_type=LedgerEntry.get_account_type(cls),
+                                                account_id=OuterRef("pk"),
+                                                created_on__lte=timestamp,
+                                                )
+                                        .order_by("-created_on", "-id")
+                                        )
+        # the subqueries run on the database of the accounts, which holds their history and ledger entries
+        if using is not None:
+            databases = [using]
+        else:
+            databases = dict.fromkeys([DEFAULT_DB_ALIAS, *get_shards()]) if get_shards() else [None]
+        balances  = {}
+        pks       = None if accounts is None else [getattr(account, "pk", account) for account in accounts]
+
+        for using in databases:
+            qs = cls._default_manager.using(using)
+            if pks is not None:
+                qs = qs.filter(pk__in=pks)
+
+            rows = qs.annotate(history_amount=Subquery(history.values(cls.amount_field)[:1]),
+                               history_date=Subquery(history.values("history_date")[:1]),
+                               ledger_amount=Subquery(ledger.values("running_balance")[:1]),
+                               ledger_date=Subquery(ledger.values("created_on")[:1]),
+                               ).values_list("pk", "history_amount", "history_date", "ledger_amount", "ledger_date")
+
+            for pk, history_amount, history_date, ledger_amount, ledger_date in rows.iterator(chunk_size=2000):
+                if ledger_date is not None and (history_date is None or ledger_date >= history_date):
+                    balances[pk] = ledger_amount
+                else:
+                    balances[pk] = history_amount
+        return balances
+
+    def _apply_amount_change(self, delta: float, refresh: bool = False) -> bool:
+        """
+        Issue the conditional UPDATE for a signed `delta` and return whether a row matched.
+        """
+        self._validate_amount_field()
+
+        delta   = self._to_decimal(delta)
+        field   = self.amount_field
+        lookups = {"pk": self.pk}
+        values  = {field: F(field) + delta}
+
+        if delta < 0:
+            lookups[f"{field}__gte"] = -delta
+
+        if any(f.name == "modified_on" for f in self._meta.concrete_fields):
+            values["modified_on"] = timezone.now()
+
+        # routed like the instance itself, i.e. to the shard it was loaded from when the data is sharded
+        updated = type(self)._default_manager.db_manager(hints={"instance": self}).filter(**lookups).update(**values)
+        if not updated:
+            return False
+
+        if refresh:
+            self.refresh_from_db(fields=list(values))
+        else:
+            setattr(self, field, self._to_decimal(self._get_amount()) + delta)
+            if "modified_on" in values:
+                self.modified_on = values["modified_on"]
+            if isinstance(self, SaveChangedFieldsMixin):
+                # already written by the UPDATE, a later save() mustn't write the in-memory copy back
+                self.mark_fields_as_saved(*values)
+        return True
+
+    def _validate_amount(self, amount: float) -> None:
+        self._is_amount_valid(amount)
+        if amount < 0:
+            raise ValueError(f"The amount cannot be negative but got {amount}")
 
     def _is_amount_valid(self, amount: float) -> bool:
-        if not isinstance(amount, (float, int, Decimal)):
+        if isinstance(amount, bool) or not isinstance(amount, (float, int, Decimal)):
             raise TypeError(f"The amount must be type float, int or decimal but got type {type(amount)}")
         return True
+
+    @staticmethod
+    def _to_decimal(amount: float) -> Decimal:
+        # str() first so that floats such as 0.1 don't carry binary noise into the column
+        return amount if isinstance(amount, Decimal) else Decimal(str(amount))
     
     def _validate_amount_field(self) -> None:
         if not hasattr(self, self.amount_field):
@@ -52,16 +224,18 @@ class BalanceMixin:
         
 
 
-class BankAccount(BalanceMixin, models.Model):
+class BankAccount(BalanceMixin, SaveChangedFieldsMixin, models.Model):
     bank_id        = models.CharField(max_length=40, unique=True, db_index=True, blank=True, null=True)
+    uid            = TimeOrderedIdField(unique=True)
     sort_code      = models.CharField(max_length=16, unique=True, db_index=True, blank=True)
     account_number = models.CharField(max_length=16, unique=True, db_index=True, blank=True)
     amount         = models.DecimalField(max_digits=10,decimal_places=2, validators=[MinValueValidator(0)], default=0)
-    user           = models.ForeignKey(User, on_delete=models.CASCADE, related_name="account")
+    user           = models.ForeignKey(User, on_delete=models.CASCADE, related_name="account", db_constraint=False)
     created_on     = models.DateTimeField(auto_now_add=True)
     modified_on    = models.DateTimeField(auto_now=True)
 
-    history        = HistoricalRecords()
+    objects        = ShardedManager()
+    history        = PolicyHistoricalRecords(index_by_object=True, user_db_constraint=False)
 
     class Meta:
         indexes = [
@@ -99,24 +273,26 @@ class BankAccount(BalanceMixin, models.Model):
     def get_by_account_number(cls, sort_code, account_number):
         
         try:
-            return cls.objects.get(sort_code=sort_code, account_number=account_number)
+            return cls.objects.get_from_any_shard(sort_code=sort_code, account_number=account_number)
         except cls.DoesNotExist:
             return None
         
     @classmethod
     def get_by_user(cls, user):
-        try:
-            return cls.objects.get(user=user)
-        except cls.DoesNotExist:
-            return None
+        user_id = getattr(user, "pk", user)
+        return cached_lookup(cls, "user", user_id, lambda: cls.objects.for_user(user).get(user=user), user_id=user_id)
     
-    def deduct_amount(self, amount: float) -> None:
-        message = f"Insufficient amount for withdrawal, current amount: {self.amount}, withdrawal amount: {amount}, overdrawn: {self.amount - amount}"
-        super().deduct_amount(amount, BankInsufficientFundsError, message)
+    def deduct_amount(self, amount: float, refresh: bool = False) -> None:
+        # built from the stored balance the UPDATE saw, not the in-memory one
+        def message(balance: Decimal) -> str:
+            return (f"Insufficient amount for withdrawal, current amount: {balance}, withdrawal amount: {amount}, "
+                    f"overdrawn: {self._to_decimal(balance) - self._to_decimal(amount)}")
+
+        super().deduct_amount(amount, BankInsufficientFundsError, message, refresh=refresh)
 
 
   
-class Card(models.Model):
+class Card(BalanceMixin, SaveChangedFieldsMixin, models.Model):
 
     class Month(models.TextChoices):
         JAN = "JAN", "January"
@@ -142,6 +318,7 @@ class Card(models.Model):
         DEBIT  = "D", "Debit"
 
     card_id      = models.CharField(max_length=64, unique=True, db_index=True, blank=True, null=True, editable=False)
+    uid          = TimeOrderedIdField(unique=True)
     card_name    = models.CharField(max_length=20)
     amount       = models.DecimalField(max_digits=10,decimal_places=2, validators=[MinValueValidator(0)], default=0)
     card_number  = models.CharField(max_length=20, unique=True, db_index=True)
@@ -154,19 +331,57 @@ class Card(models.Model):
     wallet       = models.ForeignKey("Wallet", on_delete=models.SET_NULL, blank=True, null=True, related_name="cards")
     created_on   = models.DateTimeField(auto_now_add=True)
     modified_on  = models.DateTimeField(auto_now=True)
-    history      = HistoricalRecords()
+
+    objects      = ShardedManager()
+    history      = PolicyHistoricalRecords(user_db_constraint=False)
 
     def __str__(self):
         if self.card_name:
             return f"{self.card_name.title()}"
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        if "wallet_id" in instance.__dict__:
+            instance._loaded_wallet_id = instance.wallet_id
+        return instance
+
     def save(self, *args, **kwargs):
+        """
+        Save the card and keep `Wallet.total_cards` in step with it.
 
-        if self.wallet and self._state.adding: # self._state.adding checks only on creation meaning when the card model is being crated
-            if self.wallet.num_of_cards_added >= self.wallet.maximum_cards:
-                raise WalletCardLimitExceededError("Card limit exceeded.")
-        super().save(*args, **kwargs)
+        When the card is attached to a wallet (on creation, or by moving it from
+        another wallet) the wallet's counter is incremented with a conditional
+        UPDATE that only matches while the wallet is below `maximum_cards`, so two
+        concurrent card adds can never exceed the limit. Detaching the card
+        decrements the old wallet's counter. The counter changes and the card
+        itself are saved in one transaction.
+
+        Raises:
+            WalletCardLimitExceededError: If the wallet already holds its maximum number of cards.
+        """
+        previous_wallet_id = None if self._state.adding else getattr(self, "_loaded_wallet_id", self.wallet_id)
+        using              = kwargs.get("using") or router.db_for_write(type(self), instance=self)
+
+        with transaction.atomic(using=using):
+            if self.wallet_id != previous_wallet_id:
+                if self.wallet_id is not None:
+                    Wallet.increment_card_count(self.wallet_id, using=using)
+                if previous_wallet_id is not None:
+                    Wallet.decrement_card_count(previous_wallet_id, using=using)
+
+            super().save(*args, **kwargs)
+
+        if self.wallet_id != previous_wallet_id:
+            # keep an already loaded wallet instance in step with the counter just written
+            if self.wallet_id is not None and Card.wallet.is_cached(self):
+                self.wallet.total_cards = (self.wallet.total_cards or 0) + 1
+                self.wallet.mark_fields_as_saved("total_cards")
+            self._loaded_wallet_id = self.wallet_id
  
+    def deduct_amount(self, amount: float, refresh: bool = False) -> None:
+        super().deduct_amount(amount, CardInsufficientFundsError, refresh=refresh)
+
     @property
     def masked_card_number(self):
         return mask_number(self.card_number)
@@ -211,29 +426,37 @@ class Card(models.Model):
         Raises:
             DoesNotExist: returns None or the instance
         """
-        qs = cls.objects.select_related('wallet', 'bank_account')
-        try:
-            if field_name == "bank":
-                return qs.get(bank_account=field_value)
-            if field_name == "wallet":
-                return qs.get(wallet=field_value)
+        # on the shard of the wallet or bank account, and cached, see `account.lookup_cache`
+        qs      = cls.objects.db_manager(hints={"instance": field_value}).select_related('wallet', 'bank_account')
+        related = ["wallet", "bank_account"]
+        user_id = getattr(field_value, "user_id", None)
 
-        except cls.DoesNotExist:
-            return None
+        if field_name == "bank":
+            return cached_lookup(cls, "bank", field_value.pk, lambda: qs.get(bank_account=field_value), user_id, related)
+        if field_name == "wallet":
+            return cached_lookup(cls, "wallet", field_value.pk, lambda: qs.get(wallet=field_value), user_id, related)
 
 
 
-class Wallet(BalanceMixin, models.Model):
+class Wallet(BalanceMixin, SaveChangedFieldsMixin, models.Model):
     wallet_id             = models.CharField(max_length=64, unique=True, db_index=True)
+    uid                   = TimeOrderedIdField(unique=True)
     amount                = models.DecimalField(max_digits=10,decimal_places=2, validators=[MinValueValidator(0)], default=0)
     total_cards           = models.SmallIntegerField(validators=[MinValueValidator(0)], default=0, blank=True, null=True)
     last_amount_received  = models.DecimalField(max_digits=10,decimal_places=2, validators=[MinValueValidator(0)], default=0)
     maximum_cards         = models.SmallIntegerField(validators=[MinValueValidator(0)], default=3)
-    user                  = models.ForeignKey(User, on_delete=models.CASCADE, db_index=True, blank=True, null=True)
+    user                  = models.ForeignKey(User, on_delete=models.CASCADE, db_index=True, blank=True, null=True, db_constraint=False)
     bank_account          = models.OneToOneField(BankAccount, models.SET_NULL, blank=True, null=True, db_index=True)
     created_on            = models.DateTimeField(auto_now_add=True)
     modified_on           = models.DateTimeField(auto_now=True)
-    history               = HistoricalRecords()
+
+    objects               = ShardedManager()
+
+    # the card counter and last received amount follow from other history, a change to them alone isn't recorded
+    history               = PolicyHistoricalRecords(track_changes_to=["amount", "maximum_cards", "user", "bank_account"],
+                                                    index_by_object=True,
+                                                    user_db_constraint=False,
+                                                    )
 
     class Meta:
         indexes = [
@@ -258,7 +481,33 @@ class Wallet(BalanceMixin, models.Model):
     
     @property
     def num_of_cards_added(self):
-        return self.cards.count()
+        return self.total_cards or 0
+
+    @classmethod
+    def increment_card_count(cls, wallet_id, using: str = None) -> None:
+        """
+        Atomically add one to the wallet's card counter, unless it is already full.
+
+        Args:
+            wallet_id (int): The primary key of the wallet.
+            using (str): The database holding the wallet, e.g. its shard. Chosen by the routers if None.
+
+        Raises:
+            WalletCardLimitExceededError: If the wallet holds `maximum_cards` cards or doesn't exist.
+        """
+        updated = (cls.objects.db_manager(using).filter(pk=wallet_id)
+                              .alias(current_total=Coalesce("total_cards", 0))
+                              .filter(current_total__lt=F("maximum_cards"))
+                              .update(total_cards=Coalesce("total_cards", 0) + 1))
+        if not updated:
+            raise WalletCardLimitExceededError("Card limit exceeded.")
+
+    @classmethod
+    def decrement_card_count(cls, wallet_id, using: str = None) -> None:
+        """
+        Atomically take one off the wallet's card counter, never going below zero.
+        """
+        cls.objects.db_manager(using).filter(pk=wallet_id, total_cards__gt=0).update(total_cards=F("total_cards") - 1)
     
     @classmethod
     def get_by_wallet_id(cls, wallet_id):
@@ -322,28 +571,33 @@ class Wallet(BalanceMixin, models.Model):
         Raises:
             DoesNotExist: When a Wallet with the given user or wallet_id does not exist (caught and returns None).
         """
-        qs = cls.objects.select_related('user', 'bank_account')
-        try:
-            if field_name == "bank":
-                return qs.get(bank_account=field_value)
-            if field_name == "user":
-                return qs.get(user=field_value)
-            if field_name == "wallet_id":
-                return qs.get(wallet_id=field_value)
-        except cls.DoesNotExist:
-            return None
+        # on the shard of the user or bank account, and cached, see `account.lookup_cache`.
+        # The user isn't cached, `wallet.user` is read when it's first used.
+        qs      = cls.objects.db_manager(hints={"instance": field_value}).select_related('user', 'bank_account')
+        related = ["bank_account"]
+
+        if field_name == "bank":
+            return cached_lookup(cls, "bank", field_value.pk, lambda: qs.get(bank_account=field_value),
+                                 field_value.user_id, related)
+        if field_name == "user":
+            user_id = getattr(field_value, "pk", field_value)
+            return cached_lookup(cls, "user", user_id, lambda: qs.for_user(field_value).get(user=field_value),
+                                 user_id, related)
+        if field_name == "wallet_id":
+            return cached_lookup(cls, "wallet_id", field_value, lambda: qs.get_from_any_shard(wallet_id=field_value),
+                                 related=related)
 
     @property
     def is_bank_connected(self):
         return self.bank_account is not None
     
-    def deduct_amount(self, amount: float) -> None:
-        super().deduct_amount(amount, WalletInsufficientFundsError)
+    def deduct_amount(self, amount: float, refresh: bool = False) -> None:
+        super().deduct_amount(amount, WalletInsufficientFundsError, refresh=refresh)
      
 
 
 
-class Profile(models.Model):
+class Profile(SaveChangedFieldsMixin, models.Model):
 
     class Gender(models.TextChoices):
         
@@ -378,6 +632,7 @@ class Profile(models.Model):
         DRAW_SIGNATURE   = "d", "Draw signature"
 
     profile_id               = models.CharField(max_length=64, unique=True, blank=True, null=True, db_index=True)
+    uid                      = TimeOrderedIdField(unique=True)
     first_name               = models.CharField(max_length=40)
     surname                  = models.CharField(max_length=40)
     email                    = models.EmailField(max_length=40, blank=True)
@@ -387,12 +642,14 @@ class Profile(models.Model):
     postcode                 = models.CharField(max_length=10)
     gender                   = models.CharField(choices=Gender.choices, max_length=1)
     maritus_status           = models.CharField(choices=Maritus_Status.choices, max_length=4)
-    user                     = models.OneToOneField(User, on_delete=models.CASCADE, unique=True, db_index=True, related_name="profile")
+    user                     = models.OneToOneField(User, on_delete=models.CASCADE, unique=True, db_index=True, related_name="profile", db_constraint=False)
     identification_documents = models.CharField(choices=IdentificationType.choices, max_length=1)
     signature                = models.CharField(choices=Signature.choices, max_length=1)
     created_on               = models.DateTimeField(auto_now_add=True)
     modified_on              = models.DateTimeField(auto_now=True)
-    history                  = HistoricalRecords()
+
+    objects                  = ShardedManager()
+    history                  = PolicyHistoricalRecords(user_db_constraint=False)
 
     def __str__(self):
         if self.first_name and self.surname:
@@ -400,31 +657,283 @@ class Profile(models.Model):
     
     @classmethod
     def get_by_user(cls, user: User) -> Optional[User]:
-        try:
-            return cls.objects.get(user=user)
-        except cls.DoesNotExist:
-            return None
+        user_id = getattr(user, "pk", user)
+        return cached_lookup(cls, "user", user_id, lambda: cls.objects.for_user(user).get(user=user), user_id=user_id)
 
     def to_json(self):
        return profile_to_dict(self)
 
 
 
+class LedgerEntry(models.Model):
+    """
+    An append-only record of a single leg of a transfer.
+
+    Every transfer is written as two entries sharing the same `transfer_id`:
+    a debit against the account the money left and a credit against the
+    account it arrived in. Each entry carries the balance of its account
+    straight after the posting, so a statement or the balance at any point
+    in time is a range scan over the `(account_type, account_id, created_on)`
+    index instead of a diff over the historical tables.
+
+    Money arriving from outside the bank (e.g. funding a wallet) is debited
+    from an `EXTERNAL` account with `account_id` 0 and no running balance, so
+    every transfer still has two legs.
+
+    Entries are never updated or deleted. A mistake is corrected by posting
+    a new transfer that reverses it.
+    """
+
+    class Leg(models.TextChoices):
+        DEBIT  = "D", "Debit"
+        CREDIT = "C", "Credit"
+
+    class AccountType(models.TextChoices):
+        BANK_ACCOUNT = "B", "Bank account"
+        WALLET       = "W", "Wallet"
+        CARD         = "C", "Card"
+        EXTERNAL     = "E", "External"
+
+    EXTERNAL_ACCOUNT_ID = 0
+
+    transfer_id     = models.CharField(max_length=32, db_index=True, editable=False)
+    leg             = models.CharField(choices=Leg.choices, max_length=1, editable=False)
+    account_type    = models.CharField(choices=AccountType.choices, max_length=1, editable=False)
+    account_id      = models.PositiveBigIntegerField(editable=False)
+    amount          = models.DecimalField(max_digits=10, decimal_places=2, validators=[MinValueValidator(0)], editable=False)
+    running_balance = models.DecimalField(max_digits=10, decimal_places=2, blank=True, null=True, editable=False)
+    created_on      = models.DateTimeField(default=timezone.now, editable=False)
+
+    class Meta:
+        verbose_name_plural = "Ledger entries"
+        indexes = [
+            models.Index(fields=["account_type", "account_id", "created_on"]),
+        ]
+
+    def __str__(self):
+        return f"{self.get_leg_display()} {self.amount} ({self.transfer_id})"
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            raise LedgerEntryIsImmutableError()
+        super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        raise LedgerEntryIsImmutableError()
+
+    @classmethod
+    def get_account_type(cls, account) -> str:
+        account_types = {
+            BankAccount: cls.AccountType.BANK_ACCOUNT,
+            Wallet: cls.AccountType.WALLET,
+            Card: cls.AccountType.CARD,
+        }
+        try:
+            return account_types[account if isinstance(account, type) else type(account)]
+        except KeyError:
+            raise ValueError(f"Ledger entries can only be recorded for a bank account, wallet or card but got type {type(account)}")
+
+    @classmethod
+    def get_by_account(cls, account):
+        """
+        Return the entries for a bank account, wallet or card, oldest first.
+
+        The returned queryset can be narrowed further by `created_on` and still
+        be answered from the `(account_type, account_id, created_on)` index.
+        While the data is sharded, it reads the shard holding the account.
+        """
+        return cls._get_ledger(account).filter(account_type=cls.get_account_type(account),
+                                               account_id=account.pk,
+                                               ).order_by("created_on", "id")
+
+    @classmethod
+    def record_transfer(cls, source, target, amount: float, transfer_id: str = None) -> list["LedgerEntry"]:
+        """
+        Write the debit and credit legs of a transfer in a single INSERT.
+
+        `source` and `target` must already hold their post-transfer balances,
+        they are copied into `running_balance`. The entries are written to
+        the database holding `source`, which must also hold `target`.
+
+        Returns:
+            list[LedgerEntry]: The debit entry followed by the credit entry.
+        """
+        transfer_id = transfer_id or token_hex(16)
+        created_on  = timezone.now()
+        amount      = BalanceMixin._to_decimal(amount)
+
+        entries = [
+            cls(transfer_id=transfer_id,
+                leg=cls.Leg.DEBIT,
+                account_type=cls.get_account_type(source),
+                account_id=source.pk,
+                amount=amount,
+                running_balance=source.amount,
+                created_on=created_on,
+                ),
+            cls(transfer_id=transfer_id,
+                leg=cls.Leg.CREDIT,
+                account_type=cls.get_account_type(target),
+                account_id=target.pk,
+                amount=amount,
+                running_balance=target.amount,
+                created_on=created_on,
+                ),
+        ]
+        return cls._get_ledger(source).bulk_create(entries)
+
+    @classmethod
+    def record_deposit(cls, account, amount: float, transfer_id: str = None) -> list["LedgerEntry"]:
+        """
+        Write the legs of money arriving from outside the bank into `account`.
+
+        The debit leg is booked against the external account, the credit leg
+        against `account`, which must already hold its post-deposit balance.
+        Both legs are written in a single INSERT.
+        """
+        transfer_id = transfer_id or token_hex(16)
+        created_on  = timezone.now()
+        amount      = BalanceMixin._to_decimal(amount)
+
+        entries = [
+            cls(transfer_id=transfer_id,
+                leg=cls.Leg.DEBIT,
+                account_type=cls.AccountType.EXTERNAL,
+                account_id=cls.EXTERNAL_ACCOUNT_ID,
+                amount=amount,
+                created_on=created_on,
+                ),
+            cls(transfer_id=transfer_id,
+                leg=cls.Leg.CREDIT,
+                account_type=cls.get_account_type(account),
+                account_id=account.pk,
+                amount=amount,
+                running_balance=account.amount,
+                created_on=created_on,
+                ),
+        ]
+        return cls._get_ledger(account).bulk_create(entries)
+
+    @classmethod
+    def _get_ledger(cls, account) -> models.QuerySet:
+        """The entries of the database holding `account`, its shard while the data is sharded"""
+        return cls.objects.using(shard_for_account(account)) if get_shards() else cls.objects.all()
+
+
+
+class NumberSequence(models.Model):
+    """
+    A named counter that hands out blocks of numbers, e.g. for account numbers.
+
+    A process reserves a whole block with a single UPDATE and then issues the
+    numbers from memory (see `account.utils.allocators.BlockAllocator`), so
+    the row is touched once per block rather than once per number, and two
+    processes can never be given overlapping blocks.
+    """
+    name       = models.CharField(max_length=50, unique=True)
+    next_value = models.PositiveBigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.name} ({self.next_value})"
+
+    @classmethod
+    def reserve_block(cls, name: str, size: int, first_value: int = 0) -> range:
+        """
+        Reserve the next `size` numbers of the sequence called `name`.
+
+        The sequence is created, starting at `first_value`, the first time it is
+        used. The UPDATE takes the row lock before the new value is read back,
+        so concurrent callers are serialised and always get disjoint blocks.
+
+        Args:
+            name (str): The name of the sequence.
+            size (int): The number of values to reserve.
+            first_value (int): The first value of a sequence that doesn't exist yet.
+
+        Returns:
+            range: The reserved values.
+        """
+        if size <= 0:
+            raise ValueError(f"The block size must be a positive number, got {size}")
+
+        with transaction.atomic():
+            if not cls.objects.filter(name=name).update(next_value=F("next_value") + size):
+                try:
+                    with transaction.atomic():
+                        cls.objects.create(name=name, next_value=first_value + size)
+                except IntegrityError:
+                    # created by a concurrent caller in the meantime
+                    cls.objects.filter(name=name).update(next_value=F("next_value") + size)
+
+            next_value = cls.objects.values_list("next_value", flat=True).get(name=name)
+
+        return range(next_value - size, next_value)
+
+
+
+class TransferInstruction(NamedTuple):
+    """A single posting for `TransferService.bulk_transfer`."""
+    source: Any
+    target: Any
+    amount: Decimal
+
+
+
+class TransferResult(NamedTuple):
+    """
+    The outcome of one `TransferInstruction`.
+
+    `index` is the position of the instruction in the input, `transfer_id` is
+    shared with the instruction's ledger entries and is None when the
+    instruction was rejected, in which case `error` holds the reason.
+    """
+    index: int
+    success: bool
+    transfer_id: Optional[str] = None
+    error: Optional[Exception] = None
+
+
+
 class TransferService:
+    """
+    Moves money between bank accounts, wallets and cards.
+
+    Each transfer runs in one database transaction: the source is debited and
+    the target credited with conditional UPDATEs (see `BalanceMixin`), and both
+    legs are written to the `LedgerEntry` table. If any step fails, nothing is
+    applied.
+
+    While the data is sharded, the transaction is opened on the shard holding
+    the accounts, which also holds their ledger entries. A transfer between
+    accounts on two shards is refused with `CrossShardTransferError`, as the
+    two shards can't commit together.
+    """
+
+    # The order in which bulk transfers lock accounts, and the error raised when each can't cover a debit
+    _lock_order = (BankAccount, Wallet, Card)
+    _insufficient_funds_errors = {
+        BankAccount: BankInsufficientFundsError,
+        Wallet: WalletInsufficientFundsError,
+        Card: CardInsufficientFundsError,
+    }
 
     @classmethod
     def transfer_from_card_to_bank(cls, card: Card, bank_account: BankAccount, amount: float) -> bool:
         cls._validate_card(card)
         cls._validate_bank_account(bank_account)
         cls._is_amount_valid(amount)
+        return cls._transfer(card, bank_account, amount)
     
     @classmethod
-    def transfer_from_bank_to_wallet(cls, bank_account: BankAccount, wallet: Wallet, amount: float):
+    def transfer_from_bank_to_wallet(cls, bank_account: BankAccount, wallet: Wallet, amount: float) -> bool:
         cls._validate_bank_account(bank_account)
         cls._validate_wallet(wallet)
         cls._is_amount_valid(amount)
 
-         # to be added
+        if not wallet.is_bank_connected:
+            raise BankAccountIsNotConnectedToWalletError()
+        
+        return cls._transfer(bank_account, wallet, amount)
 
     @classmethod
     def transfer_from_wallet_to_bank(cls, bank_account: BankAccount, wallet: Wallet, amount: float) -> bool:
@@ -435,21 +944,241 @@ class TransferService:
         if not wallet.is_bank_connected:
             raise BankAccountIsNotConnectedToWalletError()
         
-        wallet.deduct_amount(amount)
-        bank_account.add_amount(amount)
-        return True
+        return cls._transfer(wallet, bank_account, amount)
         
-
     @classmethod
-    def transfer_funds_between_cards(cls, source_card: Card, target_card: Card, amount):
+    def transfer_funds_between_cards(cls, source_card: Card, target_card: Card, amount) -> bool:
         cls._validate_card(source_card)
         cls._validate_card(target_card)
         cls._is_amount_valid(amount)
+        return cls._transfer(source_card, target_card, amount)
+
+    @classmethod
+    def fund_account(cls, account, amount: float, refresh: bool = True) -> bool:
+        """
+        Credit `account` with money arriving from outside the bank.
+
+        The balance is raised with one conditional UPDATE and the deposit is
+        recorded in the ledger with one INSERT, both in the same transaction
+        on the database holding the account.
+
+        Args:
+            account (BankAccount | Wallet | Card): The account to fund.
+            amount (float | int | Decimal): The amount to add, must be greater than zero.
+            refresh (bool): Re-read the balance after the UPDATE so the ledger records
+                            the stored value. A caller that already holds the row
+                            lock (`select_for_update`) knows the balance is exact
+                            and can pass False to save the query.
+        """
+        if type(account) not in cls._insufficient_funds_errors:
+            raise TypeError(f"Expected a bank account, wallet or card but got type {type(account)}")
+        cls._is_amount_valid(amount)
+
+        with immediate_atomic(using=shard_for_account(account)):
+            account.add_amount(amount, refresh=refresh)
+            LedgerEntry.record_deposit(account, amount)
+        return True
+
+    @classmethod
+    def bulk_transfer(cls, instructions: Iterable[TransferInstruction], batch_size: int = 500) -> list[TransferResult]:
+        """
+        Apply thousands of transfers in a single transaction.
+
+        Intended for payroll-style and batch settlement jobs, where calling a
+        single transfer method per row would cost several queries each. Instead:
+
+            1. Every affected account is loaded once, locked with
+               `select_for_update` in a deterministic (model, pk) order so two
+               concurrent batches can never deadlock on each other.
+            2. The instructions are validated and applied in input order against
+               those preloaded balances in memory, so a later row can spend money
+               credited by an earlier one.
+            3. The new balances are written with batched UPDATEs, one history row
+               is bulk-written per changed account, and both ledger legs of every
+               accepted instruction are inserted in batches.
+
+        A rejected instruction (wrong account type, invalid amount, insufficient
+        funds, accounts on two shards...) does not abort the batch, it is
+        reported and skipped. While the data is sharded, one transaction is
+        opened per shard involved, and each commits on its own.
+
+        Args:
+            instructions (Iterable[TransferInstruction | tuple]): `(source, target, amount)`
+                        postings where source and target are bank accounts, wallets or cards.
+            batch_size (int): The number of rows written per INSERT/UPDATE statement.
+
+        Returns:
+            list[TransferResult]: One result per instruction, in input order.
+        """
+        instructions = [TransferInstruction(*instruction) for instruction in instructions]
+        results      = []
+        entries      = {}   # database -> ledger rows
+        created_on   = timezone.now()
+        databases    = sorted({shard_for_account(account)
+                               for instruction in instructions
+                               for account in (instruction.source, instruction.target)
+                               if type(account) in cls._insufficient_funds_errors
+                               })
+
+        # the accounts are read before any balance is written, so the write lock is taken up front
+        with immediate_atomic_on(*databases):
+            accounts = cls._lock_accounts(instructions)
+            changed  = {}
+
+            for index, (source, target, amount) in enumerate(instructions):
+                try:
+                    source, target, amount = cls._validate_bulk_instruction(accounts, source, target, amount)
+                except (TypeError, ValueError, IncorrectBankTypeError, IncorrectWalletTypeError, IncorrectCardTypeError,
+                        CrossShardTransferError) as e:
+                    results.append(TransferResult(index, False, error=e))
+                    continue
+
+                if source.amount < amount:
+                    error = cls._insufficient_funds_errors[type(source)]()
+                    results.append(TransferResult(index, False, error=error))
+                    continue
+
+                source.amount -= amount
+                target.amount += amount
+
+                for account in (source, target):
+                    account.modified_on = created_on
+                    changed[(type(account), account.pk)] = account
+
+                transfer_id = token_hex(16)
+                entries.setdefault(source._state.db, []).extend([
+                    (transfer_id, LedgerEntry.Leg.DEBIT, LedgerEntry.get_account_type(source), source.pk, amount, source.amount),
+                    (transfer_id, LedgerEntry.Leg.CREDIT, LedgerEntry.get_account_type(target), target.pk, amount, target.amount),
+                ])
+                results.append(TransferResult(index, True, transfer_id=transfer_id))
+
+            for using in databases:
+                for model in cls._lock_order:
+                    changed_accounts = [account for (account_model, _), account in changed.items()
+                                        if account_model is model and account._state.db == using]
+                    if changed_accounts:
+                        cls._bulk_update_balances(model, changed_accounts, created_on, batch_size, using)
+                        with use_shard(using):
+                            model.history.bulk_history_create(changed_accounts, batch_size=batch_size,
+                                                              update=True, default_date=created_on
+                                                              )
+
+                cls._bulk_insert_ledger_entries(entries.get(using, []), created_on, batch_size, using)
+
+        return results
+
+    @staticmethod
+    def _bulk_update_balances(model, accounts: list, modified_on, batch_size: int, using: str) -> None:
+        """
+        Write the new balances with one prepared UPDATE executed per batch.
+
+        `bulk_update` would build a `CASE WHEN id = ... THEN ...` expression for
+        every row, which dominates the cost of a large batch. A plain
+        `executemany` of a parameterised statement does the same job far cheaper.
+        """
+        connection  = connections[using]
+        qn          = connection.ops.quote_name
+        modified_on = model._meta.get_field("modified_on").get_db_prep_save(modified_on, connection)
+        sql         = (f"UPDATE {qn(model._meta.db_table)} SET {qn('amount')} = %s, {qn('modified_on')} = %s "
+                       f"WHERE {qn(model._meta.pk.column)} = %s")
+
+        with connection.cursor() as cursor:
+            for start in range(0, len(accounts), batch_size):
+                cursor.executemany(sql, [(account.amount, modified_on, account.pk)
+                                         for account in accounts[start:start + batch_size]])
+
+    @staticmethod
+    def _bulk_insert_ledger_entries(entries: list[tuple], created_on, batch_size: int, using: str) -> None:
+        """
+        Insert ledger rows from plain tuples with one prepared INSERT per batch.
+
+        Building a `LedgerEntry` instance per leg and going through `bulk_create`
+        costs more than the INSERT itself for tens of thousands of rows.
+        """
+        connection = connections[using]
+        qn         = connection.ops.quote_name
+        columns    = ["transfer_id", "leg", "account_type", "account_id", "amount", "running_balance", "created_on"]
+        created_on = LedgerEntry._meta.get_field("created_on").get_db_prep_save(created_on, connection)
+        sql        = (f"INSERT INTO {qn(LedgerEntry._meta.db_table)} ({', '.join(qn(column) for column in columns)}) "
+                      f"VALUES ({', '.join(['%s'] * len(columns))})")
+
+        with connection.cursor() as cursor:
+            for start in range(0, len(entries), batch_size):
+                cursor.executemany(sql, [(*entry, created_on) for entry in entries[start:start + batch_size]])
+
+    @classmethod
+    def _lock_accounts(cls, instructions: list[TransferInstruction]) -> dict:
+        """
+        Load and lock every account referenced by `instructions` with one query per model and database.
+
+        Returns:
+            dict: `(model, pk) -> instance` for every account that still exists.
+        """
+        pks = {}
+        for instruction in instructions:
+            for account in (instruction.source, instruction.target):
+                if type(account) in cls._insufficient_funds_errors:
+                    pks.setdefault((shard_for_account(account), type(account)), set()).add(account.pk)
+
+        accounts = {}
+        for using in sorted({using for using, _ in pks}):
+            for model in cls._lock_order:
+                if pks.get((using, model)):
+                    qs = model.objects.using(using).select_for_update().filter(pk__in=pks[(using, model)]).order_by("pk")
+                    accounts.update(((model, account.pk), account) for account in qs)
+        return accounts
+
+    @classmethod
+    def _validate_bulk_instruction(cls, accounts: dict, source, target, amount) -> tuple:
+        """
+        Validate one bulk instruction and swap its accounts for the locked instances.
+        """
+        cls._is_amount_valid(amount)
+
+        for account in (source, target):
+            if type(account) not in cls._insufficient_funds_errors:
+                raise TypeError(f"Expected a bank account, wallet or card but got type {type(account)}")
+
+        source = accounts.get((type(source), source.pk))
+        target = accounts.get((type(target), target.pk))
+
+        if source is None or target is None:
+            raise ValueError("The account does not exist")
+        if source is target:
+            raise ValueError("The source and target accounts must be different")
+        if source._state.db != target._state.db:
+            raise CrossShardTransferError()
+        
+        # rounded to the precision of the amount columns, as the ORM would when saving
+        return source, target, BalanceMixin._to_decimal(amount).quantize(Decimal("0.01"))
+
+    @staticmethod
+    def _transfer(source, target, amount: float) -> bool:
+        """
+        Debit `source`, credit `target` and record both ledger legs atomically.
+
+        Both instances are refreshed after their UPDATE so that the ledger
+        records the balances actually stored, not a possibly stale in-memory value.
+
+        Raises:
+            CrossShardTransferError: If `source` and `target` are held on different shards.
+        """
+        using = shard_for_account(source)
+        if shard_for_account(target) != using:
+            raise CrossShardTransferError()
+
+        with immediate_atomic(using=using):
+            source.deduct_amount(amount, refresh=True)
+            target.add_amount(amount, refresh=True)
+            LedgerEntry.record_transfer(source, target, amount)
+        return True
 
     @staticmethod
     def _is_amount_valid(amount: float) -> bool:
-        if not isinstance(amount, (float, int)):
+        if isinstance(amount, bool) or not isinstance(amount, (float, int, Decimal)):
             raise TypeError(f"The amount must be type float, int or decimal but got type {type(amount)}")
+        if amount <= 0:
+            raise ValueError(f"The amount to transfer must be greater than zero but got {amount}")
         return True
 
     @staticmethod
@@ -464,5 +1193,6 @@ class TransferService:
 
     @staticmethod
     def _validate_card(card: Card):
-        pass
+        if not isinstance(card, Card):
+            raise IncorrectCardTypeError()
 
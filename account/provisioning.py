@@ -0,0 +1,191 @@
+import csv
+import json
+import time
+from itertools import islice
+from secrets import token_hex
+from typing import Iterable, Iterator, NamedTuple, TextIO
+
+from django.contrib.auth.hashers import make_password, UNUSABLE_PASSWORD_PREFIX
+from django.db import DEFAULT_DB_ALIAS
+from django.utils import timezone
+
+from authentication.models import User
+from utils.sqlite import immediate_atomic_on
+from .models import Profile, BankAccount, Wallet
+from .sharding import get_shards, shard_for_user, use_shard
+from .utils.allocators import account_number_allocator, sort_code_allocator
+
+
+PROFILE_FIELDS = ["mobile", "country", "state", "postcode", "gender", "maritus_status",
+                  "identification_documents", "signature"]
+
+
+class ProvisioningResult(NamedTuple):
+    created: int
+    skipped: int
+    elapsed: float
+
+    @property
+    def throughput(self) -> float:
+        return self.created / self.elapsed if self.elapsed else 0.0
+
+
+def read_users(file: TextIO, file_format: str = None) -> Iterator[dict]:
+    """
+    Lazily read users from a CSV file with a header row or a JSON Lines file.
+
+    Args:
+        file (TextIO): The open file.
+        file_format (str): Either "csv" or "jsonl". Guessed from the file name if not given.
+
+    Returns:
+        Iterator[dict]: One dictionary per user, read as the iterator is consumed.
+    """
+    file_format = file_format or ("jsonl" if getattr(file, "name", "").endswith((".jsonl", ".json")) else "csv")
+
+    if file_format == "csv":
+        return iter(csv.DictReader(file))
+    if file_format == "jsonl":
+        return (json.loads(line) for line in file if line.strip())
+
+    raise ValueError(f"Unsupported file format '{file_format}', expected 'csv' or 'jsonl'")
+
+
+def provision_users(rows: Iterable[dict], chunk_size: int = 1000, on_chunk=None) -> ProvisioningResult:
+    """
+    Create users together with their profile, bank account and wallet in bulk.
+
+    Creating a `Profile` one at a time fires `create_bank_and_wallet`, which
+    costs a nested transaction and two inserts plus their history rows per
+    user. Here every model is written with one `bulk_create` per chunk, with
+    the ids the `pre_save` signals would have generated computed up front and
+    the matching history rows written with `bulk_history_create`.
+
+    `rows` is consumed one chunk at a time, so memory use depends on the
+    chunk size and not on how many users are provisioned. Each chunk is its
+    own transaction, on `default` and on every shard. The accounts of a user
+    are created on their shard. Rows whose username or email is already
+    taken, or that repeat one earlier in the same chunk, are skipped.
+
+    Each row needs `username`, `email`, `first_name` and `surname`, and may
+    have a `password` and the profile fields in `PROFILE_FIELDS`. Users
+    without a password are given an unusable one.
+
+    Args:
+        rows (Iterable[dict]): The users to create.
+        chunk_size (int): The number of users written per transaction.
+        on_chunk (callable): Called with the running `ProvisioningResult` after every chunk.
+
+    Returns:
+        ProvisioningResult: How many users were created and skipped, and how long it took.
+    """
+    if chunk_size <= 0:
+        raise ValueError(f"The chunk size must be a positive number, got {chunk_size}")
+
+    rows    = iter(rows)
+    created = 0
+    skipped = 0
+    start   = time.perf_counter()
+
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            break
+
+        valid_rows = _remove_duplicate_and_existing_users(chunk)
+        skipped   += len(chunk) - len(valid_rows)
+
+        if valid_rows:
+            with immediate_atomic_on(DEFAULT_DB_ALIAS, *get_shards()):
+                _create_users_and_accounts(valid_rows)
+            created += len(valid_rows)
+
+        if on_chunk is not None:
+            on_chunk(ProvisioningResult(created=created, skipped=skipped, elapsed=time.perf_counter() - start))
+
+    return ProvisioningResult(created=created, skipped=skipped, elapsed=time.perf_counter() - start)
+
+
+def _remove_duplicate_and_existing_users(chunk: list[dict]) -> list[dict]:
+    usernames = {(row.get("username") or "").lower() for row in chunk}
+    emails    = {(row.get("email") or "").lower() for row in chunk}
+
+    taken_usernames = set(User.objects.filter(username__in=usernames).values_list("username", flat=True))
+    taken_emails    = set(User.objects.filter(email__in=emails).values_list("email", flat=True))
+
+    valid_rows = []
+    for row in chunk:
+        username = (row.get("username") or "").lower()
+        email    = (row.get("email") or "").lower()
+
+        if not username or not email or username in taken_usernames or email in taken_emails:
+            continue
+
+        taken_usernames.add(username)
+        taken_emails.add(email)
+        valid_rows.append(row)
+
+    return valid_rows
+
+
+def _make_password(password: str) -> str:
+    if password:
+        return make_password(password)
+    # the same format `make_password(None)` produces, without its per-call cost
+    return UNUSABLE_PASSWORD_PREFIX + token_hex(20)
+
+
+def _create_users_and_accounts(rows: list[dict]) -> None:
+    now = timezone.now()
+
+    users = User.objects.bulk_create([
+        User(username=row["username"].lower(),
+             email=row["email"].lower(),
+             first_name=row.get("first_name", ""),
+             surname=row.get("surname", ""),
+             password=_make_password(row.get("password")),
+             )
+        for row in rows
+    ])
+    User.history.bulk_history_create(users, default_date=now)
+
+    # the account data of every user goes to their shard, `default` while the data isn't sharded
+    by_shard = {}
+    for user, row in zip(users, rows):
+        by_shard.setdefault(shard_for_user(user), []).append((user, row))
+
+    for using, users_and_rows in by_shard.items():
+        _create_accounts(using, users_and_rows, now)
+
+
+def _create_accounts(using: str, users_and_rows: list[tuple], now) -> None:
+    users = [user for user, _ in users_and_rows]
+
+    profiles = Profile.objects.using(using).bulk_create([
+        Profile(user=user,
+                profile_id=token_hex(),
+                first_name=user.first_name,
+                surname=user.surname,
+                email=user.email,
+                **{field: row.get(field) or "" for field in PROFILE_FIELDS},
+                )
+        for user, row in users_and_rows
+    ])
+
+    account_numbers = account_number_allocator.allocate_many(len(users))
+    sort_codes      = sort_code_allocator.allocate_many(len(users))
+
+    bank_accounts = BankAccount.objects.using(using).bulk_create([
+        BankAccount(user=user, bank_id=token_hex(), account_number=account_number, sort_code=sort_code)
+        for user, account_number, sort_code in zip(users, account_numbers, sort_codes)
+    ])
+
+    wallets = Wallet.objects.using(using).bulk_create([
+        Wallet(user=user, bank_account=bank_account, wallet_id=token_hex())
+        for user, bank_account in zip(users, bank_accounts)
+    ])
+
+    # `bulk_history_create` can't be given a database
+    with use_shard(using):
+        for model, objs in ((Profile, profiles), (BankAccount, bank_accounts), (Wallet, wallets)):
+            model.history.bulk_history_create(objs, default_date=now)
@@ -0,0 +1,487 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import lru_cache
+from hashlib import blake2b
+from typing import Callable, Iterable, NamedTuple, Optional
+
+from django.apps import apps
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ImproperlyConfigured
+from django.db import DEFAULT_DB_ALIAS, connections, models, router, transaction
+from django.db.models.constants import LOOKUP_SEP, OnConflict
+
+from utils.sqlite import immediate_atomic_on
+
+
+# The models kept on the shard of their user, each with its history table, and the
+# ledger entries, kept on the shard of the accounts they are booked against
+SHARDED_MODELS = ("Profile", "BankAccount", "Wallet", "Card")
+SHARDED_LABELS = {f"account.{name.lower()}" for name in SHARDED_MODELS} | \
+                 {f"account.historical{name.lower()}" for name in SHARDED_MODELS} | \
+                 {"account.ledgerentry"}
+
+# The ids of the rows created on the Nth shard start at N * SHARD_ID_SPACING, so a row
+# keeps its id when it moves to another shard. Rows created before sharding are below it.
+SHARD_ID_SPACING = 10 ** 12
+
+# Rows deleted per statement when a user is moved
+MOVE_BATCH_SIZE = 500
+
+_current_shard = ContextVar("current_account_shard", default=None)
+
+
+class UserMove(NamedTuple):
+    """The rows of a user moved from one database to another by `rebalance_shards`"""
+    user_id: int
+    source: str
+    target: str
+    rows: int
+
+
+def get_shards() -> list[str]:
+    """Returns the database aliases of the shards, or an empty list if the account data isn't sharded"""
+    shards  = list(getattr(settings, "ACCOUNT_SHARDS", None) or [])
+    missing = [alias for alias in shards if alias not in connections.settings]
+    if missing:
+        raise ImproperlyConfigured(f"ACCOUNT_SHARDS lists databases that aren't in DATABASES: {', '.join(missing)}")
+    return shards
+
+
+def is_sharded(model) -> bool:
+    return model._meta.label_lower in SHARDED_LABELS
+
+
+def get_sharded_models() -> list:
+    """Returns the sharded models and their history models"""
+    return [model for model in apps.get_models() if is_sharded(model)]
+
+
+def shard_for_user(user) -> str:
+    """
+    Returns the alias of the database holding the account data of `user`, a User or its id.
+
+    The shard is picked with rendezvous hashing: every shard scores a hash
+    of its alias and the user id, and the highest score wins. Unlike
+    `hash(user_id) % N`, adding a shard only moves the users the new shard
+    wins, about 1/N of them, and the order of `ACCOUNT_SHARDS` doesn't matter.
+
+    Returns `default` when the account data isn't sharded.
+    """
+    shards = get_shards()
+    if not shards:
+        return DEFAULT_DB_ALIAS
+    return _pick_shard(str(getattr(user, "pk", user)), tuple(shards))
+
+
+def shard_for_account(account) -> str:
+    """
+    Returns the alias of the database holding `account`, a bank account, wallet or
+    card, and so its ledger entries. Usually the shard of its user, but an account
+    created before the data was sharded stays on `default` until it is moved.
+    """
+    shards = get_shards()
+    if not shards:
+        return DEFAULT_DB_ALIAS
+    if account._state.db in shards or account._state.db == DEFAULT_DB_ALIAS:
+        return account._state.db
+    return router.db_for_write(type(account), instance=account) or DEFAULT_DB_ALIAS
+
+
+@contextmanager
+def use_shard(alias: str):
+    """
+    Send the queries of the sharded models that don't say which shard they're for to `alias`.
+
+    For code that can't be given a database, e.g. simple-history's
+    `bulk_history_create`. Does nothing while the data isn't sharded.
+
+    Example usage:
+
+        with use_shard(shard_for_account(wallet)):
+            Wallet.history.bulk_history_create([wallet], update=True)
+    """
+    token = _current_shard.set(alias)
+    try:
+        yield
+    finally:
+        _current_shard.reset(token)
+
+
+@lru_cache(maxsize=65536)
+def _pick_shard(user_id: str, shards: tuple) -> str:
+    return max(shards, key=lambda alias: blake2b(f"{alias}:{user_id}".encode(), digest_size=8).digest())
+
+
+class ShardedQuerySet(models.QuerySet):
+
+    def for_user(self, user) -> "ShardedQuerySet":
+        """
+        Send the query to the shard of `user`, a User or its id.
+
+        Example usage:
+
+            wallet = Wallet.objects.for_user(request.user).get(user=request.user)
+        """
+        if not get_shards():
+            return self._chain()
+        return self.using(shard_for_user(user))
+
+    def create(self, **kwargs):
+        """
+        Like `QuerySet.create`, but the object is saved to the shard of its user.
+
+        A plain `create` saves to the database of the queryset, which the
+        routers pick without knowing the object. Passing `using()` still wins.
+        """
+        if self._db is not None or not get_shards():
+            return super().create(**kwargs)
+        return super().using(router.db_for_write(self.model, instance=self.model(**kwargs))).create(**kwargs)
+
+    def get_from_any_shard(self, **lookups):
+        """
+        `get()` for a lookup that doesn't say whose the object is, e.g. a wallet_id.
+
+        The shards are searched in turn, so it costs up to one query per shard.
+        Prefer `for_user` whenever the user is known.
+
+        Raises:
+            DoesNotExist: If no shard holds a matching object.
+        """
+        shards = get_shards()
+        if not shards:
+            return self.get(**lookups)
+
+        for alias in shards:
+            try:
+                return self.using(alias).get(**lookups)
+            except self.model.DoesNotExist:
+                continue
+        raise self.model.DoesNotExist(f"{self.model._meta.object_name} matching query does not exist.")
+
+    def select_related(self, *fields):
+        """
+        Like `QuerySet.select_related`, but a relation that leaves the shard,
+        e.g. `user`, is left out while the data is sharded, as it can't be
+        joined. It is loaded from its own database when it's accessed.
+        """
+        if not get_shards() or not fields or fields == (None,):
+            return super().select_related(*fields)
+
+        local = [field for field in fields if self._is_on_the_shard(field)]
+        return super().select_related(*local) if local else self._chain()
+
+    def _is_on_the_shard(self, path: str) -> bool:
+        model = self.model
+        for name in path.split(LOOKUP_SEP):
+            model = model._meta.get_field(name).related_model
+            if model is None or not is_sharded(model):
+                return False
+        return True
+
+
+class ShardedManager(models.Manager.from_queryset(ShardedQuerySet)):
+    """
+    The manager of the sharded account models.
+
+    Behaves as a plain manager while `ACCOUNT_SHARDS` is empty. Once the data
+    is sharded, a query has to say which shard it's for, with `for_user`, or
+    search them all, with `get_from_any_shard`. A query that does neither
+    goes to `default`.
+    """
+
+
+class AccountShardRouter:
+    """
+    Keeps the account data of every user on the shard `shard_for_user` picks for them.
+
+    The router can only tell the shard of a query from an instance: the one
+    being saved, e.g. `Wallet.objects.create(user=user)`, or the one whose
+    relations are followed, e.g. `user.profile` or `wallet.cards.all()`. An
+    object loaded from a database is always written back to it. Every other
+    query of a sharded model goes to the shard of a `use_shard()` block, or
+    falls through to the next router, so lookups go through
+    `ShardedManager.for_user` or `get_from_any_shard` instead.
+
+    Only the sharded models are migrated on the shards, the rest of the
+    schema stays on `default`.
+
+    Inert while `ACCOUNT_SHARDS` is empty.
+    """
+
+    def db_for_read(self, model, **hints):
+        return self._get_shard(model, hints.get("instance"))
+
+    def db_for_write(self, model, **hints):
+        return self._get_shard(model, hints.get("instance"))
+
+    def allow_relation(self, obj1, obj2, **hints):
+        shards = get_shards()
+        # `_meta` rather than `type()`, `request.user` is a lazy object
+        if not shards or not (is_sharded(obj1) or is_sharded(obj2)):
+            return None
+
+        if is_sharded(obj1) and is_sharded(obj2):
+            return obj1._state.db == obj2._state.db
+        # e.g. a wallet and its user
+        return {obj1._state.db, obj2._state.db} <= {DEFAULT_DB_ALIAS, *shards}
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db not in get_shards():
+            return None
+        return model_name is not None and f"{app_label}.{model_name}" in SHARDED_LABELS
+
+    def _get_shard(self, model, instance) -> Optional[str]:
+        shards = get_shards()
+        if not shards or not is_sharded(model):
+            return None
+        if not isinstance(instance, models.Model):
+            return _current_shard.get()
+
+        if isinstance(instance, get_user_model()):
+            return shard_for_user(instance.pk)
+        if not is_sharded(type(instance)):
+            return None
+
+        if instance._state.db in shards or instance._state.db == DEFAULT_DB_ALIAS:
+            return instance._state.db
+        if getattr(instance, "user_id", None) is not None:
+            return shard_for_user(instance.user_id)
+
+        # a card follows its wallet or bank account
+        for name in ("wallet", "bank_account"):
+            related = instance._state.fields_cache.get(name)
+            if related is not None and related._state.db in shards:
+                return related._state.db
+        return None
+
+
+def prepare_shard(alias: str) -> None:
+    """
+    Start the ids of the sharded tables of `alias` at the shard's own offset.
+
+    The Nth alias in `ACCOUNT_SHARDS` creates its rows from `N * SHARD_ID_SPACING`
+    up, so ids are unique across the shards and `rebalance_shards` can move
+    rows without renumbering them, or the ledger entries pointing at them.
+    Append new shards to `ACCOUNT_SHARDS`, never reorder it.
+
+    Safe to run more than once, it never lowers a sequence. Runs after every
+    `migrate` of a shard.
+    """
+    shards = get_shards()
+    if alias not in shards:
+        raise ValueError(f"'{alias}' isn't one of the shards in ACCOUNT_SHARDS")
+
+    connection = connections[alias]
+    if connection.vendor != "sqlite":
+        raise ValueError(f"Only SQLite shards are supported, '{alias}' is {connection.vendor}")
+
+    offset = (shards.index(alias) + 1) * SHARD_ID_SPACING
+
+    with transaction.atomic(using=alias), connection.cursor() as cursor:
+        for model in get_sharded_models():
+            table = model._meta.db_table
+            cursor.execute("UPDATE sqlite_sequence SET seq = MAX(seq, %s) WHERE name = %s", [offset, table])
+            if not cursor.rowcount:
+                cursor.execute("INSERT INTO sqlite_sequence (name, seq) VALUES (%s, %s)", [table, offset])
+
+
+def prepare_shard_after_migrate(sender, using=DEFAULT_DB_ALIAS, **kwargs):
+    if using in get_shards():
+        prepare_shard(using)
+
+
+def rebalance_shards(user_ids: Iterable[int] = None,
+                     dry_run: bool = False,
+                     on_move: Callable[[UserMove], None] = None,
+                     ) -> list[UserMove]:
+    """
+    Move the rows of every user that isn't on the shard `shard_for_user` picks for them.
+
+    Run it after adding a shard to `ACCOUNT_SHARDS`, and once when sharding is
+    turned on to move the rows created on `default` before.
+
+    Example usage:
+
+        rebalance_shards(on_move=lambda move: print(f"user {move.user_id}: {move.source} -> {move.target}"))
+
+    Args:
+        user_ids (Iterable[int]): Only look at these users. Every user if None.
+        dry_run (bool): Only report the moves, with the number of rows each would move.
+        on_move (Callable): Called with every `UserMove` once it's done.
+
+    Returns:
+        list[UserMove]: The moves made, or that would be made on a dry run.
+    """
+    shards = get_shards()
+    if not shards:
+        raise ValueError("The account data isn't sharded, set ACCOUNT_SHARDS")
+
+    if not dry_run:
+        for alias in shards:
+            prepare_shard(alias)
+
+    user_ids = None if user_ids is None else set(user_ids)
+    moves    = []
+
+    for source in dict.fromkeys([DEFAULT_DB_ALIAS, *shards]):
+        for user_id in sorted(_get_user_ids(source, user_ids)):
+            target = shard_for_user(user_id)
+            if target == source:
+                continue
+
+            if dry_run:
+                rows = sum(queryset.count() for _, queryset in _get_user_rows(user_id, source))
+            else:
+                rows = move_user(user_id, source, target)
+
+            move = UserMove(user_id, source, target, rows)
+            moves.append(move)
+            if on_move:
+                on_move(move)
+    return moves
+
+
+def move_user(user_id: int, source: str, target: str) -> int:
+    """
+    Move the profile, bank accounts, wallets and cards of a user, their history and ledger entries, from `source` to `target`.
+
+    The write locks of `source` and `target` are taken before the rows are
+    read, then the rows are deleted on `source` and copied to `target` with
+    their ids unchanged, and the delete is only committed once the copy is.
+    A write to the user's rows on `source` while they're being moved
+    therefore either commits before the move reads them or waits for it,
+    and fails with "database is locked" if the move outlasts its busy timeout. If the delete can't be committed
+    after the copy was, running the move again finishes it: rows already on
+    `target` are left as they are.
+
+    Returns:
+        int: The number of rows moved.
+    """
+    moved = 0
+
+    # both write locks are taken before the rows are read
+    with immediate_atomic_on(source, target):
+        copies = []
+        for model, queryset in _get_user_rows(user_id, source):
+            fields = model._meta.local_concrete_fields
+            rows   = list(queryset.values_list(*[field.attname for field in fields]))
+            copies.append((model, fields, rows))
+
+        for model, fields, rows in copies:
+            _delete_rows(model, [row[fields.index(model._meta.pk)] for row in rows], source)
+
+        for model, fields, rows in copies:
+            _copy_rows(model, fields, rows, target)
+            moved += len(rows)
+
+    return moved
+
+
+def delete_user_data(user_id: int) -> int:
+    """
+    Delete the profile, bank accounts and wallets of a deleted user from every shard.
+
+    Deleting a user only cascades on `default`, the database of the user, so
+    the `post_delete` handler of the user calls this once the delete is
+    committed. The rows are deleted with `delete()`, which cascades to their
+    cards as on `default` and writes their history. The ledger entries are
+    kept, they're the record of the money that moved.
+
+    Returns:
+        int: The number of rows deleted, including the cascaded ones.
+    """
+    from .models import BankAccount, Profile, Wallet
+
+    deleted = 0
+    for alias in get_shards():
+        with transaction.atomic(using=alias):
+            for model in (Profile, BankAccount, Wallet):
+                deleted += model._base_manager.using(alias).filter(user_id=user_id).delete()[0]
+    return deleted
+
+
+def _get_user_ids(using: str, user_ids: Optional[set]) -> set:
+    from .models import BankAccount, Profile, Wallet
+
+    found = set()
+    for model in (Profile, BankAccount, Wallet):
+        queryset = model._base_manager.using(using).exclude(user_id=None)
+        if user_ids is not None:
+            queryset = queryset.filter(user_id__in=user_ids)
+        found.update(queryset.values_list("user_id", flat=True).distinct())
+    return found
+
+
+def _get_user_rows(user_id: int, using: str) -> list[tuple]:
+    """
+    Returns `(model, queryset)` for every table holding rows of the user on `using`,
+    parents before children, and the ledger entries last.
+    """
+    from .models import BankAccount, Card, LedgerEntry, Profile, Wallet
+
+    profiles = set(Profile._base_manager.using(using).filter(user_id=user_id).values_list("pk", flat=True))
+    banks    = set(BankAccount._base_manager.using(using).filter(user_id=user_id).values_list("pk", flat=True))
+    wallets  = set(Wallet._base_manager.using(using)
+                                       .filter(models.Q(user_id=user_id) | models.Q(bank_account__in=banks))
+                                       .values_list("pk", flat=True))
+    cards    = set(Card._base_manager.using(using)
+                                     .filter(models.Q(wallet__in=wallets) | models.Q(bank_account__in=banks))
+                                     .values_list("pk", flat=True))
+
+    rows = []
+    for model, pks in ((Profile, profiles), (BankAccount, banks), (Wallet, wallets), (Card, cards)):
+        history = model.history.model._base_manager.using(using).filter(**{f"{model._meta.pk.attname}__in": pks})
+        if hasattr(model, "user_id"):
+            # including the history of the user's deleted objects
+            history = history | model.history.model._base_manager.using(using).filter(user_id=user_id)
+
+        rows.append((model, model._base_manager.using(using).filter(pk__in=pks)))
+        rows.append((model.history.model, history))
+
+    # the entries of the user's accounts, and the external legs of the deposits into them
+    ledger   = LedgerEntry._base_manager.using(using)
+    accounts = (models.Q(account_type=LedgerEntry.AccountType.BANK_ACCOUNT, account_id__in=banks)
+                | models.Q(account_type=LedgerEntry.AccountType.WALLET, account_id__in=wallets)
+                | models.Q(account_type=LedgerEntry.AccountType.CARD, account_id__in=cards))
+    deposits = models.Q(account_type=LedgerEntry.AccountType.EXTERNAL,
+                        transfer_id__in=ledger.filter(accounts).values("transfer_id"))
+    rows.append((LedgerEntry, ledger.filter(accounts | deposits)))
+    return rows
+
+
+def _copy_rows(model, fields: list, rows: list[tuple], using: str) -> None:
+    """
+    Insert rows read with `values_list` as they are, skipping those whose id is already taken.
+
+    A plain INSERT rather than `bulk_create`, which would reset the `auto_now`
+    timestamps and fill in missing values as for a new object.
+    """
+    if not rows:
+        return
+
+    connection = connections[using]
+    qn         = connection.ops.quote_name
+    columns    = ", ".join(qn(field.column) for field in fields)
+    sql        = (f"{connection.ops.insert_statement(on_conflict=OnConflict.IGNORE)} {qn(model._meta.db_table)} ({columns}) "
+                  f"VALUES ({', '.join(['%s'] * len(fields))}) "
+                  f"{connection.ops.on_conflict_suffix_sql(fields, OnConflict.IGNORE, None, None)}")
+
+    with connection.cursor() as cursor:
+        cursor.executemany(sql, [[field.get_db_prep_save(value, connection) for field, value in zip(fields, row)]
+                                 for row in rows])
+
+
+def _delete_rows(model, pks: list, using: str) -> None:
+    """
+    Delete rows by id without `Model.delete()`, which would cascade, send
+    signals and write history rows for the rows being moved.
+    """
+    connection = connections[using]
+    qn         = connection.ops.quote_name
+
+    with connection.cursor() as cursor:
+        for start in range(0, len(pks), MOVE_BATCH_SIZE):
+            batch = pks[start:start + MOVE_BATCH_SIZE]
+            cursor.execute(f"DELETE FROM {qn(model._meta.db_table)} WHERE {qn(model._meta.pk.column)} "
+                           f"IN ({', '.join(['%s'] * len(batch))})", batch)
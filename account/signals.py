@@ -1,14 +1,18 @@
 import logging
 
-from django.db.models.signals import post_save, pre_save
+from django.db.models.signals import post_save, pre_save, post_delete
 from django.db import transaction, IntegrityError
 from django.core.exceptions import ValidationError
 
 from django.dispatch import receiver
 from secrets import token_hex
 
+from authentication.models import User
+from utils.history import batch_history
+from .lookup_cache import invalidate_account_lookups
 from .models import Profile, BankAccount, Wallet, Card
-from utils.generator import generate_code
+from .sharding import delete_user_data, get_shards
+from .utils.allocators import account_number_allocator, sort_code_allocator
 from .utils.errors import WalletCardLimitExceededError
 
 
@@ -21,9 +25,9 @@ def initialize_bank_account_fields(sender, instance, **kwargs):
     if not instance.bank_id:
         instance.bank_id = token_hex()
     if not instance.account_number:
-        instance.account_number = generate_code(9)
+        instance.account_number = account_number_allocator.allocate()
     if not instance.sort_code:
-        instance.sort_code = generate_code(6)
+        instance.sort_code = sort_code_allocator.allocate()
 
 
 
@@ -35,13 +39,15 @@ def initialize_card_id(sender, instance, **kwargs):
    
 
 @receiver(post_save, sender=Profile)
-def create_bank_and_wallet(sender, instance, created, **kwargs):
+def create_bank_and_wallet(sender, instance, created, using=None, **kwargs):
 
     if created:
 
         try:
 
-            with transaction.atomic():
+            # on the database of the profile, i.e. the shard of the user when the data is sharded, and
+            # a batch rather than a plain atomic block, so the history rows join those of the request
+            with batch_history(using=using):
                 bank_account = BankAccount.objects.create(user=instance.user)
                 Wallet.objects.create(user=instance.user, bank_account=bank_account)
 
@@ -78,3 +84,41 @@ def check_if_wallet_card_storage_has_exceeded(sender, instance, *args, **kwargs)
         instance.card_id = token_hex()
     
           
+
+
+@receiver(post_delete, sender=Card)
+def decrement_wallet_card_count(sender, instance, *args, using=None, **kwargs):
+    """
+    Release the card's slot in its wallet when the card is deleted.
+
+    A signal rather than `Card.delete()` so the counter is also kept right for
+    queryset deletes and cards removed by a cascade.
+    """
+    if instance.wallet_id is not None:
+        Wallet.decrement_card_count(instance.wallet_id, using=using)
+
+
+
+@receiver(post_save, sender=Profile)
+@receiver(post_save, sender=BankAccount)
+@receiver(post_save, sender=Wallet)
+@receiver(post_save, sender=Card)
+@receiver(post_delete, sender=Profile)
+@receiver(post_delete, sender=BankAccount)
+@receiver(post_delete, sender=Wallet)
+@receiver(post_delete, sender=Card)
+def invalidate_account_lookups_on_change(sender, instance, *args, using=None, **kwargs):
+    invalidate_account_lookups(instance, using=using)
+
+
+
+@receiver(post_delete, sender=User)
+def delete_account_data_on_the_shards(sender, instance, *args, using=None, **kwargs):
+    """
+    Delete the account data of a user from the shards, which the cascade of
+    `User.delete()` doesn't reach. Once the user's delete is committed, so a
+    rolled back delete leaves their accounts alone.
+    """
+    if get_shards():
+        user_id = instance.pk
+        transaction.on_commit(lambda: delete_user_data(user_id), using=using)
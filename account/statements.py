@@ -0,0 +1,239 @@
+import csv
+import heapq
+import json
+import zlib
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+from typing import Iterable, Iterator, NamedTuple, Optional
+
+from django.utils import timezone
+
+from authentication.models import User
+from .models import BankAccount, Wallet, LedgerEntry
+from .sharding import get_shards, shard_for_account
+
+
+STATEMENT_COLUMNS  = ["posted_on", "description", "reference", "debit", "credit", "balance"]
+STATEMENT_FORMATS  = {"csv": "text/csv", "jsonl": "application/x-ndjson"}
+STATEMENT_ACCOUNTS = {"bank": (BankAccount, "bank_id"), "wallet": (Wallet, "wallet_id")}
+
+# bytes collected before a chunk is handed to the response or file
+STREAM_CHUNK_SIZE = 64 * 1024
+
+
+class StatementLine(NamedTuple):
+    posted_on:   datetime
+    description: str
+    reference:   str
+    debit:       Optional[Decimal]
+    credit:      Optional[Decimal]
+    balance:     Decimal
+
+
+def get_statement_account(account_type: str, account_id: str, user: User = None):
+    """
+    Return the bank account or wallet with the public `account_id`, or None.
+
+    Args:
+        account_type (str): Either "bank" or "wallet".
+        account_id (str): The `bank_id` or `wallet_id` of the account.
+        user (User): Only return the account if it belongs to this user.
+    """
+    if account_type not in STATEMENT_ACCOUNTS:
+        raise ValueError(f"Unsupported account type '{account_type}', expected 'bank' or 'wallet'")
+
+    model, id_field = STATEMENT_ACCOUNTS[account_type]
+    if user is not None:
+        return model.objects.for_user(user).filter(user=user, **{id_field: account_id}).first()
+
+    try:
+        return model.objects.get_from_any_shard(**{id_field: account_id})
+    except model.DoesNotExist:
+        return None
+
+
+def parse_statement_range(start: Optional[str], end: Optional[str]) -> tuple:
+    """
+    Turn the `YYYY-MM-DD` dates of a statement into the datetimes it covers.
+
+    Both days are included, so the range stops at midnight after `end`.
+
+    Returns:
+        tuple: `(start, end)` in the current timezone, None where no date was given.
+    """
+    try:
+        start_date = date.fromisoformat(start) if start else None
+        end_date   = date.fromisoformat(end) if end else None
+    except ValueError:
+        raise ValueError("The start and end dates must be in the format YYYY-MM-DD")
+
+    if start_date and end_date and start_date > end_date:
+        raise ValueError("The start date must not be after the end date")
+
+    return (timezone.make_aware(datetime.combine(start_date, time.min)) if start_date else None,
+            timezone.make_aware(datetime.combine(end_date + timedelta(days=1), time.min)) if end_date else None,
+            )
+
+
+def get_statement_lines(account, start: datetime = None, end: datetime = None, chunk_size: int = 2000) -> Iterator[StatementLine]:
+    """
+    Lazily yield the activity of a bank account or wallet between `start` and `end`.
+
+    Postings come from the ledger. Balance changes made by a `save()`, e.g.
+    an account being opened with money in it or an adjustment in the admin,
+    only exist in the history, so the two are read side by side, each with
+    `.iterator(chunk_size=...)`, and merged by date. A history row that
+    doesn't change the balance is left out. If `start` is given, the first
+    line is the opening balance at `start`.
+
+    Args:
+        account (BankAccount | Wallet): The account.
+        start (datetime): The first moment included. From the start of the account if None.
+        end (datetime): The moment the statement stops, exclusive. Up to now if None.
+        chunk_size (int): The number of rows fetched from the database at a time.
+
+    Returns:
+        Iterator[StatementLine]: The lines, oldest first.
+    """
+    balance = Decimal("0.00")
+
+    if start is not None:
+        balance = account.balance_at(start - timedelta(microseconds=1)) or balance
+        yield StatementLine(start, "Opening balance", "", None, None, balance)
+
+    # simple-history doesn't send `account.history` to the database of the account
+    using   = shard_for_account(account) if get_shards() else None
+    ledger  = LedgerEntry.get_by_account(account)
+    history = account.history.using(using).order_by("history_date", "history_id")
+
+    if start is not None:
+        ledger, history = ledger.filter(created_on__gte=start), history.filter(history_date__gte=start)
+    if end is not None:
+        ledger, history = ledger.filter(created_on__lt=end), history.filter(history_date__lt=end)
+
+    # on a tie the ledger comes first, so the history row of a bulk transfer is recognised as unchanged
+    postings = ((posted_on, 0, row) for posted_on, *row in ledger.values_list(
+        "created_on", "transfer_id", "leg", "amount", "running_balance").iterator(chunk_size=chunk_size))
+    changes  = ((changed_on, 1, row) for changed_on, *row in history.values_list(
+        "history_date", "history_type", account.amount_field).iterator(chunk_size=chunk_size))
+
+    for posted_on, source, row in heapq.merge(postings, changes, key=lambda item: item[:2]):
+        if source == 0:
+            transfer_id, leg, amount, running_balance = row
+            is_debit = leg == LedgerEntry.Leg.DEBIT
+            balance  = running_balance
+            yield StatementLine(posted_on, "Transfer out" if is_debit else "Transfer in", transfer_id,
+                                amount if is_debit else None, None if is_debit else amount, balance)
+            continue
+
+        history_type, amount = row
+        if history_type == "-" or amount == balance:
+            continue
+
+        change  = amount - balance
+        balance = amount
+        yield StatementLine(posted_on, "Account opened" if history_type == "+" else "Balance adjustment", "",
+                            -change if change < 0 else None, change if change > 0 else None, balance)
+
+
+def stream_statement(account,
+                     start: datetime = None,
+                     end: datetime = None,
+                     file_format: str = "csv",
+                     compress: bool = False,
+                     chunk_size: int = 2000) -> Iterator[bytes]:
+    """
+    Stream the statement of a bank account or wallet as CSV or JSON Lines.
+
+    Lines are formatted one at a time and handed out in chunks of about
+    `STREAM_CHUNK_SIZE` bytes, compressed on the fly if `compress` is set,
+    so memory use is the same for a week and for several years of activity.
+    Suitable as the content of a `StreamingHttpResponse`.
+
+    Example usage:
+
+        response = StreamingHttpResponse(stream_statement(wallet, compress=True),
+                                         content_type="application/gzip")
+
+    Args:
+        account (BankAccount | Wallet): The account.
+        start (datetime): The first moment included. From the start of the account if None.
+        end (datetime): The moment the statement stops, exclusive. Up to now if None.
+        file_format (str): Either "csv" or "jsonl".
+        compress (bool): gzip the output.
+        chunk_size (int): The number of rows fetched from the database at a time.
+
+    Returns:
+        Iterator[bytes]: The encoded statement.
+    """
+    if file_format not in STATEMENT_FORMATS:
+        raise ValueError(f"Unsupported file format '{file_format}', expected 'csv' or 'jsonl'")
+
+    lines  = get_statement_lines(account, start=start, end=end, chunk_size=chunk_size)
+    text   = _format_csv(lines) if file_format == "csv" else _format_jsonl(lines)
+    chunks = _join_into_chunks(text)
+    return _gzip_chunks(chunks) if compress else chunks
+
+
+def get_statement_filename(account, start: datetime = None, end: datetime = None,
+                           file_format: str = "csv", compress: bool = False) -> str:
+    account_id = getattr(account, "bank_id", None) or getattr(account, "wallet_id", None) or account.pk
+    dates      = [f"{start:%Y-%m-%d}" if start else "opened",
+                  f"{end - timedelta(days=1):%Y-%m-%d}" if end else f"{timezone.localdate():%Y-%m-%d}"]
+    return f"statement-{str(account_id)[:8]}-{'-to-'.join(dates)}.{file_format}{'.gz' if compress else ''}"
+
+
+class _Echo:
+    """A file-like object that returns what is written to it, for `csv.writer`"""
+
+    def write(self, value: str) -> str:
+        return value
+
+
+def _format_amount(amount: Optional[Decimal]) -> str:
+    return "" if amount is None else f"{amount:.2f}"
+
+
+def _format_csv(lines: Iterable[StatementLine]) -> Iterator[str]:
+    writer = csv.writer(_Echo())
+    yield writer.writerow(STATEMENT_COLUMNS)
+
+    for line in lines:
+        yield writer.writerow([line.posted_on.isoformat(), line.description, line.reference,
+                               _format_amount(line.debit), _format_amount(line.credit), _format_amount(line.balance)])
+
+
+def _format_jsonl(lines: Iterable[StatementLine]) -> Iterator[str]:
+    for line in lines:
+        yield json.dumps({"posted_on": line.posted_on.isoformat(),
+                          "description": line.description,
+                          "reference": line.reference,
+                          "debit": _format_amount(line.debit) or None,
+                          "credit": _format_amount(line.credit) or None,
+                          "balance": _format_amount(line.balance),
+                          }) + "\n"
+
+
+def _join_into_chunks(text: Iterable[str]) -> Iterator[bytes]:
+    buffer = []
+    size   = 0
+
+    for piece in text:
+        buffer.append(piece)
+        size += len(piece)
+        if size >= STREAM_CHUNK_SIZE:
+            yield "".join(buffer).encode("utf-8")
+            buffer, size = [], 0
+
+    if buffer:
+        yield "".join(buffer).encode("utf-8")
+
+
+def _gzip_chunks(chunks: Iterable[bytes]) -> Iterator[bytes]:
+    compressor = zlib.compressobj(6, zlib.DEFLATED, zlib.MAX_WBITS | 16)
+
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
@@ -0,0 +1,118 @@
+from django.db import transaction
+from django.test import TestCase, override_settings
+
+from ..models import BankAccount, NumberSequence
+from ..utils.allocators import BlockAllocator, account_number_allocator, sort_code_allocator
+from ..utils.errors import NumberSequenceExhaustedError
+from authentication.models import User
+from utils.generator import is_luhn_valid
+
+
+class BlockAllocatorTest(TestCase):
+
+    def setUp(self):
+        self.user      = User.objects.create(
+                                first_name="Test name",
+                                surname="Test surname",
+                                username="Test username",
+                                email="test@example.com",
+                                pin="1234"
+                                )
+        self.allocator = self.create_allocator()
+
+    def create_allocator(self, **kwargs):
+        options = {"digits": 8, "checksum": True, "block_size": 100}
+        options.update(kwargs)
+        return BlockAllocator("test_account_number", BankAccount, "account_number", **options)
+
+    def test_numbers_are_unique_fixed_width_and_carry_a_check_digit(self):
+        numbers = self.allocator.allocate_many(250)
+
+        self.assertEqual(len(set(numbers)), 250)
+        self.assertTrue(all(len(number) == 8 for number in numbers))
+        self.assertTrue(all(is_luhn_valid(number) for number in numbers))
+
+    def test_numbers_are_issued_from_memory_within_a_block(self):
+        # the rest of a block reserved in a transaction is shared once it commits
+        with self.captureOnCommitCallbacks(execute=True):
+            self.allocator.allocate()
+
+        with self.assertNumQueries(0):
+            self.allocator.allocate_many(99)
+
+    def test_allocators_sharing_a_sequence_get_disjoint_blocks(self):
+        """Two allocators on one sequence behave like two processes"""
+
+        other_allocator = self.create_allocator()
+
+        numbers       = self.allocator.allocate_many(150)
+        other_numbers = other_allocator.allocate_many(150)
+
+        self.assertFalse(set(numbers) & set(other_numbers))
+        self.assertEqual(NumberSequence.objects.get(name="test_account_number").next_value, 300)
+
+    def test_numbers_already_in_use_are_skipped(self):
+        taken = self.allocator.format(1)
+        BankAccount.objects.create(user=self.user, account_number=taken, sort_code="400147")
+
+        self.assertNotIn(taken, self.create_allocator(block_size=10).allocate_many(9))
+
+    def test_block_reserved_in_a_rolled_back_transaction_is_discarded(self):
+        try:
+            with transaction.atomic():
+                rolled_back = self.allocator.allocate()
+                raise RuntimeError
+        except RuntimeError:
+            pass
+
+        # the reservation was rolled back with the transaction, so the same block is reserved again
+        self.assertEqual(self.allocator.allocate(), rolled_back)
+
+    def test_block_reserved_in_a_rolled_back_savepoint_is_discarded(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            try:
+                with transaction.atomic():
+                    rolled_back = self.allocator.allocate()
+                    raise RuntimeError
+            except RuntimeError:
+                pass
+
+            self.assertEqual(self.allocator.allocate(), rolled_back)
+
+    def test_a_transaction_draws_its_numbers_from_the_block_it_reserved(self):
+        with transaction.atomic():
+            for _ in range(3):
+                self.allocator.allocate_many(60)
+
+        # 180 numbers from two blocks of 100, not a block per allocation
+        self.assertEqual(NumberSequence.objects.get(name="test_account_number").next_value, 200)
+
+    @override_settings(ACCOUNT_NUMBER_BLOCK_SIZE=50)
+    def test_bank_accounts_created_in_one_transaction_share_a_block(self):
+        for allocator in (account_number_allocator, sort_code_allocator):
+            allocator.reset()
+        before = self._next_values()
+
+        with transaction.atomic():
+            for _ in range(5):
+                BankAccount.objects.create(user=self.user)
+
+        self.assertEqual([after - value for after, value in zip(self._next_values(), before)], [50, 50])
+
+    def _next_values(self) -> list[int]:
+        return [NumberSequence.objects.filter(name=name).values_list("next_value", flat=True).first() or 0
+                for name in ("account_number", "sort_code")]
+
+    def test_running_out_of_numbers_raises_error(self):
+        allocator = self.create_allocator(digits=2, block_size=5)
+        allocator.allocate_many(10)
+
+        with self.assertRaises(NumberSequenceExhaustedError):
+            allocator.allocate()
+
+    def test_new_bank_account_is_given_an_account_number_and_sort_code(self):
+        bank_account = BankAccount.objects.create(user=self.user)
+
+        self.assertEqual(len(bank_account.account_number), 8)
+        self.assertTrue(is_luhn_valid(bank_account.account_number))
+        self.assertEqual(len(bank_account.sort_code), 6)
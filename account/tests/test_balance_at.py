@@ -0,0 +1,82 @@
+from datetime import datetime, timezone as dt_timezone
+from decimal import Decimal
+
+from freezegun import freeze_time
+from django.test import TestCase
+
+from ..models import BankAccount, Wallet, TransferService
+from authentication.models import User
+
+
+def at(day: str) -> datetime:
+    return datetime.fromisoformat(day).replace(tzinfo=dt_timezone.utc)
+
+
+class BalanceAtTest(TestCase):
+
+    def setUp(self):
+        with freeze_time("2025-01-01 09:00:00"), self.captureOnCommitCallbacks(execute=True):
+            self.user         = User.objects.create(
+                                    first_name="Test name",
+                                    surname="Test surname",
+                                    username="Test username",
+                                    email="test@example.com",
+                                    pin="1234"
+                                    )
+            self.bank_account = BankAccount.objects.create(bank_id="123456789",
+                                                           sort_code="400147",
+                                                           account_number="01232789",
+                                                           amount=100,
+                                                           user=self.user
+                                                           )
+            self.wallet       = Wallet.objects.create(wallet_id="123456789",
+                                                      user=self.user,
+                                                      bank_account=self.bank_account,
+                                                      amount=100,
+                                                      )
+
+        with freeze_time("2025-01-10 09:00:00"):
+            TransferService.transfer_from_wallet_to_bank(self.bank_account, self.wallet, 40)
+
+        with freeze_time("2025-01-20 09:00:00"), self.captureOnCommitCallbacks(execute=True):
+            TransferService.bulk_transfer([(self.bank_account, self.wallet, 10)])
+
+        with freeze_time("2025-02-01 09:00:00"), self.captureOnCommitCallbacks(execute=True):
+            bank_account        = BankAccount.objects.get(pk=self.bank_account.pk)
+            bank_account.amount = Decimal("500")
+            bank_account.save()
+
+    def test_balance_before_the_account_existed_is_unknown(self):
+        self.assertIsNone(self.bank_account.balance_at(at("2024-12-31")))
+
+    def test_balance_from_the_history_of_a_save(self):
+        self.assertEqual(self.bank_account.balance_at(at("2025-01-05")), 100)
+        self.assertEqual(self.bank_account.balance_at(at("2025-02-02")), 500)
+
+    def test_balance_from_the_running_balance_of_a_transfer(self):
+        self.assertEqual(self.bank_account.balance_at(at("2025-01-15")), 140)
+        self.assertEqual(self.wallet.balance_at(at("2025-01-15")), 60)
+
+    def test_balance_after_a_bulk_transfer(self):
+        self.assertEqual(self.bank_account.balance_at(at("2025-01-25")), 130)
+        self.assertEqual(self.wallet.balance_at(at("2025-01-25")), 70)
+
+    def test_a_posting_at_exactly_the_timestamp_is_included(self):
+        self.assertEqual(self.wallet.balance_at(at("2025-01-10 09:00:00")), 60)
+
+    def test_balances_of_many_accounts_in_one_query(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            other = BankAccount.objects.create(bank_id="987654321",
+                                               sort_code="400148",
+                                               account_number="01232790",
+                                               amount=5,
+                                               user=self.user
+                                               )
+
+        with self.assertNumQueries(1):
+            balances = BankAccount.balances_at([self.bank_account, other.pk], at("2025-01-15"))
+
+        self.assertEqual(balances, {self.bank_account.pk: 140, other.pk: None})
+
+    def test_balances_of_every_account(self):
+        self.assertEqual(Wallet.balances_at(timestamp=at("2025-01-25")), {self.wallet.pk: 70})
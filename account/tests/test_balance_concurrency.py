@@ -0,0 +1,163 @@
+import threading
+import time
+from decimal import Decimal
+
+from django.test import TransactionTestCase
+from django.db import connection, OperationalError
+
+from ..models import BankAccount, Wallet
+from authentication.models import User
+from ..utils.errors import BankInsufficientFundsError, WalletInsufficientFundsError
+
+
+NUM_OF_THREADS        = 8
+OPERATIONS_PER_THREAD = 25
+
+
+def run_in_threads(func, num_of_threads=NUM_OF_THREADS):
+    """
+    Run `func` in `num_of_threads` threads at the same time and wait for them all.
+
+    Every thread gets its own database connection, which is closed once the
+    thread is finished so the test database can be torn down afterwards.
+    """
+    barrier = threading.Barrier(num_of_threads)
+    errors  = []
+
+    def worker():
+        try:
+            barrier.wait()
+            func()
+        except Exception as e:
+            errors.append(e)
+        finally:
+            connection.close()
+
+    threads = [threading.Thread(target=worker) for _ in range(num_of_threads)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return errors
+
+
+def retry_if_locked(func, *args, **kwargs):
+    """
+    SQLite only allows one writer at a time, so a concurrent write can fail with
+    "database table is locked". Retrying is safe because the failed UPDATE
+    never touched the row.
+    """
+    while True:
+        try:
+            return func(*args, **kwargs)
+        except OperationalError as e:
+            if "locked" not in str(e):
+                raise
+            time.sleep(0.001)
+
+
+class BalanceConcurrencyTest(TransactionTestCase):
+
+    def setUp(self):
+        self.user = User.objects.create(
+                                first_name="Test name",
+                                surname="Test surname",
+                                username="Test username",
+                                email="test@example.com",
+                                pin="1234"
+                                )
+        self.bank_account = BankAccount.objects.create(bank_id="123456789",
+                                                       sort_code="400147",
+                                                       account_number="01232789",
+                                                       amount=0,
+                                                       user=self.user
+                                                       )
+        self.wallet = Wallet.objects.create(wallet_id="123456789",
+                                            user=self.user,
+                                            bank_account=self.bank_account,
+                                            amount=0,
+                                            )
+
+    def test_concurrent_deposits_are_not_lost(self):
+        """Every concurrent deposit must be reflected in the final balance"""
+
+        def deposit():
+            # each thread works on its own stale copy of the same row
+            bank_account = BankAccount.objects.get(pk=self.bank_account.pk)
+            for _ in range(OPERATIONS_PER_THREAD):
+                retry_if_locked(bank_account.add_amount, 1)
+
+        errors = run_in_threads(deposit)
+        self.assertEqual(errors, [])
+
+        self.bank_account.refresh_from_db()
+        self.assertEqual(self.bank_account.amount, NUM_OF_THREADS * OPERATIONS_PER_THREAD)
+
+    def test_concurrent_withdrawals_never_overdraw(self):
+        """Only as many withdrawals as the balance covers may succeed"""
+
+        STARTING_BALANCE = 50
+        self.wallet.add_amount(STARTING_BALANCE)
+
+        successful = []
+        rejected   = []
+
+        def withdraw():
+            wallet = Wallet.objects.get(pk=self.wallet.pk)
+            for _ in range(OPERATIONS_PER_THREAD):
+                try:
+                    retry_if_locked(wallet.deduct_amount, 1)
+                    successful.append(1)
+                except WalletInsufficientFundsError:
+                    rejected.append(1)
+
+        errors = run_in_threads(withdraw)
+        self.assertEqual(errors, [])
+
+        self.wallet.refresh_from_db()
+        self.assertEqual(self.wallet.amount, 0)
+        self.assertEqual(len(successful), STARTING_BALANCE)
+        self.assertEqual(len(rejected), NUM_OF_THREADS * OPERATIONS_PER_THREAD - STARTING_BALANCE)
+
+    def test_concurrent_deposits_and_withdrawals_balance_out(self):
+        """Interleaved deposits and withdrawals of the same size leave the balance unchanged"""
+
+        STARTING_BALANCE = 1000
+        self.bank_account.add_amount(STARTING_BALANCE)
+
+        def deposit_then_withdraw():
+            bank_account = BankAccount.objects.get(pk=self.bank_account.pk)
+            for _ in range(OPERATIONS_PER_THREAD):
+                retry_if_locked(bank_account.add_amount, Decimal("2.50"))
+                retry_if_locked(bank_account.deduct_amount, Decimal("2.50"))
+
+        errors = run_in_threads(deposit_then_withdraw)
+        self.assertEqual(errors, [])
+
+        self.bank_account.refresh_from_db()
+        self.assertEqual(self.bank_account.amount, STARTING_BALANCE)
+
+    def test_insufficient_funds_leaves_balance_untouched(self):
+        self.bank_account.add_amount(10)
+
+        with self.assertRaises(BankInsufficientFundsError):
+            self.bank_account.deduct_amount(11)
+
+        self.bank_account.refresh_from_db()
+        self.assertEqual(self.bank_account.amount, 10)
+
+    def test_refresh_reloads_the_stored_balance(self):
+        """A stale instance only sees other writers' changes when asked to refresh"""
+
+        stale_copy = BankAccount.objects.get(pk=self.bank_account.pk)
+        self.bank_account.add_amount(40)
+
+        stale_copy.add_amount(10)
+        self.assertEqual(stale_copy.amount, 10)
+
+        stale_copy.add_amount(10, refresh=True)
+        self.assertEqual(stale_copy.amount, 60)
+
+    def test_negative_amount_raises_error(self):
+        with self.assertRaises(ValueError):
+            self.wallet.add_amount(-10)
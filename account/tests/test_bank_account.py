@@ -219,3 +219,19 @@ class BankAccountTest(TestCase):
 
         the_exception = cm.exception
         self.assertEqual(str(the_exception), expected_message)
+
+    def test_the_insufficient_funds_message_shows_the_stored_balance(self):
+        bank_account = BankAccount.objects.create(bank_id="123456781012",
+                                                  sort_code="400124",
+                                                  account_number="01215988",
+                                                  amount=100,
+                                                  user=self.user
+                                                  )
+        BankAccount.objects.filter(pk=bank_account.pk).update(amount=30)
+
+        with self.assertRaises(BankInsufficientFundsError) as cm:
+            bank_account.deduct_amount(50)
+
+        self.assertEqual(str(cm.exception),
+                         "Insufficient amount for withdrawal, current amount: 30.00, withdrawal amount: 50, overdrawn: -20.00")
+        self.assertEqual(bank_account.amount, 30)
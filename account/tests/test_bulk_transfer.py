@@ -0,0 +1,91 @@
+from django.test import TestCase
+
+from freezegun import freeze_time
+
+
+from ..models import BankAccount, Wallet, LedgerEntry, TransferService, TransferInstruction
+from authentication.models import User
+from ..utils.errors import WalletInsufficientFundsError
+
+
+@freeze_time("2025-07-14 16:00:00")
+class BulkTransferTest(TestCase):
+
+    def setUp(self):
+        self.user          = User.objects.create(
+                                first_name="Test name",
+                                surname="Test surname",
+                                username="Test username",
+                                email="test@example.com",
+                                pin="1234"
+                                )
+        self.bank_accounts = [BankAccount.objects.create(bank_id=f"bank-{i}",
+                                                         sort_code=f"40014{i}",
+                                                         account_number=f"0123278{i}",
+                                                         amount=100,
+                                                         user=self.user,
+                                                         )
+                              for i in range(3)]
+        self.wallet        = Wallet.objects.create(wallet_id="123456789",
+                                                   user=self.user,
+                                                   bank_account=self.bank_accounts[0],
+                                                   amount=0,
+                                                   )
+
+    def test_bulk_transfer_applies_every_instruction(self):
+        instructions = [TransferInstruction(bank_account, self.wallet, 10) for bank_account in self.bank_accounts]
+
+        results = TransferService.bulk_transfer(instructions)
+
+        self.assertTrue(all(result.success for result in results))
+        self.assertEqual([result.index for result in results], [0, 1, 2])
+
+        self.wallet.refresh_from_db()
+        self.assertEqual(self.wallet.amount, 30)
+        for bank_account in self.bank_accounts:
+            bank_account.refresh_from_db()
+            self.assertEqual(bank_account.amount, 90)
+
+        self.assertEqual(LedgerEntry.objects.count(), 6)
+        self.assertEqual(list(LedgerEntry.get_by_account(self.wallet).values_list("running_balance", flat=True)), [10, 20, 30])
+
+    def test_bulk_transfer_reports_rejected_rows_and_applies_the_rest(self):
+        instructions = [
+            (self.bank_accounts[0], self.wallet, 60),
+            (self.wallet, self.bank_accounts[1], 100),  # the wallet only holds 60 at this point
+            (self.wallet, self.bank_accounts[1], 60),
+            (self.wallet, self.wallet, 1),
+            (self.bank_accounts[2], self.wallet, -5),
+        ]
+
+        results = TransferService.bulk_transfer(instructions)
+
+        self.assertEqual([result.success for result in results], [True, False, True, False, False])
+        self.assertIsInstance(results[1].error, WalletInsufficientFundsError)
+        self.assertIsInstance(results[3].error, ValueError)
+        self.assertIsInstance(results[4].error, ValueError)
+        self.assertIsNone(results[1].transfer_id)
+
+        self.wallet.refresh_from_db()
+        self.bank_accounts[1].refresh_from_db()
+        self.assertEqual(self.wallet.amount, 0)
+        self.assertEqual(self.bank_accounts[1].amount, 160)
+        self.assertEqual(LedgerEntry.objects.count(), 4)
+
+    def test_bulk_transfer_writes_one_history_row_per_changed_account(self):
+        history_before = BankAccount.history.count()
+
+        TransferService.bulk_transfer((self.bank_accounts[0], self.wallet, 1) for _ in range(50))
+
+        self.assertEqual(BankAccount.history.count(), history_before + 1)
+        self.assertEqual(BankAccount.history.latest("history_id").amount, 50)
+
+    def test_bulk_transfer_query_count_does_not_grow_with_rows(self):
+        """Locking, updating and the ledger insert are batched, so rows don't add queries"""
+
+        TransferService.bulk_transfer([(self.bank_accounts[0], self.wallet, 1)])
+
+        with self.assertNumQueries(9):
+            TransferService.bulk_transfer([(self.bank_accounts[0], self.wallet, 1)] * 5)
+        with self.assertNumQueries(9):
+            TransferService.bulk_transfer([(self.bank_accounts[0], self.wallet, 1)] * 50)
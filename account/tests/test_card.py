@@ -1,5 +1,7 @@
+from io import StringIO
 from secrets import token_hex
 from django.test import TestCase
+from django.core.management import call_command
 from django.db import IntegrityError
 from django.utils import timezone
 from django.core.exceptions import ValidationError
@@ -374,3 +376,55 @@ class CardTest(TestCase):
 
         
 
+
+    def test_total_cards_is_incremented_when_a_card_is_added(self):
+        self.wallet.refresh_from_db()
+        self.assertEqual(self.wallet.total_cards, 1)
+
+    def test_total_cards_is_decremented_when_a_card_is_deleted(self):
+        self.card.delete()
+
+        self.wallet.refresh_from_db()
+        self.assertEqual(self.wallet.total_cards, 0)
+
+    def test_total_cards_follows_a_card_moved_between_wallets(self):
+        other_wallet = Wallet.objects.create(wallet_id="987654321", user=self.user)
+
+        card = Card.objects.get(pk=self.card.pk)
+        card.wallet = other_wallet
+        card.save()
+
+        card.wallet = None
+        card.save()
+
+        self.wallet.refresh_from_db()
+        other_wallet.refresh_from_db()
+        self.assertEqual(self.wallet.total_cards, 0)
+        self.assertEqual(other_wallet.total_cards, 0)
+
+    def test_saving_a_card_without_moving_it_leaves_total_cards_alone(self):
+        card = Card.objects.get(pk=self.card.pk)
+        card.card_name = "Renamed"
+        card.save()
+
+        self.wallet.refresh_from_db()
+        self.assertEqual(self.wallet.total_cards, 1)
+
+    def test_card_limit_is_enforced_against_the_stored_counter(self):
+        """A stale wallet instance can't be used to slip past the limit"""
+
+        stale_wallet = Wallet.objects.get(pk=self.wallet.pk)
+        Wallet.objects.filter(pk=self.wallet.pk).update(total_cards=self.wallet.maximum_cards)
+
+        with self.assertRaises(WalletCardLimitExceededError):
+            create_test_card_model(card_id="#999", card_number="9999-9999-9999-9999", wallet=stale_wallet)
+
+        self.assertFalse(Card.objects.filter(card_id="#999").exists())
+
+    def test_reconcile_wallet_card_counts_repairs_drift(self):
+        Wallet.objects.filter(pk=self.wallet.pk).update(total_cards=3)
+
+        call_command("reconcile_wallet_card_counts", batch_size=1, stdout=StringIO())
+
+        self.wallet.refresh_from_db()
+        self.assertEqual(self.wallet.total_cards, 1)
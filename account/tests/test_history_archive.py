@@ -0,0 +1,110 @@
+import gzip
+import shutil
+import tempfile
+from datetime import datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from io import StringIO
+from pathlib import Path
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from ..models import BankAccount, Wallet
+from authentication.models import User
+from utils.history_archive import archive_history, read_history_archive
+
+
+class HistoryArchiveTest(TestCase):
+
+    def setUp(self):
+        self.archive_dir  = Path(tempfile.mkdtemp())
+        self.user         = User.objects.create(
+                                first_name="Test name",
+                                surname="Test surname",
+                                username="Test username",
+                                email="test@example.com",
+                                pin="1234"
+                                )
+        self.bank_account = BankAccount.objects.create(bank_id="123456789",
+                                                       sort_code="400147",
+                                                       account_number="01232789",
+                                                       amount=100,
+                                                       user=self.user
+                                                       )
+        self.wallet       = Wallet.objects.create(wallet_id="123456789",
+                                                  user=self.user,
+                                                  bank_account=self.bank_account,
+                                                  )
+        self.days         = [datetime(2024, 1, day, 12, 30, 15, 123456, tzinfo=dt_timezone.utc) for day in (1, 2, 3)]
+
+        # only the rows written by the tests, not the ones of the accounts' creation
+        Wallet.history.filter(id=self.wallet.pk).delete()
+        BankAccount.history.filter(id=self.bank_account.pk).delete()
+        for amount, day in zip((10, 20, 30), self.days):
+            self.wallet.amount = Decimal(amount)
+            Wallet.history.bulk_history_create([self.wallet], default_date=day)
+
+    def tearDown(self):
+        shutil.rmtree(self.archive_dir, ignore_errors=True)
+
+    def _wallet_history(self):
+        return Wallet.history.filter(id=self.wallet.pk).order_by("history_date")
+
+    def test_old_rows_are_moved_into_a_file_per_day(self):
+        result = archive_history(Wallet, before=datetime(2024, 6, 1, tzinfo=dt_timezone.utc), archive_dir=self.archive_dir)
+
+        self.assertEqual((result.model, result.archived, result.files), ("account.historicalwallet", 2, 2))
+
+        files = sorted(path.name for path in (self.archive_dir / "account" / "historicalwallet").iterdir())
+        self.assertEqual(files, ["2024-01-01.jsonl.gz", "2024-01-02.jsonl.gz"])
+
+        with gzip.open(self.archive_dir / "account" / "historicalwallet" / "2024-01-01.jsonl.gz", "rt") as file:
+            self.assertEqual(len(file.readlines()), 1)
+
+    def test_the_latest_row_of_every_object_is_kept(self):
+        archive_history(Wallet, before=datetime(2024, 6, 1, tzinfo=dt_timezone.utc), archive_dir=self.archive_dir)
+
+        self.assertEqual([row.amount for row in self._wallet_history()], [30])
+
+    def test_rows_after_the_cutoff_are_kept(self):
+        result = archive_history(Wallet, before=self.days[2], archive_dir=self.archive_dir)
+
+        self.assertEqual(result.archived, 1)
+        self.assertEqual([row.amount for row in self._wallet_history()], [20, 30])
+
+    def test_archived_rows_are_rehydrated_unchanged(self):
+        expected = [(row.history_id, row.history_date, row.amount, row.uid) for row in self._wallet_history()[:2]]
+
+        archive_history(Wallet, before=datetime(2024, 6, 1, tzinfo=dt_timezone.utc), archive_dir=self.archive_dir, batch_size=1)
+        rows = list(read_history_archive(Wallet, archive_dir=self.archive_dir))
+
+        self.assertEqual([(row.history_id, row.history_date, row.amount, row.uid) for row in rows], expected)
+        self.assertIsInstance(rows[0], Wallet.history.model)
+
+    def test_a_range_is_read_back(self):
+        archive_history(Wallet, before=datetime(2024, 6, 1, tzinfo=dt_timezone.utc), archive_dir=self.archive_dir)
+
+        rows = list(read_history_archive(Wallet, start=self.days[1], end=self.days[1] + timedelta(hours=1),
+                                         archive_dir=self.archive_dir))
+
+        self.assertEqual([row.amount for row in rows], [20])
+
+    def test_a_later_run_appends_to_the_same_day(self):
+        archive_history(Wallet, before=self.days[2], archive_dir=self.archive_dir)
+
+        self.wallet.amount = Decimal(40)
+        Wallet.history.bulk_history_create([self.wallet], default_date=self.days[0] + timedelta(hours=1))
+        archive_history(Wallet, before=datetime(2024, 6, 1, tzinfo=dt_timezone.utc), archive_dir=self.archive_dir)
+
+        rows = list(read_history_archive(Wallet, end=self.days[1], archive_dir=self.archive_dir))
+        self.assertEqual(sorted(row.amount for row in rows), [10, 40])
+
+    def test_the_command_archives_the_given_models(self):
+        BankAccount.history.bulk_history_create([self.bank_account, self.bank_account], default_date=self.days[0])
+        out = StringIO()
+        call_command("archive_history", "--model", "account.Wallet", "--older-than-days", "30",
+                     "--archive-dir", str(self.archive_dir), stdout=out)
+
+        self.assertIn("account.historicalwallet", out.getvalue())
+        self.assertEqual(self._wallet_history().count(), 1)
+        self.assertEqual(BankAccount.history.filter(id=self.bank_account.pk).count(), 2)
@@ -0,0 +1,156 @@
+import json
+
+from django.db import connection, transaction
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..models import BankAccount, Profile, Wallet
+from authentication.models import User
+from utils.history import batch_history
+
+
+class HistoryPolicyTest(TestCase):
+
+    def setUp(self):
+        self.user         = User.objects.create(
+                                first_name="Test name",
+                                surname="Test surname",
+                                username="Test username",
+                                email="test@example.com",
+                                pin="1234"
+                                )
+        self.bank_account = BankAccount.objects.create(bank_id="123456789",
+                                                       sort_code="400147",
+                                                       account_number="01232789",
+                                                       amount=100,
+                                                       user=self.user
+                                                       )
+        self.wallet       = Wallet.objects.create(wallet_id="123456789",
+                                                  user=self.user,
+                                                  bank_account=self.bank_account,
+                                                  amount=100,
+                                                  )
+
+    def _history_inserts(self, queries) -> list[str]:
+        return [query["sql"] for query in queries if query["sql"].startswith('INSERT INTO "account_historical')
+                                                   or query["sql"].startswith('INSERT INTO "authentication_historical')]
+
+    def test_history_is_written_at_the_end_of_the_batch(self):
+        history_count = Wallet.history.filter(id=self.wallet.pk).count()
+
+        with batch_history():
+            self.wallet.amount = 50
+            self.wallet.save()
+            self.assertEqual(Wallet.history.filter(id=self.wallet.pk).count(), history_count)
+
+        self.assertEqual(Wallet.history.filter(id=self.wallet.pk).count(), history_count + 1)
+        self.assertEqual(Wallet.history.filter(id=self.wallet.pk).latest().amount, 50)
+
+    def test_many_saves_are_written_with_one_insert_per_history_table(self):
+        with CaptureQueriesContext(connection) as queries:
+            with batch_history():
+                for amount in range(1, 11):
+                    self.wallet.amount = amount
+                    self.wallet.save()
+                    with batch_history():
+                        self.bank_account.amount = amount
+                        self.bank_account.save()
+
+        self.assertEqual(len(self._history_inserts(queries)), 2)
+        self.assertEqual(Wallet.history.filter(id=self.wallet.pk, history_type="~").count(), 10)
+        self.assertEqual(BankAccount.history.filter(id=self.bank_account.pk, history_type="~").count(), 10)
+
+    def test_a_batch_that_raises_writes_no_history(self):
+        history_count = Wallet.history.filter(id=self.wallet.pk).count()
+
+        with self.assertRaises(ValueError):
+            with batch_history():
+                self.wallet.amount = 50
+                self.wallet.save()
+                raise ValueError
+
+        self.assertEqual(Wallet.history.filter(id=self.wallet.pk).count(), history_count)
+
+    def test_an_unchanged_save_is_not_recorded(self):
+        history_count = User.history.count()
+
+        self.user.save(update_fields=["first_name"])
+
+        self.assertEqual(User.history.count(), history_count)
+
+    def test_untracked_wallet_fields_are_not_recorded(self):
+        history_count = Wallet.history.filter(id=self.wallet.pk).count()
+
+        self.wallet.total_cards = 2
+        self.wallet.save()
+
+        self.assertEqual(Wallet.history.filter(id=self.wallet.pk).count(), history_count)
+
+        self.wallet.maximum_cards = 5
+        self.wallet.save()
+
+        latest = Wallet.history.filter(id=self.wallet.pk).latest()
+        self.assertEqual(Wallet.history.filter(id=self.wallet.pk).count(), history_count + 1)
+        self.assertEqual((latest.maximum_cards, latest.total_cards), (5, 2))
+
+    def test_a_rolled_back_savepoint_writes_no_history(self):
+        history_count = Wallet.history.filter(id=self.wallet.pk).count()
+
+        with batch_history():
+            self.wallet.amount = 10
+            self.wallet.save()
+
+            for atomic in (transaction.atomic, batch_history):
+                try:
+                    with atomic():
+                        self.wallet.amount = 20
+                        self.wallet.save()
+                        raise ValueError
+                except ValueError:
+                    pass
+
+        amounts = list(Wallet.history.filter(id=self.wallet.pk).order_by("history_id").values_list("amount", flat=True))
+        self.assertEqual(len(amounts), history_count + 1)
+        self.assertEqual(amounts[-1], 10)
+
+    @override_settings(HISTORY_BATCH_SIZE=5)
+    def test_a_full_buffer_is_written_inside_the_transaction(self):
+        history_count = Wallet.history.filter(id=self.wallet.pk).count()
+
+        with batch_history():
+            for amount in range(1, 6):
+                self.wallet.amount = amount
+                self.wallet.save()
+            self.assertEqual(Wallet.history.filter(id=self.wallet.pk).count(), history_count + 5)
+
+            self.wallet.amount = 6
+            self.wallet.save()
+
+        self.assertEqual(Wallet.history.filter(id=self.wallet.pk).count(), history_count + 6)
+
+    @override_settings(HISTORY_SKIP_UNCHANGED=False, HISTORY_BATCH_WRITES=False)
+    def test_the_policies_can_be_switched_off(self):
+        history_count = Wallet.history.filter(id=self.wallet.pk).count()
+
+        self.wallet.total_cards = 2
+        self.wallet.save()
+        self.wallet.save(update_fields=["total_cards"])
+
+        self.assertEqual(Wallet.history.filter(id=self.wallet.pk).count(), history_count + 2)
+
+    def test_the_history_rows_of_a_profile_request_are_written_together_at_its_end(self):
+        user = User.objects.create(first_name="New", surname="User", username="new", email="new@example.com", pin="4321")
+        self.client.force_login(user)
+        data = {"firstName": "New", "surname": "User", "mobile": "07000000000", "gender": "F", "maritusStatus": "S",
+                "country": "UK", "state": "London", "postcode": "N1", "signature": "", "identificationDocuments": ""}
+
+        with CaptureQueriesContext(connection) as queries:
+            self.client.post(reverse("save_profile_details"), data=json.dumps(data), content_type="application/json")
+
+        inserts = [query["sql"] for query in queries if query["sql"].startswith("INSERT INTO")]
+        history = self._history_inserts(queries)
+        self.assertEqual(len(history), 3)   # the profile, its bank account and its wallet
+        # after every row of the request, rather than one after each row
+        self.assertEqual(inserts[-3:], history)
+        self.assertTrue(Profile.objects.filter(user=user).exists())
@@ -0,0 +1,51 @@
+from datetime import datetime, timedelta, timezone as dt_timezone
+from uuid import UUID
+
+from django.test import TestCase
+
+from ..models import BankAccount, Wallet
+from authentication.models import User
+from utils.generator import generate_time_ordered_id
+
+
+class TimeOrderedIdTest(TestCase):
+
+    def setUp(self):
+        self.user         = User.objects.create(
+                                first_name="Test name",
+                                surname="Test surname",
+                                username="Test username",
+                                email="test@example.com",
+                                pin="1234"
+                                )
+        self.bank_account = BankAccount.objects.create(user=self.user)
+
+    def test_generated_id_is_a_uuid_version_7(self):
+        uid = generate_time_ordered_id()
+
+        self.assertIsInstance(uid, UUID)
+        self.assertEqual(uid.version, 7)
+        self.assertEqual(uid.variant, "specified in RFC 4122")
+
+    def test_ids_sort_in_the_order_they_were_created(self):
+        start = datetime(2025, 7, 14, tzinfo=dt_timezone.utc)
+        uids  = [generate_time_ordered_id(start + timedelta(milliseconds=i)) for i in range(50)]
+
+        self.assertEqual(sorted(uids, key=lambda uid: uid.bytes), uids)
+
+    def test_every_row_gets_its_own_id(self):
+        other_account = BankAccount.objects.create(user=self.user)
+
+        self.assertIsInstance(self.bank_account.uid, UUID)
+        self.assertNotEqual(self.bank_account.uid, other_account.uid)
+
+    def test_id_round_trips_through_the_database(self):
+        stored = BankAccount.objects.get(pk=self.bank_account.pk)
+
+        self.assertEqual(stored.uid, self.bank_account.uid)
+        self.assertEqual(BankAccount.objects.get(uid=str(self.bank_account.uid)), self.bank_account)
+
+    def test_bulk_created_rows_get_distinct_ids(self):
+        wallets = Wallet.objects.bulk_create(Wallet(wallet_id=f"wallet-{i}", user=self.user) for i in range(10))
+
+        self.assertEqual(len({wallet.uid for wallet in wallets}), 10)
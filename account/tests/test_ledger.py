@@ -0,0 +1,123 @@
+from django.test import TestCase
+
+from freezegun import freeze_time
+
+
+from ..models import BankAccount, Wallet, Card, LedgerEntry, TransferService
+from authentication.models import User
+from ..utils.errors import (WalletInsufficientFundsError,
+                            LedgerEntryIsImmutableError,
+                            IncorrectCardTypeError,
+                            )
+
+
+@freeze_time("2025-07-14 16:00:00")
+class LedgerEntryTest(TestCase):
+
+    def setUp(self):
+        self.user         = User.objects.create(
+                                first_name="Test name",
+                                surname="Test surname",
+                                username="Test username",
+                                email="test@example.com",
+                                pin="1234"
+                                )
+        self.bank_account = BankAccount.objects.create(bank_id="123456789",
+                                                       sort_code="400147",
+                                                       account_number="01232789",
+                                                       amount=100,
+                                                       user=self.user
+                                                       )
+        self.wallet       = Wallet.objects.create(wallet_id="123456789",
+                                                  user=self.user,
+                                                  bank_account=self.bank_account,
+                                                  amount=100,
+                                                  )
+
+    def test_transfer_writes_debit_and_credit_legs(self):
+        TransferService.transfer_from_wallet_to_bank(self.bank_account, self.wallet, 40)
+
+        debit  = LedgerEntry.objects.get(leg=LedgerEntry.Leg.DEBIT)
+        credit = LedgerEntry.objects.get(leg=LedgerEntry.Leg.CREDIT)
+
+        self.assertEqual(LedgerEntry.objects.count(), 2)
+        self.assertEqual(debit.transfer_id, credit.transfer_id)
+
+        self.assertEqual(debit.leg, LedgerEntry.Leg.DEBIT)
+        self.assertEqual(debit.account_type, LedgerEntry.AccountType.WALLET)
+        self.assertEqual(debit.account_id, self.wallet.pk)
+        self.assertEqual(debit.amount, 40)
+        self.assertEqual(debit.running_balance, 60)
+
+        self.assertEqual(credit.leg, LedgerEntry.Leg.CREDIT)
+        self.assertEqual(credit.account_type, LedgerEntry.AccountType.BANK_ACCOUNT)
+        self.assertEqual(credit.account_id, self.bank_account.pk)
+        self.assertEqual(credit.amount, 40)
+        self.assertEqual(credit.running_balance, 140)
+
+    def test_transfer_from_bank_to_wallet(self):
+        TransferService.transfer_from_bank_to_wallet(self.bank_account, self.wallet, 25)
+
+        self.bank_account.refresh_from_db()
+        self.wallet.refresh_from_db()
+
+        self.assertEqual(self.bank_account.amount, 75)
+        self.assertEqual(self.wallet.amount, 125)
+        self.assertEqual(LedgerEntry.get_by_account(self.bank_account).get().leg, LedgerEntry.Leg.DEBIT)
+        self.assertEqual(LedgerEntry.get_by_account(self.wallet).get().leg, LedgerEntry.Leg.CREDIT)
+
+    def test_transfer_between_cards_and_to_bank(self):
+        source_card = Card.objects.create(card_name="John Doe", card_number="1234-1234-5678-1011", amount=50,
+                                          expiry_month="JAN", expiry_year=2030, card_options="V", card_type="D",
+                                          cvc="101", bank_account=self.bank_account
+                                          )
+        target_card = Card.objects.create(card_name="Jane Doe", card_number="1234-1234-5678-1012",
+                                          expiry_month="JAN", expiry_year=2030, card_options="V", card_type="D",
+                                          cvc="102", bank_account=self.bank_account
+                                          )
+
+        TransferService.transfer_funds_between_cards(source_card, target_card, 20)
+        TransferService.transfer_from_card_to_bank(target_card, self.bank_account, 5)
+
+        target_card.refresh_from_db()
+        self.assertEqual(target_card.amount, 15)
+        self.assertEqual(LedgerEntry.get_by_account(target_card).count(), 2)
+        self.assertEqual(LedgerEntry.get_by_account(self.bank_account).get().running_balance, 105)
+
+        with self.assertRaises(IncorrectCardTypeError):
+            TransferService.transfer_funds_between_cards(source_card, self.wallet, 1)
+
+    def test_failed_transfer_writes_nothing(self):
+        """If the source can't cover the amount, no balance or ledger row changes"""
+
+        with self.assertRaises(WalletInsufficientFundsError):
+            TransferService.transfer_from_wallet_to_bank(self.bank_account, self.wallet, 1000)
+
+        self.bank_account.refresh_from_db()
+        self.wallet.refresh_from_db()
+
+        self.assertEqual(self.bank_account.amount, 100)
+        self.assertEqual(self.wallet.amount, 100)
+        self.assertFalse(LedgerEntry.objects.exists())
+
+    def test_running_balance_follows_each_transfer(self):
+        for _ in range(3):
+            TransferService.transfer_from_wallet_to_bank(self.bank_account, self.wallet, 10)
+
+        balances = list(LedgerEntry.get_by_account(self.wallet).values_list("running_balance", flat=True))
+        self.assertEqual(balances, [90, 80, 70])
+
+    def test_ledger_entries_are_append_only(self):
+        TransferService.transfer_from_wallet_to_bank(self.bank_account, self.wallet, 10)
+        entry = LedgerEntry.objects.first()
+
+        with self.assertRaises(LedgerEntryIsImmutableError):
+            entry.amount = 1
+            entry.save()
+
+        with self.assertRaises(LedgerEntryIsImmutableError):
+            entry.delete()
+
+    def test_transfer_rejects_non_positive_amounts(self):
+        with self.assertRaises(ValueError):
+            TransferService.transfer_from_wallet_to_bank(self.bank_account, self.wallet, 0)
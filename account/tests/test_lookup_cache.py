@@ -0,0 +1,103 @@
+import threading
+
+from django.db import transaction
+from django.test import TransactionTestCase, override_settings
+
+from ..lookup_cache import get_lookup_cache, get_lookup_cache_key, get_user_version_key
+from ..models import BankAccount, Profile, Wallet
+from authentication.models import User
+
+
+class LookupCacheTest(TransactionTestCase):
+    """
+    A transaction test case, a lookup inside a transaction doesn't fill the cache.
+    """
+
+    def setUp(self):
+        get_lookup_cache().clear()
+        self.user = User.objects.create(first_name="Test name",
+                                        surname="Test surname",
+                                        username="Test username",
+                                        email="test@example.com",
+                                        pin="1234"
+                                        )
+
+    def _create_profile(self) -> Profile:
+        return Profile.objects.create(user=self.user, first_name="Test", surname="User")
+
+    def test_a_repeated_lookup_is_answered_from_the_cache(self):
+        self._create_profile()
+        wallet = Wallet.get_by_user(self.user)
+        Profile.get_by_user(self.user)
+        Wallet.get_by_wallet_id(wallet.wallet_id)
+
+        with self.assertNumQueries(0):
+            self.assertEqual(Profile.get_by_user(self.user).first_name, "Test")
+            self.assertEqual(Wallet.get_by_wallet_id(wallet.wallet_id), wallet)
+            cached = Wallet.get_by_user(self.user)
+            self.assertEqual(cached.bank_account.sort_code, wallet.bank_account.sort_code)
+
+    def test_saving_a_row_invalidates_the_lookups_of_its_user(self):
+        self._create_profile()
+        BankAccount.get_by_user(self.user)
+
+        profile            = Profile.get_by_user(self.user)
+        profile.first_name = "Changed"
+        profile.save()
+
+        self.assertEqual(Profile.get_by_user(self.user).first_name, "Changed")
+
+    def test_a_cached_lookup_never_serves_a_stale_balance(self):
+        self._create_profile()
+        Wallet.get_by_user(self.user).add_amount(10)
+        Wallet.objects.filter(user=self.user).update(amount=50)
+
+        wallet = Wallet.get_by_user(self.user)
+        with self.assertNumQueries(1):
+            self.assertEqual(wallet.amount, 50)
+
+        wallet.deduct_amount(20)
+        self.assertEqual(Wallet.objects.get(user=self.user).amount, 30)
+        self.assertEqual(Wallet.get_by_user(self.user).amount, 30)
+
+    def test_a_missing_row_is_cached_until_it_is_created(self):
+        self.assertIsNone(Profile.get_by_user(self.user))
+        with self.assertNumQueries(0):
+            self.assertIsNone(Profile.get_by_user(self.user))
+
+        profile = self._create_profile()
+
+        self.assertEqual(Profile.get_by_user(self.user), profile)
+
+    def test_a_lookup_inside_a_transaction_does_not_fill_the_cache(self):
+        self._create_profile()
+        with transaction.atomic():
+            Profile.get_by_user(self.user)
+
+        with self.assertNumQueries(1):
+            Profile.get_by_user(self.user)
+
+    def test_a_lookup_waits_for_the_process_filling_the_entry(self):
+        self._create_profile()
+        Profile.get_by_user(self.user)
+
+        cache   = get_lookup_cache()
+        version = cache.get(get_user_version_key(self.user.pk))
+        key     = get_lookup_cache_key(Profile, "user", self.user.pk, self.user.pk, version)
+        entry   = cache.get(key)
+        cache.delete(key)
+        cache.add(f"{key}:lock", 1)
+
+        filling = threading.Timer(0.05, cache.set, args=(key, entry))
+        filling.start()
+        with self.assertNumQueries(0):
+            self.assertEqual(Profile.get_by_user(self.user).first_name, "Test")
+        filling.join()
+
+    @override_settings(ACCOUNT_LOOKUP_CACHE_TIMEOUT=0)
+    def test_it_can_be_switched_off(self):
+        self._create_profile()
+        Profile.get_by_user(self.user)
+
+        with self.assertNumQueries(1):
+            Profile.get_by_user(self.user)
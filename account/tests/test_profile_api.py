@@ -0,0 +1,59 @@
+from django.test import TestCase
+from django.urls import reverse
+
+from ..models import Profile
+from authentication.models import User
+
+
+class GetProfileDetailsConditionalTest(TestCase):
+
+    def setUp(self):
+        self.user    = User.objects.create(
+                                first_name="Test name",
+                                surname="Test surname",
+                                username="Test username",
+                                email="test@example.com",
+                                pin="1234"
+                                )
+        self.profile = Profile.objects.create(user=self.user, first_name="Test", surname="User")
+        self.url     = reverse("get_profile_data")
+        self.client.force_login(self.user)
+
+    def test_response_carries_validators(self):
+        response = self.client.get(self.url)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response["ETag"])
+        self.assertTrue(response["Last-Modified"])
+        self.assertIn("no-cache", response["Cache-Control"])
+        self.assertIn("private", response["Cache-Control"])
+
+    def test_matching_etag_returns_304_without_loading_the_profile(self):
+        etag = self.client.get(self.url)["ETag"]
+
+        # session, user, then a single values_list query for the profile version
+        with self.assertNumQueries(3):
+            response = self.client.get(self.url, headers={"If-None-Match": etag})
+
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b"")
+        self.assertEqual(response["ETag"], etag)
+
+    def test_changed_profile_returns_the_new_data(self):
+        etag = self.client.get(self.url)["ETag"]
+
+        self.profile.first_name = "Changed"
+        self.profile.save()
+
+        response = self.client.get(self.url, headers={"If-None-Match": etag})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+        self.assertEqual(response.json()["DATA"]["firstName"], "Changed")
+
+    def test_if_modified_since_returns_304(self):
+        last_modified = self.client.get(self.url)["Last-Modified"]
+
+        response = self.client.get(self.url, headers={"If-Modified-Since": last_modified})
+
+        self.assertEqual(response.status_code, 304)
@@ -0,0 +1,81 @@
+import pstats
+import tempfile
+import threading
+import time
+from io import StringIO
+from pathlib import Path
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from authentication.models import User
+from utils.profiler import PROFILE_ID_HEADER, StackSampler, summarise_profiles
+
+
+def spin(seconds: float) -> None:
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        pass
+
+
+class ProfilerTest(TestCase):
+
+    def setUp(self):
+        directory      = tempfile.TemporaryDirectory()
+        self.directory = Path(directory.name)
+        self.addCleanup(directory.cleanup)
+
+        settings = override_settings(REQUEST_PROFILER_DIR=self.directory)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+        self.staff = User.objects.create_superuser(username="admin", email="admin@example.com", password="password")
+        self.user  = User.objects.create(first_name="Test name",
+                                         surname="Test surname",
+                                         username="Test username",
+                                         email="test@example.com",
+                                         pin="1234"
+                                         )
+
+    def _get_home(self, user: User, **headers):
+        self.client.force_login(user)
+        return self.client.get(reverse("home"), headers=headers)
+
+    def test_a_staff_request_asking_for_it_is_profiled(self):
+        response = self._get_home(self.staff, X_Profile="1")
+        name     = response[PROFILE_ID_HEADER]
+
+        self.assertIn("-home-", name)
+        self.assertGreater(pstats.Stats(str(self.directory / f"{name}.prof")).total_tt, 0)
+        self.assertIn('"url_name": "home"', (self.directory / f"{name}.json").read_text())
+
+    def test_other_requests_are_not_profiled(self):
+        self.assertNotIn(PROFILE_ID_HEADER, self._get_home(self.user, X_Profile="1"))
+        self.assertNotIn(PROFILE_ID_HEADER, self._get_home(self.staff))
+
+        with override_settings(REQUEST_PROFILER_SAMPLE_RATE=0):
+            self.assertNotIn(PROFILE_ID_HEADER, self._get_home(self.staff, X_Profile="1"))
+
+        self.assertEqual(list(self.directory.iterdir()), [])
+
+    def test_the_sampler_collapses_the_stacks_of_the_thread(self):
+        with StackSampler(threading.get_ident(), interval=0.001) as sampler:
+            spin(0.05)
+
+        self.assertTrue(any(stack.split(";")[-1].startswith("spin (") for stack in sampler.counts))
+
+    def test_the_profiles_are_summarised(self):
+        self._get_home(self.staff, X_Profile="1")
+        response = self.client.get(reverse("admin:account_wallet_changelist") + "?_profile=stacks")
+        self.assertEqual(response.status_code, 200)
+
+        summary = summarise_profiles(self.directory)
+        self.assertEqual(summary.profiles, 2)
+        self.assertEqual(set(summary.requests), {"home", "admin:account_wallet_changelist"})
+        self.assertTrue(summary.functions)
+        self.assertEqual(summarise_profiles(self.directory, url_name="home").profiles, 1)
+
+        out = StringIO()
+        call_command("summarise_profiles", "--profile-dir", str(self.directory), "--top", "5", stdout=out)
+        self.assertIn("2 profile(s)", out.getvalue())
@@ -0,0 +1,87 @@
+import json
+from io import StringIO
+
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from ..models import Profile, BankAccount, Wallet
+from ..provisioning import provision_users, read_users
+from authentication.models import User
+
+
+CSV_USERS = """username,email,first_name,surname,mobile,country,gender
+jane,Jane@Example.com,Jane,Doe,07000000000,UK,F
+john,john@example.com,John,Doe,07000000001,UK,M
+"""
+
+
+def create_rows(num_of_rows, prefix="user"):
+    return [{"username": f"{prefix}-{i}", "email": f"{prefix}-{i}@example.com", "first_name": "First", "surname": "Last"}
+            for i in range(num_of_rows)]
+
+
+class ProvisionUsersTest(TestCase):
+
+    def test_every_user_gets_a_profile_bank_account_and_wallet(self):
+        result = provision_users(read_users(StringIO(CSV_USERS), "csv"))
+
+        self.assertEqual(result.created, 2)
+        self.assertEqual(result.skipped, 0)
+
+        user = User.objects.get(username="jane")
+        self.assertEqual(user.email, "jane@example.com")
+        self.assertFalse(user.has_usable_password())
+
+        profile      = Profile.objects.get(user=user)
+        bank_account = BankAccount.objects.get(user=user)
+        wallet       = Wallet.objects.get(user=user)
+
+        self.assertEqual(profile.mobile, "07000000000")
+        self.assertEqual(len(profile.profile_id), 64)
+        self.assertEqual(len(bank_account.account_number), 8)
+        self.assertEqual(len(bank_account.sort_code), 6)
+        self.assertEqual(wallet.bank_account, bank_account)
+
+    def test_history_rows_are_written_for_every_model(self):
+        provision_users(create_rows(5))
+
+        for model in (User, Profile, BankAccount, Wallet):
+            self.assertEqual(model.history.filter(history_type="+").count(), 5, msg=model.__name__)
+
+    def test_signals_do_not_create_a_second_bank_account(self):
+        provision_users(create_rows(3))
+
+        self.assertEqual(BankAccount.objects.count(), 3)
+        self.assertEqual(Wallet.objects.count(), 3)
+
+    def test_duplicate_and_existing_users_are_skipped(self):
+        User.objects.create(username="user-0", email="taken@example.com", first_name="First", surname="Last")
+
+        rows   = create_rows(3) + [{"username": "user-1", "email": "other@example.com"}, {"username": "", "email": "x@example.com"}]
+        result = provision_users(rows)
+
+        self.assertEqual(result.created, 2)
+        self.assertEqual(result.skipped, 3)
+
+    def test_rows_are_written_in_chunks(self):
+        progress = []
+
+        provision_users(create_rows(10), chunk_size=2, on_chunk=progress.append)
+
+        self.assertEqual([result.created for result in progress], [2, 4, 6, 8, 10])
+
+    def test_query_count_does_not_grow_with_chunk_size(self):
+        provision_users(create_rows(1, prefix="warm-up"))
+
+        with CaptureQueriesContext(connection) as small_chunk:
+            provision_users(create_rows(2, prefix="small"))
+        with CaptureQueriesContext(connection) as large_chunk:
+            provision_users(create_rows(40, prefix="large"))
+
+        self.assertEqual(len(small_chunk), len(large_chunk))
+
+    def test_reads_json_lines(self):
+        file = StringIO("\n".join(json.dumps(row) for row in create_rows(2)) + "\n\n")
+
+        self.assertEqual(provision_users(read_users(file, "jsonl")).created, 2)
@@ -0,0 +1,67 @@
+import json
+
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from ..models import Profile, Wallet
+from authentication.models import User
+from utils.query_budget import assert_query_budget, fingerprint_sql
+
+
+class QueryBudgetTest(TestCase):
+
+    def setUp(self):
+        self.admin = User.objects.create_superuser(username="admin", email="admin@example.com", password="password")
+
+        for i in range(3):
+            user = User.objects.create(first_name="Test name",
+                                       surname="Test surname",
+                                       username=f"user-{i}",
+                                       email=f"user-{i}@example.com",
+                                       pin="1234"
+                                       )
+            Profile.objects.create(user=user, first_name="Test", surname="User")
+
+        self.client.force_login(self.admin)
+
+    def _run_twice(self, sql: str) -> None:
+        with connection.cursor() as cursor:
+            cursor.execute(sql, [1])
+            cursor.execute(sql, [2])
+
+    def test_queries_differing_only_in_their_values_have_the_same_fingerprint(self):
+        first, _    = fingerprint_sql("SELECT * FROM account_wallet WHERE id IN (%s, %s) AND amount > 10 LIMIT 21")
+        second, sql = fingerprint_sql("SELECT * FROM account_wallet WHERE id IN (%s, %s, %s) AND amount > 25 LIMIT 21")
+
+        self.assertEqual(first, second)
+        self.assertEqual(sql, "SELECT * FROM account_wallet WHERE id IN (...) AND amount > ? LIMIT ?")
+
+    @override_settings(QUERY_BUDGETS={"default": {"queries": 1}})
+    def test_a_request_over_its_budget_is_logged_as_json(self):
+        with self.assertLogs("query_budget", "WARNING") as logs:
+            self.client.get(reverse("home"))
+
+        record = json.loads(logs.records[0].getMessage())
+        self.assertEqual(record["url_name"], "home")
+        self.assertEqual(record["exceeded"], ["queries"])
+        self.assertGreater(record["queries"], 1)
+        self.assertIn("latency_ms", record)
+
+    def test_a_request_within_its_budget_is_not_logged(self):
+        with self.assertNoLogs("query_budget"):
+            self.client.get(reverse("home"))
+
+    def test_the_admin_changelists_read_the_users_with_the_rows(self):
+        for name in ("admin:account_wallet_changelist", "admin:account_bankaccount_changelist"):
+            with assert_query_budget(name):
+                response = self.client.get(reverse(name))
+            self.assertContains(response, "user-2@example.com")
+
+    def test_assert_query_budget_lists_the_duplicated_queries(self):
+        with self.assertRaisesMessage(AssertionError, "duplicate_queries: 1 > 0"):
+            with assert_query_budget(duplicate_queries=0):
+                self._run_twice("SELECT %s")
+
+        with assert_query_budget(queries=2):
+            self._run_twice("SELECT %s")
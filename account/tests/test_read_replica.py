@@ -0,0 +1,91 @@
+import json
+
+from django.core.cache import cache
+from django.db import connections
+from django.test import RequestFactory, TransactionTestCase, override_settings
+from django.urls import reverse
+
+from ..models import Profile
+from authentication.models import User
+from authentication.user_summary import get_user_summary
+from utils.db_router import ReadReplicaMiddleware, read_from_replica, sync_replica
+
+
+@override_settings(READ_REPLICA_ALIAS="replica")
+class ReadReplicaTest(TransactionTestCase):
+    """
+    `default` and `replica` are two separate SQLite databases here, kept in
+    sync by hand with `sync_replica`, so every test can tell which one a
+    read went to by what it returns.
+    """
+
+    databases = {"default", "replica"}
+
+    def setUp(self):
+        self.user    = User.objects.create(
+                                first_name="Test name",
+                                surname="Test surname",
+                                username="Test username",
+                                email="test@example.com",
+                                pin="1234"
+                                )
+        self.profile = Profile.objects.create(user=self.user, first_name="Test", surname="User")
+        self.url     = reverse("get_profile_data")
+
+        sync_replica()
+        Profile.objects.filter(pk=self.profile.pk).update(first_name="Changed")
+
+        # the session only exists on the primary, which sessions are always read from
+        self.client.force_login(self.user)
+
+    def _get_first_name(self) -> str:
+        return self.client.get(self.url).json()["DATA"]["firstName"]
+
+    def test_the_databases_are_separate(self):
+        self.assertNotEqual(connections["default"].settings_dict["NAME"], connections["replica"].settings_dict["NAME"])
+        self.assertEqual(Profile.objects.using("replica").get(pk=self.profile.pk).first_name, "Test")
+
+    def test_a_read_only_view_reads_from_the_replica(self):
+        self.assertEqual(self._get_first_name(), "Test")
+
+        sync_replica()
+
+        self.assertEqual(self._get_first_name(), "Changed")
+
+    def test_other_reads_go_to_the_primary(self):
+        self.assertEqual(Profile.objects.get(pk=self.profile.pk).first_name, "Changed")
+
+    def test_the_rest_of_a_request_reads_its_own_writes(self):
+        with read_from_replica():
+            self.assertEqual(Profile.objects.get(pk=self.profile.pk).first_name, "Test")
+
+            User.objects.filter(pk=self.user.pk).update(pin="9999")
+
+            self.assertEqual(Profile.objects.get(pk=self.profile.pk).first_name, "Changed")
+
+    def test_the_browser_stays_on_the_primary_after_a_write(self):
+        response = self.client.post(reverse("update_profile_details"),
+                                    data=json.dumps({"surname": {"changed": "Posted", "current": "User"}}),
+                                    content_type="application/json",
+                                    )
+
+        self.assertIn(ReadReplicaMiddleware.cookie_name, response.cookies)
+        self.assertEqual(self._get_first_name(), "Changed")
+
+        del self.client.cookies[ReadReplicaMiddleware.cookie_name]
+        self.assertEqual(self._get_first_name(), "Test")
+
+    def test_the_cached_user_summary_is_read_from_the_primary(self):
+        cache.clear()
+        user         = User.objects.create(first_name="New", surname="User", username="new",
+                                           email="new@example.com", pin="4321")
+        Profile.objects.create(user=user, first_name="New", surname="User")
+        request      = RequestFactory().get("/")
+        request.user = user
+
+        with read_from_replica():
+            self.assertTrue(get_user_summary(request).is_profile_created)
+
+    @override_settings(READ_REPLICA_ALIAS=None)
+    def test_everything_goes_to_the_primary_without_a_replica(self):
+        self.assertEqual(self._get_first_name(), "Changed")
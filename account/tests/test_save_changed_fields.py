@@ -0,0 +1,93 @@
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from ..models import BankAccount, Wallet
+from authentication.models import User
+
+
+class SaveChangedFieldsTest(TestCase):
+
+    def setUp(self):
+        self.user         = User.objects.create(
+                                first_name="Test name",
+                                surname="Test surname",
+                                username="Test username",
+                                email="test@example.com",
+                                pin="1234"
+                                )
+        self.bank_account = BankAccount.objects.create(bank_id="123456789",
+                                                       sort_code="400147",
+                                                       account_number="01232789",
+                                                       amount=100,
+                                                       user=self.user
+                                                       )
+        self.wallet       = Wallet.objects.create(wallet_id="123456789",
+                                                  user=self.user,
+                                                  bank_account=self.bank_account,
+                                                  amount=100,
+                                                  )
+
+    def test_saving_an_unchanged_row_does_nothing(self):
+        user          = User.objects.get(pk=self.user.pk)
+        history_count = User.history.count()
+
+        with self.assertNumQueries(0):
+            user.save()
+
+        self.assertEqual(User.history.count(), history_count)
+
+    def test_only_changed_columns_are_written(self):
+        user     = User.objects.get(pk=self.user.pk)
+        user.pin = "9999"
+
+        with CaptureQueriesContext(connection) as queries:
+            user.save()
+
+        update = next(query["sql"] for query in queries if query["sql"].startswith("UPDATE"))
+        self.assertIn('"pin"', update)
+        self.assertNotIn('"first_name"', update)
+        self.assertNotIn('"last_login"', update)
+
+        user.refresh_from_db()
+        self.assertEqual(user.pin, "9999")
+
+    def test_modified_on_is_touched_when_something_changed(self):
+        wallet      = Wallet.objects.get(pk=self.wallet.pk)
+        modified_on = wallet.modified_on
+
+        wallet.maximum_cards = 5
+        wallet.save()
+
+        wallet.refresh_from_db()
+        self.assertEqual(wallet.maximum_cards, 5)
+        self.assertGreater(wallet.modified_on, modified_on)
+
+    def test_stale_balance_is_not_written_back(self):
+        """A save for an unrelated field must not overwrite a balance changed elsewhere"""
+
+        stale_copy = Wallet.objects.get(pk=self.wallet.pk)
+        self.wallet.add_amount(50)
+
+        stale_copy.maximum_cards = 5
+        stale_copy.save()
+
+        self.wallet.refresh_from_db()
+        self.assertEqual(self.wallet.amount, 150)
+
+    def test_balance_change_is_not_saved_twice(self):
+        bank_account = BankAccount.objects.get(pk=self.bank_account.pk)
+        bank_account.add_amount(10)
+
+        with self.assertNumQueries(0):
+            bank_account.save()
+
+    def test_explicit_update_fields_are_respected(self):
+        user            = User.objects.get(pk=self.user.pk)
+        user.first_name = "Changed"
+        user.surname    = "Changed"
+        user.save(update_fields=["first_name"])
+
+        user.refresh_from_db()
+        self.assertEqual(user.first_name, "Changed")
+        self.assertEqual(user.surname, "Test surname")
@@ -0,0 +1,319 @@
+import tempfile
+from datetime import datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import connections
+from django.test import TransactionTestCase, override_settings
+from django.utils import timezone
+from django.utils.functional import SimpleLazyObject
+
+from unittest import mock
+
+from ..models import BankAccount, Card, LedgerEntry, Profile, TransferInstruction, TransferService, Wallet
+from ..provisioning import provision_users
+from ..sharding import SHARD_ID_SPACING, prepare_shard, shard_for_user
+from ..statements import get_statement_account, get_statement_lines
+from ..utils.errors import CrossShardTransferError
+from authentication.models import User
+from authentication.sweeper import purge_verifications
+from utils.history_archive import archive_history, read_history_archive
+
+
+SHARDS = ["shard_0", "shard_1"]
+
+
+@override_settings(ACCOUNT_SHARDS=SHARDS)
+class ShardingTest(TransactionTestCase):
+    """
+    `default`, `shard_0` and `shard_1` are separate SQLite databases here,
+    so every test can tell where a row was written by looking for it.
+    """
+
+    databases = {"default", *SHARDS}
+
+    def setUp(self):
+        for alias in SHARDS:
+            prepare_shard(alias)
+
+    def _create_user(self, shard: str = None) -> User:
+        """Create a user, hashed to `shard` of the two shards if given"""
+        for i in range(100):
+            if User.objects.filter(username=f"user-{i}").exists():
+                continue
+            user = User.objects.create(first_name="Test name",
+                                       surname="Test surname",
+                                       username=f"user-{i}",
+                                       email=f"user-{i}@example.com",
+                                       pin="1234"
+                                       )
+            with override_settings(ACCOUNT_SHARDS=SHARDS):
+                if shard is None or shard_for_user(user) == shard:
+                    return user
+            user.delete()
+        self.fail(f"No user hashed to {shard}")
+
+    def _create_profile(self, user: User) -> Profile:
+        """Create the profile of `user`, which creates their bank account and wallet"""
+        return Profile.objects.create(user=user, first_name="Test", surname="User")
+
+    def _create_card(self, wallet: Wallet, number: str) -> Card:
+        return Card.objects.create(card_name="Test", card_number=number, expiry_month="JAN",
+                                   expiry_year=2030, card_options="V", card_type="D", cvc="123", wallet=wallet)
+
+    def _count_ledger_entries(self, using: str) -> int:
+        return LedgerEntry.objects.using(using).count()
+
+    def _count_rows(self, user: User, using: str) -> int:
+        return sum(model.objects.using(using).filter(user=user).count() for model in (Profile, BankAccount, Wallet))
+
+    def test_the_account_data_of_a_user_is_written_to_their_shard(self):
+        user  = self._create_user()
+        shard = shard_for_user(user)
+        self._create_profile(user)
+        other = next(alias for alias in SHARDS if alias != shard)
+
+        self.assertEqual(self._count_rows(user, shard), 3)
+        self.assertEqual(self._count_rows(user, other), 0)
+        self.assertEqual(Profile.history.using(shard).filter(user=user).count(), 1)
+        self.assertGreater(Profile.objects.using(shard).get(user=user).pk, SHARD_ID_SPACING)
+
+    def test_the_users_are_spread_over_the_shards(self):
+        self.assertEqual({shard_for_user(user_id) for user_id in range(1, 50)}, set(SHARDS))
+
+    def test_lookups_find_the_shard(self):
+        user   = self._create_user()
+        self._create_profile(user)
+        wallet = Wallet.get_by_user(user)
+
+        self.assertEqual(wallet._state.db, shard_for_user(user))
+        self.assertEqual(Wallet.get_by_wallet_id(wallet.wallet_id), wallet)
+        self.assertEqual(BankAccount.get_by_user(user), wallet.bank_account)
+        self.assertEqual(Profile.get_by_user(user), user.profile)
+        self.assertEqual(wallet.user, user)
+
+    def test_changes_to_a_loaded_account_are_written_back_to_its_shard(self):
+        user   = self._create_user()
+        self._create_profile(user)
+        wallet = Wallet.get_by_user(user)
+
+        wallet.add_amount(25)
+        card = Card.objects.create(card_name="Test", card_number="4111111111111111", expiry_month="JAN",
+                                   expiry_year=2030, card_options="V", card_type="D", cvc="123", wallet=wallet)
+
+        stored = Wallet.objects.for_user(user).get(pk=wallet.pk)
+        self.assertEqual(stored.amount, 25)
+        self.assertEqual(stored.total_cards, 1)
+        self.assertEqual(card._state.db, shard_for_user(user))
+
+    def test_an_account_can_be_given_the_lazy_user_of_a_request(self):
+        user   = self._create_user()
+        wallet = Wallet(user=SimpleLazyObject(lambda: user))
+
+        self.assertEqual(wallet.user_id, user.pk)
+
+    def test_a_deposit_is_recorded_on_the_shard_of_the_account(self):
+        user  = self._create_user()
+        shard = shard_for_user(user)
+        self._create_profile(user)
+
+        wallet = Wallet.get_by_user(user)
+        TransferService.fund_account(wallet, 25)
+
+        self.assertEqual(Wallet.objects.using(shard).get(pk=wallet.pk).amount, 25)
+        self.assertEqual(self._count_ledger_entries(shard), 2)
+        self.assertEqual(self._count_ledger_entries("default"), 0)
+        self.assertEqual(LedgerEntry.get_by_account(wallet).get().running_balance, 25)
+
+    def test_a_transfer_is_rolled_back_on_its_shard_as_a_whole(self):
+        user   = self._create_user()
+        shard  = shard_for_user(user)
+        self._create_profile(user)
+        wallet = Wallet.get_by_user(user)
+        TransferService.fund_account(wallet.bank_account, 50)
+
+        with mock.patch.object(LedgerEntry, "record_transfer", side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                TransferService.transfer_from_bank_to_wallet(wallet.bank_account, wallet, 20)
+
+        self.assertEqual(BankAccount.objects.using(shard).get(user=user).amount, 50)
+        self.assertEqual(Wallet.objects.using(shard).get(user=user).amount, 0)
+
+        TransferService.transfer_from_bank_to_wallet(wallet.bank_account, wallet, 20)
+        self.assertEqual(Wallet.objects.using(shard).get(user=user).amount, 20)
+        self.assertEqual(self._count_ledger_entries(shard), 4)
+
+    def test_a_transfer_between_two_shards_is_refused(self):
+        users = [self._create_user(shard=shard) for shard in SHARDS]
+        for user in users:
+            self._create_profile(user)
+        source, target = [self._create_card(Wallet.get_by_user(user), number)
+                          for user, number in zip(users, ("4111111111111111", "4222222222222222"))]
+        TransferService.fund_account(source, 30)
+
+        with self.assertRaises(CrossShardTransferError):
+            TransferService.transfer_funds_between_cards(source, target, 10)
+
+        self.assertEqual(Card.objects.using("shard_0").get(pk=source.pk).amount, 30)
+
+    def test_a_bulk_transfer_is_applied_on_the_shard_of_each_instruction(self):
+        users   = [self._create_user(shard=shard) for shard in SHARDS]
+        wallets = []
+        for user in users:
+            self._create_profile(user)
+            wallets.append(Wallet.get_by_user(user))
+            TransferService.fund_account(wallets[-1].bank_account, 100)
+
+        results = TransferService.bulk_transfer([
+            TransferInstruction(wallets[0].bank_account, wallets[0], Decimal("10")),
+            TransferInstruction(wallets[1].bank_account, wallets[1], Decimal("20")),
+            TransferInstruction(wallets[0].bank_account, wallets[1], Decimal("30")),
+        ])
+
+        self.assertEqual([result.success for result in results], [True, True, False])
+        self.assertIsInstance(results[2].error, CrossShardTransferError)
+        for shard, wallet, amount in zip(SHARDS, wallets, (10, 20)):
+            self.assertEqual(Wallet.objects.using(shard).get(pk=wallet.pk).amount, amount)
+            self.assertEqual(Wallet.history.using(shard).filter(id=wallet.pk).latest().amount, amount)
+            self.assertEqual(LedgerEntry.get_by_account(wallet).get().running_balance, amount)
+
+    def test_past_balances_are_read_from_the_shards(self):
+        users   = [self._create_user(shard=shard) for shard in SHARDS]
+        wallets = []
+        for user, amount in zip(users, (15, 25)):
+            self._create_profile(user)
+            wallets.append(Wallet.get_by_user(user))
+            TransferService.fund_account(wallets[-1], amount)
+
+        balances = Wallet.balances_at(timestamp=timezone.now())
+
+        self.assertEqual({balances[wallet.pk] for wallet in wallets}, {Decimal("15"), Decimal("25")})
+        self.assertEqual(wallets[1].balance_at(timezone.now()), Decimal("25"))
+
+    def test_a_statement_is_read_from_the_shard_of_the_account(self):
+        user   = self._create_user()
+        self._create_profile(user)
+        wallet = Wallet.get_by_user(user)
+        TransferService.fund_account(wallet, 40)
+        wallet.refresh_from_db()
+        wallet.amount = Decimal("35")
+        wallet.save()
+
+        self.assertEqual(get_statement_account("wallet", wallet.wallet_id), wallet)
+        self.assertEqual(get_statement_account("wallet", wallet.wallet_id, user=user), wallet)
+        self.assertIsNone(get_statement_account("wallet", wallet.wallet_id, user=self._create_user()))
+
+        lines = list(get_statement_lines(wallet))
+        self.assertEqual([(line.description, line.balance) for line in lines],
+                         [("Transfer in", Decimal("40")), ("Balance adjustment", Decimal("35"))])
+
+    def test_provisioned_users_get_their_accounts_on_their_shard(self):
+        provision_users([{"username": f"provisioned-{i}", "email": f"provisioned-{i}@example.com",
+                          "first_name": "First", "surname": "Last"} for i in range(6)])
+
+        for user in User.objects.filter(username__startswith="provisioned-"):
+            self.assertEqual(self._count_rows(user, shard_for_user(user)), 3)
+            self.assertEqual(self._count_rows(user, "default"), 0)
+            self.assertEqual(Wallet.history.using(shard_for_user(user)).filter(user=user).count(), 1)
+
+    def test_the_history_of_the_shards_is_archived(self):
+        user   = self._create_user()
+        shard  = shard_for_user(user)
+        self._create_profile(user)
+        wallet = Wallet.get_by_user(user)
+        wallet.refresh_from_db()
+        wallet.amount = Decimal("5")
+        wallet.save()
+        days   = [datetime(2024, 1, day, tzinfo=dt_timezone.utc) for day in (1, 2)]
+        for history_id, day in zip(Wallet.history.using(shard).filter(id=wallet.pk)
+                                                              .order_by("history_id")
+                                                              .values_list("history_id", flat=True), days):
+            Wallet.history.using(shard).filter(history_id=history_id).update(history_date=day)
+
+        with tempfile.TemporaryDirectory() as archive_dir:
+            result = archive_history(Wallet, before=datetime(2024, 6, 1, tzinfo=dt_timezone.utc), archive_dir=archive_dir)
+            self.assertEqual(result.archived, 1)
+            self.assertEqual(len(list(read_history_archive(Wallet, archive_dir=archive_dir))), 1)
+
+        self.assertEqual(Wallet.history.using(shard).filter(id=wallet.pk).get().history_date, days[1])
+
+    def test_rebalancing_moves_the_rows_of_a_user_to_their_new_shard(self):
+        user = self._create_user(shard="shard_1")
+        with override_settings(ACCOUNT_SHARDS=SHARDS[:1]):
+            self._create_profile(user)
+
+        wallet = Wallet.objects.using("shard_0").get(user=user)
+        out    = StringIO()
+        call_command("rebalance_shards", stdout=out)
+
+        self.assertIn("Moved 1 users, 6 rows", out.getvalue())
+        self.assertEqual(self._count_rows(user, "shard_0"), 0)
+        self.assertEqual(self._count_rows(user, "shard_1"), 3)
+
+        moved = Wallet.get_by_user(user)
+        self.assertEqual((moved.pk, moved.uid, moved.created_on), (wallet.pk, wallet.uid, wallet.created_on))
+        self.assertEqual(Wallet.history.using("shard_1").filter(id=wallet.pk).count(), 1)
+
+    def test_rebalancing_moves_the_data_created_before_sharding(self):
+        user = self._create_user()
+        with override_settings(ACCOUNT_SHARDS=[]):
+            self._create_profile(user)
+            TransferService.fund_account(Wallet.get_by_user(user), 15)
+        self.assertEqual(self._count_rows(user, "default"), 3)
+
+        call_command("rebalance_shards", "--dry-run", stdout=StringIO())
+        self.assertEqual(self._count_rows(user, "default"), 3)
+
+        call_command("rebalance_shards", "--user", str(user.pk), stdout=StringIO())
+
+        self.assertEqual(self._count_rows(user, "default"), 0)
+        self.assertEqual(self._count_rows(user, shard_for_user(user)), 3)
+        self.assertEqual(Profile.get_by_user(user).first_name, "Test")
+        self.assertEqual(self._count_ledger_entries("default"), 0)
+        self.assertEqual(LedgerEntry.get_by_account(Wallet.get_by_user(user)).get().running_balance, 15)
+
+    def test_deleting_a_user_deletes_their_accounts_on_the_shards(self):
+        user   = self._create_user()
+        shard  = shard_for_user(user)
+        self._create_profile(user)
+        wallet = Wallet.get_by_user(user)
+        self._create_card(wallet, "4111111111111111")
+        TransferService.fund_account(wallet, 10)
+
+        user_id = user.pk
+        user.delete()
+
+        self.assertEqual(self._count_rows(user_id, shard), 0)
+        self.assertFalse(Card.objects.using(shard).filter(bank_account=wallet.bank_account_id).exists())
+        self.assertEqual(Wallet.history.using(shard).filter(id=wallet.pk).latest().history_type, "-")
+        self.assertEqual(self._count_ledger_entries(shard), 2)
+
+    def test_the_sweeper_keeps_the_unverified_users_with_a_profile_on_a_shard(self):
+        with_profile, without_profile = self._create_user(), self._create_user()
+        self._create_profile(with_profile)
+        User.objects.update(joined_on=timezone.now() - timedelta(days=30))
+
+        stats = purge_verifications(user_retention=timedelta(days=7))
+
+        self.assertEqual(stats.users, 1)
+        self.assertEqual(list(User.objects.values_list("pk", flat=True)), [with_profile.pk])
+
+    def test_only_the_shards_drop_the_foreign_keys_to_the_users(self):
+        def has_user_foreign_key(using: str) -> bool:
+            connection = connections[using]
+            with connection.cursor() as cursor:
+                constraints = connection.introspection.get_constraints(cursor, Wallet._meta.db_table)
+            return any(constraint["foreign_key"] and constraint["columns"] == ["user_id"]
+                       for constraint in constraints.values())
+
+        self.assertTrue(has_user_foreign_key("default"))
+        self.assertFalse(has_user_foreign_key("shard_0"))
+
+    @override_settings(ACCOUNT_SHARDS=[])
+    def test_nothing_is_sharded_without_shards(self):
+        user = self._create_user()
+        self._create_profile(user)
+
+        self.assertEqual(self._count_rows(user, "default"), 3)
+        self.assertEqual(Wallet.get_by_user(user)._state.db, "default")
@@ -0,0 +1,46 @@
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connection, transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from utils.sqlite import apply_sqlite_pragmas, immediate_atomic
+
+
+class SQLitePragmasTest(TestCase):
+
+    def _pragma(self, name: str):
+        with connection.cursor() as cursor:
+            cursor.execute(f"PRAGMA {name}")
+            return cursor.fetchone()[0]
+
+    def test_the_pragmas_are_applied_to_new_connections(self):
+        self.assertEqual(self._pragma("synchronous"), 1)      # NORMAL
+        self.assertEqual(self._pragma("temp_store"), 2)       # MEMORY
+        self.assertEqual(self._pragma("busy_timeout"), 5000)
+        self.assertEqual(self._pragma("cache_size"), -32000)
+
+    @override_settings(SQLITE_PRAGMAS={"cache_size": "-1000; DROP TABLE account_wallet"})
+    def test_an_invalid_pragma_is_rejected(self):
+        with self.assertRaises(ImproperlyConfigured):
+            apply_sqlite_pragmas(sender=None, connection=connection)
+
+
+class ImmediateAtomicTest(TransactionTestCase):
+
+    def _begin_statements(self, block) -> list[str]:
+        with CaptureQueriesContext(connection) as queries:
+            with block:
+                with immediate_atomic():
+                    connection.cursor().execute("SELECT 1")
+        return [query["sql"] for query in queries if query["sql"].startswith("BEGIN")]
+
+    def test_the_outermost_block_begins_immediate(self):
+        self.assertEqual(self._begin_statements(immediate_atomic()), ["BEGIN IMMEDIATE"])
+        self.assertIsNone(connection.transaction_mode)
+
+    def test_a_nested_block_is_a_savepoint_of_the_outer_transaction(self):
+        self.assertEqual(self._begin_statements(transaction.atomic()), ["BEGIN"])
+
+    @override_settings(SQLITE_IMMEDIATE_TRANSACTIONS=False)
+    def test_it_can_be_switched_off(self):
+        self.assertEqual(self._begin_statements(immediate_atomic()), ["BEGIN"])
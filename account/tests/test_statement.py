@@ -0,0 +1,113 @@
+import csv
+import gzip
+import json
+import tempfile
+from io import StringIO
+from pathlib import Path
+
+from freezegun import freeze_time
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+
+from ..models import BankAccount, Wallet, TransferService
+from ..statements import stream_statement
+from authentication.models import User
+
+
+class StatementExportTest(TestCase):
+
+    def setUp(self):
+        with freeze_time("2025-01-01 09:00:00"), self.captureOnCommitCallbacks(execute=True):
+            self.user         = User.objects.create(
+                                    first_name="Test name",
+                                    surname="Test surname",
+                                    username="Test username",
+                                    email="test@example.com",
+                                    pin="1234"
+                                    )
+            self.bank_account = BankAccount.objects.create(bank_id="123456789",
+                                                           sort_code="400147",
+                                                           account_number="01232789",
+                                                           amount=100,
+                                                           user=self.user
+                                                           )
+            self.wallet       = Wallet.objects.create(wallet_id="123456789",
+                                                      user=self.user,
+                                                      bank_account=self.bank_account,
+                                                      amount=100,
+                                                      )
+
+        with freeze_time("2025-01-10 09:00:00"):
+            TransferService.transfer_from_wallet_to_bank(self.bank_account, self.wallet, 40)
+
+        with freeze_time("2025-01-20 09:00:00"), self.captureOnCommitCallbacks(execute=True):
+            TransferService.bulk_transfer([(self.bank_account, self.wallet, 10)])
+
+        with freeze_time("2025-02-01 09:00:00"), self.captureOnCommitCallbacks(execute=True):
+            bank_account        = BankAccount.objects.get(pk=self.bank_account.pk)
+            bank_account.amount = 500
+            bank_account.save()
+
+        self.url = reverse("export_statement")
+        self.client.force_login(self.user)
+
+    def _read_csv(self, content: bytes) -> list[dict]:
+        return list(csv.DictReader(StringIO(content.decode("utf-8"))))
+
+    def test_statement_of_the_whole_account(self):
+        rows = self._read_csv(b"".join(stream_statement(self.bank_account)))
+
+        self.assertEqual([(row["description"], row["debit"], row["credit"], row["balance"]) for row in rows], [
+            ("Account opened", "", "100.00", "100.00"),
+            ("Transfer in", "", "40.00", "140.00"),
+            ("Transfer out", "10.00", "", "130.00"),
+            ("Balance adjustment", "", "370.00", "500.00"),
+        ])
+
+    def test_statement_of_a_date_range_starts_with_the_opening_balance(self):
+        response = self.client.get(self.url, {"account": "wallet", "id": "123456789", "start": "2025-01-15", "end": "2025-01-31"})
+        rows     = self._read_csv(b"".join(response.streaming_content))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "text/csv")
+        self.assertIn("statement-12345678-2025-01-15-to-2025-01-31.csv", response["Content-Disposition"])
+        self.assertEqual([(row["description"], row["balance"]) for row in rows], [
+            ("Opening balance", "60.00"),
+            ("Transfer in", "70.00"),
+        ])
+
+    def test_gzipped_json_lines(self):
+        response = self.client.get(self.url, {"account": "bank", "id": "123456789", "format": "jsonl", "gzip": "1"})
+        lines    = gzip.decompress(b"".join(response.streaming_content)).decode("utf-8").splitlines()
+
+        self.assertEqual(response["Content-Type"], "application/gzip")
+        self.assertEqual(len(lines), 4)
+        self.assertEqual(json.loads(lines[1])["description"], "Transfer in")
+        self.assertEqual(len(json.loads(lines[1])["reference"]), 32)
+        self.assertEqual(json.loads(lines[-1])["balance"], "500.00")
+
+    def test_accounts_of_other_users_are_not_found(self):
+        other = User.objects.create(first_name="Other", surname="User", username="other", email="other@example.com", pin="1234")
+        self.client.force_login(other)
+
+        response = self.client.get(self.url, {"account": "bank", "id": "123456789"})
+
+        self.assertEqual(response.status_code, 404)
+
+    def test_invalid_parameters_are_rejected(self):
+        for params in ({"account": "card", "id": "1"},
+                       {"account": "bank", "id": "123456789", "start": "01/01/2025"},
+                       {"account": "bank", "id": "123456789", "start": "2025-02-01", "end": "2025-01-01"},
+                       {"account": "bank", "id": "123456789", "format": "xml"}):
+            with self.subTest(params=params):
+                self.assertEqual(self.client.get(self.url, params).status_code, 400)
+
+    def test_the_command_writes_the_statement_to_a_file(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = Path(directory) / "statement.csv.gz"
+            call_command("export_statement", "bank", "123456789", "--end", "2025-01-31", "--gzip", "--output", str(path))
+
+            rows = self._read_csv(gzip.decompress(path.read_bytes()))
+
+        self.assertEqual(rows[-1]["balance"], "130.00")
@@ -0,0 +1,179 @@
+import threading
+from collections import deque
+
+from django.conf import settings
+from django.db import transaction
+
+from utils.generator import luhn_check_digit
+from .errors import NumberSequenceExhaustedError
+from ..models import BankAccount, NumberSequence
+
+
+class BlockAllocator:
+    """
+    Hands out unique, fixed-width numbers from blocks reserved in the database.
+
+    Each process reserves a block of `block_size` numbers from a
+    `NumberSequence` with one UPDATE and then issues them from memory, so
+    allocating a number normally costs no queries at all. Blocks never overlap
+    between processes, and numbers that already exist in `model.field` (e.g.
+    ones issued by the old random generator) are dropped from a block when it
+    is reserved, so every number handed out is unique without retrying.
+
+    A block reserved inside a transaction is kept for that transaction, whose
+    later allocations are drawn from it, until it commits, when the numbers
+    left over are shared with other threads. If it rolls back, so does the
+    reservation, and the block is thrown away rather than risk another
+    process being given the same numbers.
+
+    Example usage:
+
+        account_numbers = BlockAllocator("account_number", BankAccount, "account_number", digits=8, checksum=True)
+        account_numbers.allocate()
+        '00000018'
+    """
+
+    def __init__(self,
+                 sequence: str,
+                 model,
+                 field: str,
+                 digits: int,
+                 checksum: bool = False,
+                 block_size: int = None,
+                 first_value: int = 0):
+
+        self.sequence    = sequence
+        self.model       = model
+        self.field       = field
+        self.digits      = digits
+        self.checksum    = checksum
+        self.block_size  = block_size
+        self.first_value = first_value
+
+        self._serial_digits = digits - 1 if checksum else digits
+        self._lock          = threading.RLock()
+        self._numbers       = deque()
+        self._pending       = {}   # connection -> the block reserved by its open transaction
+
+    def allocate(self) -> str:
+        return self.allocate_many(1)[0]
+
+    def allocate_many(self, count: int) -> list[str]:
+        """
+        Allocate `count` unique numbers.
+
+        Args:
+            count (int): The number of numbers to allocate.
+
+        Raises:
+            NumberSequenceExhaustedError: If the sequence has run out of numbers.
+
+        Returns:
+            list[str]: The numbers, zero-padded to `digits` characters.
+        """
+        connection = transaction.get_connection()
+        allocated  = []
+
+        with self._lock:
+            while len(allocated) < count:
+                numbers = self._numbers or self._get_pending_numbers(connection)
+                if not numbers:
+                    numbers = self._reserve_block(connection, max(self._get_block_size(), count - len(allocated)))
+
+                while numbers and len(allocated) < count:
+                    allocated.append(numbers.popleft())
+
+        return allocated
+
+    def reset(self) -> None:
+        """Forget every number held in memory, e.g. after the table has been flushed"""
+        with self._lock:
+            self._numbers.clear()
+            self._pending.clear()
+
+    def format(self, serial: int) -> str:
+        number = str(serial).zfill(self._serial_digits)
+        return number + luhn_check_digit(number) if self.checksum else number
+
+    def _get_block_size(self) -> int:
+        return self.block_size or getattr(settings, "ACCOUNT_NUMBER_BLOCK_SIZE", 1000)
+
+    def _get_pending_numbers(self, connection) -> deque:
+        pending = self._pending.get(connection)
+
+        if pending is None:
+            return deque()
+        if not self._is_still_reserved(connection, pending):
+            del self._pending[connection]
+            return deque()
+        return pending.numbers
+
+    def _is_still_reserved(self, connection, pending: "_PendingBlock") -> bool:
+        """
+        Whether the reservation of `pending` is still part of the open transaction of `connection`.
+
+        Free while the savepoint the block was reserved in is still open. Once
+        it has been left, released or rolled back, one query tells whether
+        the reservation survived it.
+        """
+        if not connection.in_atomic_block or connection.atomic_blocks[0] is not pending.transaction:
+            # the transaction ended without committing, a commit hands the block over
+            return False
+        if pending.savepoints <= set(connection.savepoint_ids):
+            return True
+
+        # no other connection can move the sequence while this transaction holds the row
+        if not NumberSequence.objects.filter(name=self.sequence, next_value__gte=pending.stop).exists():
+            return False
+
+        pending.savepoints = frozenset(connection.savepoint_ids)
+        # the callback of the savepoint may have gone with it, releasing twice is harmless
+        transaction.on_commit(lambda: self._release(connection, pending), using=connection.alias)
+        return True
+
+    def _release(self, connection, pending: "_PendingBlock") -> None:
+        """Hand the numbers the transaction didn't use to the other threads, once it has committed"""
+        with self._lock:
+            if self._pending.get(connection) is pending:
+                del self._pending[connection]
+            if not pending.released:
+                pending.released = True
+                self._numbers.extend(pending.numbers)
+
+    def _reserve_block(self, connection, size: int) -> deque:
+        block = NumberSequence.reserve_block(self.sequence, size, first_value=self.first_value)
+
+        if block.stop > 10 ** self._serial_digits:
+            raise NumberSequenceExhaustedError(f"Every {self.digits}-digit {self.sequence.replace('_', ' ')} has been allocated")
+
+        candidates = [self.format(serial) for serial in block]
+        taken      = set(self.model.objects.filter(**{f"{self.field}__in": candidates}).values_list(self.field, flat=True))
+        numbers    = deque(number for number in candidates if number not in taken)
+
+        if not connection.in_atomic_block:
+            self._numbers.extend(numbers)
+            return self._numbers
+
+        pending                   = _PendingBlock(numbers, block.stop, connection.atomic_blocks[0], frozenset(connection.savepoint_ids))
+        self._pending[connection] = pending
+        # dropped by Django if the transaction, or the savepoint the block was reserved in, rolls back
+        transaction.on_commit(lambda: self._release(connection, pending), using=connection.alias)
+        return numbers
+
+
+class _PendingBlock:
+    """A block reserved inside a transaction, drawn from by that transaction only until it commits"""
+
+    def __init__(self, numbers: deque, stop: int, transaction, savepoints: frozenset):
+        self.numbers     = numbers
+        self.stop        = stop          # the value of the sequence once the block was reserved
+        self.transaction = transaction   # the outermost atomic block of the transaction
+        self.savepoints  = savepoints    # the savepoints open when the block was reserved, or last seen to hold it
+        self.released    = False
+
+
+# Account numbers are 7 digits plus a Luhn check digit. Sort codes stay at the
+# 6 digits the rest of the app expects, a check digit would leave only 100,000
+# of them and every bank account has its own.
+account_number_allocator = BlockAllocator("account_number", BankAccount, "account_number", digits=8, checksum=True)
+sort_code_allocator      = BlockAllocator("sort_code", BankAccount, "sort_code", digits=6)
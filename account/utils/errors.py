@@ -203,3 +203,88 @@ class IncorrectCVCLengthError(CustomBaseError):
 
     def __init__(self, message="The CVC length is invalid"):
         super().__init__(message)
+
+
+
+class CardInsufficientFundsError(CustomBaseError):
+    """
+    Raised when an operation attempts to withdraw or transfer more funds 
+    than are available on the card.
+
+    Inherits from:
+        CustomBaseError
+
+    Default message:
+        "The card has insufficient funds"
+    """
+    def __init__(self, message="The card has insufficient funds"):
+        super().__init__(message)
+
+
+
+class IncorrectCardTypeError(CustomBaseError):
+    """
+    Raised when an object that is not an instance of the expected Card type 
+    is used in a context requiring a valid card.
+
+    Inherits from:
+        CustomBaseError
+
+    Default message:
+        "Expected a Card instance"
+    """
+    def __init__(self, message="Expected a Card instance"):
+        super().__init__(message)
+
+
+
+class LedgerEntryIsImmutableError(CustomBaseError):
+    """
+    Raised when an attempt is made to modify or delete a ledger entry.
+
+    The ledger is append-only, a mistake is corrected by posting a new
+    transfer that reverses it, never by editing the original entries.
+
+    Inherits from:
+        CustomBaseError
+
+    Default message:
+        "Ledger entries cannot be modified or deleted"
+    """
+    def __init__(self, message="Ledger entries cannot be modified or deleted"):
+        super().__init__(message)
+
+
+
+class NumberSequenceExhaustedError(CustomBaseError):
+    """
+    Raised when a number sequence has handed out every value that fits in its
+    number of digits, e.g. every 8-digit account number has been issued.
+
+    Inherits from:
+        CustomBaseError
+
+    Default message:
+        "The number sequence has no numbers left to allocate"
+    """
+    def __init__(self, message="The number sequence has no numbers left to allocate"):
+        super().__init__(message)
+
+
+
+class CrossShardTransferError(CustomBaseError):
+    """
+    Raised when a transfer's source and target accounts are held on different shards.
+
+    Each shard commits on its own, so the debit, the credit and their ledger
+    entries could not be applied atomically. Such a transfer is refused
+    rather than risk one leg committing without the other.
+
+    Inherits from:
+        CustomBaseError
+
+    Default message:
+        "The source and target accounts are held on different shards"
+    """
+    def __init__(self, message="The source and target accounts are held on different shards"):
+        super().__init__(message)
@@ -2,20 +2,29 @@
 from django.shortcuts import render
 from django.views.decorators.csrf import csrf_protect
 from django.contrib.auth.decorators import login_required
-from django.http import HttpRequest
+from django.http import HttpRequest, StreamingHttpResponse
+from django.utils.cache import get_conditional_response
 
 from .utils.errors import ProfileAlreadyExistsError, UserDoesNotExistError
 from .views_helper import (handle_profile_json,
                            update_changed_profile_fields, 
-                            api_response
+                            api_response,
+                            has_conditional_headers,
+                            create_profile_etag,
+                            set_profile_cache_headers,
                             )
+from utils.db_router import use_read_replica
+from utils.history import batch_view_history
 from .models import Profile
+from .statements import (STATEMENT_FORMATS, get_statement_account, get_statement_filename,
+                         parse_statement_range, stream_statement)
 from .utils.utils import profile_to_dict
 
 
 
 @csrf_protect
 @login_required
+@batch_view_history
 def save_profile_details(request):
     """
     Handle a POST request from the frontend to save user profile details.
@@ -71,7 +80,7 @@ def save_profile_details(request):
             Profile: The newly created user profile object.
         """
         user = request.user
-        if Profile.objects.filter(user=user).exists():
+        if Profile.objects.for_user(user).filter(user=user).exists():
             raise ProfileAlreadyExistsError("Profile for this user already exists")
                 
         profile = Profile.objects.create(
@@ -93,6 +102,7 @@ def save_profile_details(request):
        
 @csrf_protect
 @login_required
+@batch_view_history
 def update_profile_details(request):
     """
     Handle a POST request from the frontend to update the user profile details.
@@ -146,6 +156,7 @@ def update_profile_details(request):
     
 
 
+@use_read_replica
 @login_required
 def get_profile_details(request):
     """
@@ -155,6 +166,12 @@ def get_profile_details(request):
     user's profile data as a JSON response. Since this is a read-only GET request, a
     CSRF token or decorator is not required.
 
+    The response carries an `ETag` derived from the profile's primary key and
+    `modified_on`, plus a `Last-Modified` header. When the browser revalidates
+    with `If-None-Match`/`If-Modified-Since` the check is answered from a single
+    `values_list` query, without building the `Profile` instance, and a
+    `304 Not Modified` is returned if the profile hasn't changed.
+
     Returns:
         JsonResponse: A JSON response containing the user's profile data or an error
                     message if retrieval fails.
@@ -163,13 +180,69 @@ def get_profile_details(request):
     if request.method != "GET":
         return api_response(error="Only GET method is allowed", status_code=405)
     
+    if has_conditional_headers(request):
+        version = Profile.objects.for_user(request.user).filter(user=request.user).values_list("pk", "modified_on").first()
+        if version:
+            not_modified = get_conditional_response(request,
+                                                    etag=create_profile_etag(*version),
+                                                    last_modified=int(version[1].timestamp()),
+                                                    )
+            if not_modified is not None:
+                return set_profile_cache_headers(not_modified, *version)
+
     profile = Profile.get_by_user(request.user)
 
     if profile:
         updated_data = profile_to_dict(profile)
 
-        return api_response(status_code=200, message="Successfully retrieved the data", success=True, data=updated_data)        
+        response = api_response(status_code=200, message="Successfully retrieved the data", success=True, data=updated_data)        
+        return set_profile_cache_headers(response, profile.pk, profile.modified_on)
     
-    return api_response(status_code=400, message="Failed to retrieve data", success=True, data={})    
+    return api_response(status_code=400, message="Failed to retrieve data", success=True, data={})
+
+
+
+@login_required
+def export_statement(request):
+    """
+    Handles a GET request to download the statement of one of the user's bank accounts or wallets.
+
+    The statement is streamed as it is read from the database, so a statement
+    covering years of activity starts downloading straight away and doesn't
+    have to fit in memory.
+
+    Query parameters:
+        account (str): Either "bank" or "wallet".
+        id (str): The `bank_id` or `wallet_id` of the account.
+        start (str): The first day included, `YYYY-MM-DD`. Optional.
+        end (str): The last day included, `YYYY-MM-DD`. Optional.
+        format (str): Either "csv" (the default) or "jsonl".
+        gzip (str): "1" to download the statement gzipped.
+
+    Returns:
+        StreamingHttpResponse: The statement as an attachment, or a JSON error response.
+    """
+    if request.method != "GET":
+        return api_response(error="Only GET method is allowed", status_code=405)
+
+    file_format = request.GET.get("format", "csv")
+    compress    = request.GET.get("gzip") == "1"
+
+    if file_format not in STATEMENT_FORMATS:
+        return api_response(error="The format must be either 'csv' or 'jsonl'", status_code=400)
+
+    try:
+        start, end = parse_statement_range(request.GET.get("start"), request.GET.get("end"))
+        account    = get_statement_account(request.GET.get("account", ""), request.GET.get("id", ""), user=request.user)
+    except ValueError as e:
+        return api_response(error=str(e), status_code=400)
+
+    if account is None:
+        return api_response(error="The account does not exist", status_code=404)
 
- 
+    response = StreamingHttpResponse(stream_statement(account, start=start, end=end, file_format=file_format, compress=compress),
+                                     content_type="application/gzip" if compress else STATEMENT_FORMATS[file_format],
+                                     )
+    filename = get_statement_filename(account, start=start, end=end, file_format=file_format, compress=compress)
+    response["Content-Disposition"] = f'attachment; filename="{filename}"'
+    return response
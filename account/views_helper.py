@@ -3,7 +3,9 @@ import json
 from typing import Optional, Any
 from django.http import JsonResponse
 from django.db import IntegrityError
-from django.http import HttpRequest
+from django.http import HttpRequest, HttpResponse
+from django.utils.cache import patch_cache_control
+from django.utils.http import http_date, quote_etag
 
 from .models import Profile
 from .utils.errors import ProfileAlreadyExistsError, UserDoesNotExistError
@@ -160,3 +162,30 @@ def update_changed_profile_fields(data: dict, profile: Profile):
     
     return profile
 
+
+
+def has_conditional_headers(request: HttpRequest) -> bool:
+    return "If-None-Match" in request.headers or "If-Modified-Since" in request.headers
+
+
+def create_profile_etag(pk: int, modified_on) -> str:
+    """
+    Build the ETag of a profile from its primary key and `modified_on`.
+
+    `modified_on` is bumped on every save, so the tag changes whenever the
+    profile does, and the primary key makes a deleted and re-created profile
+    never collide with the old one.
+    """
+    return quote_etag(f"profile-{pk}-{int(modified_on.timestamp() * 1_000_000)}")
+
+
+def set_profile_cache_headers(response: HttpResponse, pk: int, modified_on) -> HttpResponse:
+    """
+    Add the validators to a profile response and make the browser revalidate
+    on every use (`no-cache`) without letting shared caches store it (`private`).
+    """
+    response["ETag"]          = create_profile_etag(pk, modified_on)
+    response["Last-Modified"] = http_date(modified_on.timestamp())
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
@@ -1,6 +1,6 @@
 from simple_history.admin import SimpleHistoryAdmin
 from django.contrib import admin
-from .models import User, Verification, EmailLogger
+from .models import User, Verification, EmailLogger, EmailOutbox
 from .forms import VerificationModelAdminForm
 
 
@@ -52,6 +52,17 @@ class EmailLoggerAdmin(admin.ModelAdmin):
     list_filter         = ["status"]    
     
     
+class EmailOutboxAdmin(admin.ModelAdmin):
+
+    list_display        = ["to_email", "subject", "status", "attempts", "next_attempt_on", "sent_on", "created_on"]
+    list_display_links  = ["to_email", "subject"]
+    readonly_fields     = ["from_email", "to_email", "subject", "html_template", "text_template", "context",
+                           "attempts", "last_error", "claimed_by", "sent_on", "created_on", "modified_on"]
+    list_per_page       = 25
+    search_fields       = ["to_email", "subject"]
+    list_filter         = ["status"]
+
+
 class VerificationAdminModel(admin.ModelAdmin):
     form                 = VerificationModelAdminForm
     list_display         = ["full_name", "code", "num_of_days_to_expire", "created_on", "verify_by"]
@@ -69,4 +80,5 @@ class VerificationAdminModel(admin.ModelAdmin):
     
 admin.site.register(User, UserAdmin)
 admin.site.register(Verification, VerificationAdminModel)
-admin.site.register(EmailLogger, EmailLoggerAdmin)
\ No newline at end of file
+admin.site.register(EmailLogger, EmailLoggerAdmin)
+admin.site.register(EmailOutbox, EmailOutboxAdmin)
\ No newline at end of file
@@ -7,3 +7,5 @@ class AuthenticationConfig(AppConfig):
     
     def ready(self):
         import authentication.signals
+        from .sweeper import start_sweeper
+        start_sweeper()
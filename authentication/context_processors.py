@@ -1,10 +1,10 @@
-from account.models import Profile
+from .user_summary import get_user_summary
 
 
 def is_account_active(request):
     user = request.user
     if user.is_authenticated:
-        return "Active account" if user.is_active else "Account is not active"
+        return "Active account" if get_user_summary(request).is_active else "Account is not active"
 
 
 def is_user_logged_in(request):
@@ -20,10 +20,12 @@ def show_user_information(request):
     is_logged_in        = False
     
     if request.user.is_authenticated:
+        summary = get_user_summary(request)
+
         pin                = request.user.pin 
-        joined_date        = request.user.joined_on
+        joined_date        = summary.joined_on
         email              = request.user.email
-        is_profile_created = Profile.objects.filter(user=request.user).exists()
+        is_profile_created = summary.is_profile_created
         username           = request.user.username
         is_active          = is_account_active(request)
         is_logged_in       = is_user_logged_in(request)
@@ -38,4 +40,4 @@ def show_user_information(request):
         "LOGGED_IN": is_logged_in
 
 
-    }
\ No newline at end of file
+    }
@@ -0,0 +1,90 @@
+import time
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from authentication.models import User, Verification
+from utils.generator import generate_code
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare the query count and latency of the email verification flow before and after the "
+        "single-UPDATE rewrite. All rows created by the benchmark are rolled back when it finishes."
+    )
+
+    def add_arguments(self, parser):
+        # the default local memory cache only holds 300 entries, more users than that measure cache misses
+        parser.add_argument("--users", type=int, default=250, help="Number of users verified by each flow")
+
+    def handle(self, *args, **options):
+        num_of_users = options["users"]
+
+        with transaction.atomic():
+            flows = [
+                ("before", self._verify_before, self._regenerate_before),
+                ("after", self._verify_after, self._regenerate_after),
+            ]
+            results = [(name, *self._run(name, num_of_users, verify, regenerate)) for name, verify, regenerate in flows]
+            transaction.set_rollback(True)
+
+        self.stdout.write(f"Users per flow : {num_of_users:,}")
+        for name, queries, elapsed in results:
+            self.stdout.write(f"{name:<6} : {queries / num_of_users:.1f} queries and {elapsed / num_of_users * 1000:.3f} ms "
+                              f"per user (regenerate an expired code, then verify)")
+
+        (_, old_queries, old_elapsed), (_, new_queries, new_elapsed) = results
+        self.stdout.write(self.style.SUCCESS(f"Queries {old_queries / new_queries:.1f}x fewer, "
+                                             f"latency {old_elapsed / new_elapsed:.1f}x lower"))
+
+    def _run(self, name: str, num_of_users: int, verify, regenerate):
+        users = User.objects.bulk_create(
+            User(username=f"benchmark-{name}-{i}", email=f"benchmark-{name}-{i}@example.com", first_name="Bench", surname="Mark")
+            for i in range(num_of_users)
+        )
+        for user in users:
+            Verification.objects.create(user=user)
+        codes = dict(Verification.objects.filter(user__in=users).values_list("user__username", "code"))
+
+        # the username -> id cache is warm in production after the first attempt
+        cache.clear()
+        for username in codes:
+            User.get_id_by_username(username)
+
+        queries = []
+
+        def count_queries(execute, sql, params, many, context):
+            queries.append(sql)
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(count_queries):
+            start = time.perf_counter()
+            for username, code in codes.items():
+                code = regenerate(username, code)
+                verify(username, code)
+            elapsed = time.perf_counter() - start
+
+        return len(queries), elapsed
+
+    def _regenerate_before(self, username: str, code: str) -> str:
+        verification      = Verification.objects.get(user__username=username, code=code)
+        verification.code = generate_code()
+        verification.save()
+        return verification.code
+
+    def _verify_before(self, username: str, code: str) -> None:
+        verification = Verification.objects.get(user__username=username, code=code)
+        verification.user.is_email_verified = True
+        verification.user.save()
+        verification.delete()
+
+    def _regenerate_after(self, username: str, code: str) -> str:
+        verification = Verification.get_by_username_and_code(code, username)
+        verification.regenerate_code()
+        return verification.code
+
+    def _verify_after(self, username: str, code: str) -> None:
+        verification = Verification.get_by_username_and_code(code, username)
+        verification.set_email_to_verified()
+        verification.delete()
@@ -0,0 +1,32 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from authentication.sweeper import purge_verifications
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete expired verification codes in bounded batches and, with --user-retention-days, "
+        "users that never verified their email."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000, help="Maximum number of rows deleted per statement")
+        parser.add_argument("--grace-days", type=int, default=getattr(settings, "VERIFICATION_PURGE_GRACE_DAYS", 7),
+                            help="Only delete codes that expired more than this many days ago")
+        parser.add_argument("--user-retention-days", type=int, default=getattr(settings, "UNVERIFIED_USER_RETENTION_DAYS", None),
+                            help="Also delete unverified users without a profile that joined more than this many days ago")
+
+    def handle(self, *args, **options):
+        retention_days = options["user_retention_days"]
+
+        stats = purge_verifications(batch_size=options["batch_size"],
+                                    grace=timedelta(days=options["grace_days"]),
+                                    user_retention=timedelta(days=retention_days) if retention_days is not None else None,
+                                    )
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Deleted {stats.verifications:,} verification(s) and {stats.users:,} user(s) in {stats.elapsed:.3f}s"
+        ))
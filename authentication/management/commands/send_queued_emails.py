@@ -0,0 +1,43 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from authentication.outbox import drain_outbox, get_max_attempts
+
+
+class Command(BaseCommand):
+    help = (
+        "Send the emails waiting in the outbox, one batch per SMTP connection. "
+        "Run it once from cron or keep it running with --loop."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=100, help="Number of emails sent over one SMTP connection")
+        parser.add_argument("--max-attempts", type=int, default=get_max_attempts(),
+                            help="Number of attempts before an email is marked as failed")
+        parser.add_argument("--loop", action="store_true", help="Keep polling the outbox instead of exiting once it is empty")
+        parser.add_argument("--sleep", type=float, default=5, help="Seconds to wait between polls when the outbox is empty")
+
+    def handle(self, *args, **options):
+        batch_size   = options["batch_size"]
+        max_attempts = options["max_attempts"]
+        total_sent   = 0
+        total_failed = 0
+
+        while True:
+            result        = drain_outbox(batch_size=batch_size, max_attempts=max_attempts)
+            total_sent   += result.sent
+            total_failed += result.failed
+
+            if result.sent or result.failed:
+                continue
+
+            if not options["loop"]:
+                break
+
+            try:
+                time.sleep(options["sleep"])
+            except KeyboardInterrupt:
+                break
+
+        self.stdout.write(self.style.SUCCESS(f"Sent {total_sent} email(s), {total_failed} failed and will be retried or given up on"))
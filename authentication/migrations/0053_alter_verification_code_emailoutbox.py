@@ -0,0 +1,38 @@
+# Generated by Django 5.2.3 on 2026-10-18 02:45
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authentication', '0052_alter_verification_code_historicaluser'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EmailOutbox',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('from_email', models.EmailField(max_length=100)),
+                ('to_email', models.EmailField(max_length=200)),
+                ('subject', models.CharField(max_length=100)),
+                ('html_template', models.CharField(max_length=255)),
+                ('text_template', models.CharField(max_length=255)),
+                ('context', models.JSONField(blank=True, default=dict)),
+                ('status', models.CharField(choices=[('P', 'Pending'), ('I', 'Sending'), ('S', 'Sent'), ('F', 'Failed')], default='P', max_length=1)),
+                ('attempts', models.PositiveSmallIntegerField(default=0)),
+                ('last_error', models.TextField(blank=True)),
+                ('next_attempt_on', models.DateTimeField(default=django.utils.timezone.now)),
+                ('claimed_by', models.CharField(blank=True, max_length=32)),
+                ('sent_on', models.DateTimeField(blank=True, null=True)),
+                ('created_on', models.DateTimeField(auto_now_add=True)),
+                ('modified_on', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name_plural': 'Email outbox',
+                'indexes': [models.Index(fields=['status', 'next_attempt_on'], name='authenticat_status_b4e314_idx')],
+            },
+        ),
+    ]
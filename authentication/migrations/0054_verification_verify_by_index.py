@@ -0,0 +1,17 @@
+# Generated by Django 5.2.3 on 2026-10-18 02:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authentication', '0053_alter_verification_code_emailoutbox'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='verification',
+            index=models.Index(fields=['verify_by'], name='authenticat_verify__f8e221_idx'),
+        ),
+    ]
@@ -1,11 +1,21 @@
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
 from django.db import models
 from django.utils import timezone
-from simple_history.models import HistoricalRecords
 from datetime import timedelta
 from django.contrib.auth.models import AbstractBaseUser, PermissionsMixin, BaseUserManager
 
 from django_email_sender.models import EmailBaseLog
 from utils.generator import generate_code
+from utils.history import PolicyHistoricalRecords
+from utils.mixins import SaveChangedFieldsMixin
+
+
+def get_username_cache_key(username: str) -> str:
+    # hashed, usernames can contain characters and lengths that some cache backends reject
+    return f"user-id:{hashlib.sha1(username.encode()).hexdigest()}"
 
 
 # Create your models here.
@@ -35,7 +45,7 @@ class CustomUser(BaseUserManager):
     
    
     
-class User(AbstractBaseUser, PermissionsMixin):
+class User(SaveChangedFieldsMixin, AbstractBaseUser, PermissionsMixin):
     
     first_name        = models.CharField(max_length=40)
     surname           = models.CharField(max_length=10)
@@ -53,7 +63,10 @@ class User(AbstractBaseUser, PermissionsMixin):
     USERNAME_FIELD    = "email"
     REQUIRED_FIELDS   = ["username", "first_name", "surname"]
     objects           = CustomUser()
-    history           = HistoricalRecords()
+    history           = PolicyHistoricalRecords()
+
+    # last_login is `auto_now`, only the login itself should move it
+    touch_fields_on_save = ()
     
     def __str__(self):
         return f"{self.first_name.capitalize()} {self.surname.capitalize()}"
@@ -75,6 +88,24 @@ class User(AbstractBaseUser, PermissionsMixin):
     def get_by_email(cls, email):
         return cls._get_by_field_name(field_name="email", field_value=email)
     
+    @classmethod
+    def get_id_by_username(cls, username: str):
+        """
+        Returns the id of the user with `username`, or None if there isn't one.
+
+        The id is cached, usernames don't change once registered, so repeated
+        lookups (e.g. every attempt at entering a verification code) cost no
+        query. The cached entry is dropped when the user is saved or deleted.
+        """
+        cache_key = get_username_cache_key(username)
+        user_id   = cache.get(cache_key)
+
+        if user_id is None:
+            user_id = cls.objects.filter(username=username).values_list("pk", flat=True).first()
+            if user_id is not None:
+                cache.set(cache_key, user_id, timeout=getattr(settings, "USERNAME_ID_CACHE_TIMEOUT", 24 * 60 * 60))
+        return user_id
+
     @classmethod
     def get_by_username(cls, username):
         return cls._get_by_field_name(field_name="username", field_value=username)
@@ -108,6 +139,7 @@ class Verification(models.Model):
     class Meta:
         indexes = [
             models.Index(fields=['user', 'code']),
+            models.Index(fields=['verify_by']),
         ]
 
     def __str__(self):
@@ -119,21 +151,65 @@ class Verification(models.Model):
         
     @classmethod
     def get_by_username_and_code(cls, code: str, username: str):
-        
+        """
+        Find the verification with `code` that belongs to `username`.
+
+        The username is resolved to a user id from the cache, so the lookup is
+        a single query on the `(user, code)` index rather than a join on the
+        user table.
+        """
         if not code or not username:
             return None
+
+        user_id = User.get_id_by_username(username.lower())
+        if user_id is None:
+            return None
+
         try:
-            return cls.objects.get(user__username=username.lower(), code=code)
+            return cls.objects.get(user_id=user_id, code=code)
         except cls.DoesNotExist:
             return None
 
+    @classmethod
+    def delete_expired(cls, expired_before=None, batch_size: int = 1000) -> int:
+        """
+        Delete the verifications that expired before `expired_before`, one
+        batch at a time so no single statement holds the table for long.
+
+        Args:
+            expired_before (datetime): Defaults to now.
+            batch_size (int): The maximum number of rows deleted per statement.
+
+        Returns:
+            int: The number of verifications deleted.
+        """
+        expired_before = expired_before or timezone.now()
+        deleted        = 0
+
+        while True:
+            # uses the index on verify_by, and stays a bounded range scan however large the table is
+            batch = list(cls.objects.filter(verify_by__lt=expired_before)
+                                    .order_by("verify_by")
+                                    .values_list("pk", flat=True)[:batch_size])
+            if not batch:
+                return deleted
+
+            deleted += cls.objects.filter(pk__in=batch).delete()[0]
+
     def regenerate_code(self):
-        self.code = generate_code()
-        self.save()
+        """Give the verification a new code and expiry date with a single UPDATE"""
+        now = timezone.now()
+
+        self.code        = generate_code()
+        self.verify_by   = now + timedelta(days=self.num_of_days_to_expire)
+        self.modified_on = now
+        Verification.objects.filter(pk=self.pk).update(code=self.code, verify_by=self.verify_by, modified_on=now)
 
     def set_email_to_verified(self):
-        self.user.is_email_verified = True
-        self.user.save()
+        """Mark the user's email as verified with a single UPDATE, without loading the user"""
+        User.objects.filter(pk=self.user_id).update(is_email_verified=True)
+        if Verification.user.is_cached(self):
+            self.user.is_email_verified = True
 
     def set_email_to_unverified(self):
         self.user.is_email_verified = False
@@ -151,4 +227,46 @@ class Verification(models.Model):
 
 
 class EmailLogger(EmailBaseLog):
-    pass
\ No newline at end of file
+    pass
+
+
+class EmailOutbox(models.Model):
+    """
+    An email waiting to be sent by the `send_queued_emails` worker.
+
+    Views write a row here in the same transaction as the data the email is
+    about (e.g. the new user and their verification code) instead of talking
+    to the SMTP server on the request path. If the transaction rolls back, no
+    email is ever sent, and if SMTP is slow or down the request is unaffected;
+    the worker retries with an exponential backoff.
+    """
+
+    class Status(models.TextChoices):
+        PENDING = "P", "Pending"
+        SENDING = "I", "Sending"
+        SENT    = "S", "Sent"
+        FAILED  = "F", "Failed"
+
+    from_email      = models.EmailField(max_length=100)
+    to_email        = models.EmailField(max_length=200)
+    subject         = models.CharField(max_length=100)
+    html_template   = models.CharField(max_length=255)
+    text_template   = models.CharField(max_length=255)
+    context         = models.JSONField(default=dict, blank=True)
+    status          = models.CharField(choices=Status.choices, max_length=1, default=Status.PENDING)
+    attempts        = models.PositiveSmallIntegerField(default=0)
+    last_error      = models.TextField(blank=True)
+    next_attempt_on = models.DateTimeField(default=timezone.now)
+    claimed_by      = models.CharField(max_length=32, blank=True)
+    sent_on         = models.DateTimeField(blank=True, null=True)
+    created_on      = models.DateTimeField(auto_now_add=True)
+    modified_on     = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name_plural = "Email outbox"
+        indexes = [
+            models.Index(fields=["status", "next_attempt_on"]),
+        ]
+
+    def __str__(self):
+        return f"{self.subject} -> {self.to_email}"
\ No newline at end of file
@@ -0,0 +1,223 @@
+import logging
+from datetime import timedelta
+from secrets import token_hex
+from typing import NamedTuple
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db import transaction
+from django.db.models import F, Q
+from django.template.loader import render_to_string
+from django.utils import timezone
+from django_email_sender.messages import EmailStatus
+
+from .models import EmailOutbox, EmailLogger, Verification, User
+
+
+logger = logging.getLogger("email_sender")
+
+EMAIL_TEMPLATES_FOLDER = "emails_templates/emails"
+MAXIMUM_BACKOFF        = timedelta(hours=6)
+
+
+class DrainResult(NamedTuple):
+    sent:   int
+    failed: int
+
+
+def get_max_attempts() -> int:
+    return getattr(settings, "EMAIL_OUTBOX_MAX_ATTEMPTS", 5)
+
+
+def get_retry_backoff() -> int:
+    return getattr(settings, "EMAIL_OUTBOX_RETRY_BACKOFF_SECONDS", 30)
+
+
+def get_claim_timeout() -> int:
+    return getattr(settings, "EMAIL_OUTBOX_CLAIM_TIMEOUT_SECONDS", 5 * 60)
+
+
+def queue_verification_email(user: User, verification: Verification, url: str, subject: str = "Verify your email"):
+    return _queue_verification_email_helper(subject=subject,
+                                            html_template=f"{EMAIL_TEMPLATES_FOLDER}/register.html",
+                                            text_template=f"{EMAIL_TEMPLATES_FOLDER}/register.txt",
+                                            user=user,
+                                            verification=verification,
+                                            verification_link=url,
+                                            )
+
+
+def queue_resend_verification_email(user: User,
+                                    verification: Verification,
+                                    url: str,
+                                    subject: str = "Expired code, please verify your email again"):
+
+    return _queue_verification_email_helper(subject=subject,
+                                            html_template=f"{EMAIL_TEMPLATES_FOLDER}/expired_email.html",
+                                            text_template=f"{EMAIL_TEMPLATES_FOLDER}/expired_email.txt",
+                                            user=user,
+                                            verification=verification,
+                                            verification_link=url,
+                                            )
+
+
+def _queue_verification_email_helper(subject: str,
+                                     html_template: str,
+                                     text_template: str,
+                                     user: User,
+                                     verification: Verification,
+                                     verification_link: str) -> EmailOutbox:
+
+    if not isinstance(user, User):
+        raise ValueError(f"The user is not an instance of User. Expected a user instance but got type {type(user)}")
+
+    if not isinstance(verification, Verification):
+        raise ValueError(f"The verification is not an instance of Verification. Expected a verification instance but got type {type(verification)}")
+
+    verification.description = subject
+
+    return EmailOutbox.objects.create(from_email=settings.EMAIL_HOST_USER or settings.DEFAULT_FROM_EMAIL or "",
+                                      to_email=user.email,
+                                      subject=subject,
+                                      html_template=html_template,
+                                      text_template=text_template,
+                                      context={"username": user.username,
+                                               "verification_code": verification.code,
+                                               "verification_link": verification_link,
+                                               },
+                                      )
+
+
+def drain_outbox(batch_size: int = 100, max_attempts: int = None) -> DrainResult:
+    """
+    Send one batch of due emails from the outbox.
+
+    The batch is claimed first so that several workers can drain the same
+    outbox without sending an email twice, then every email in the batch is
+    sent over a single SMTP connection. Sent emails are marked as sent and
+    logged to `EmailLogger`; failed ones are retried later with an exponential
+    backoff until `max_attempts` is reached, after which they are marked as
+    failed and left for someone to look at in the admin.
+
+    A claim expires after `EMAIL_OUTBOX_CLAIM_TIMEOUT_SECONDS`, so the emails
+    of a worker that died half way through a batch are picked up again.
+
+    Args:
+        batch_size (int): The maximum number of emails sent in this batch.
+        max_attempts (int): The number of attempts before an email is given up on.
+                            Defaults to the `EMAIL_OUTBOX_MAX_ATTEMPTS` setting.
+
+    Returns:
+        DrainResult: The number of emails sent and the number that failed.
+    """
+    max_attempts = max_attempts or get_max_attempts()
+    emails       = _claim_batch(batch_size)
+
+    if not emails:
+        return DrainResult(sent=0, failed=0)
+
+    sent, failed, logs = [], [], []
+
+    try:
+        with get_connection() as connection:
+            for email in emails:
+                try:
+                    message = _build_message(email, connection)
+                    message.send()
+                except Exception as e:
+                    logger.warning("Failed to send email %s to %s: %s", email.pk, email.to_email, e)
+                    failed.append((email, str(e)))
+                    logs.append(_create_log(email, body="", status=EmailStatus.NOT_SENT))
+                else:
+                    sent.append(email)
+                    logs.append(_create_log(email, body=message.body, status=EmailStatus.SENT))
+
+    except Exception as e:
+        # the connection itself could not be opened or closed, retry whatever wasn't sent
+        logger.warning("Email connection failed: %s", e)
+        handled = {email.pk for email in sent} | {email.pk for email, _ in failed}
+        failed.extend((email, str(e)) for email in emails if email.pk not in handled)
+
+    with transaction.atomic():
+        _mark_as_sent(sent)
+        _schedule_retries(failed, max_attempts)
+        EmailLogger.objects.bulk_create(logs)
+
+    logger.info("Email outbox batch finished: %s sent, %s failed", len(sent), len(failed))
+    return DrainResult(sent=len(sent), failed=len(failed))
+
+
+def _claim_batch(batch_size: int) -> list[EmailOutbox]:
+    now   = timezone.now()
+    token = token_hex(16)
+    due   = (Q(status=EmailOutbox.Status.PENDING) | Q(status=EmailOutbox.Status.SENDING)) & Q(next_attempt_on__lte=now)
+
+    with transaction.atomic():
+        candidates = list(EmailOutbox.objects.select_for_update(skip_locked=True)
+                                             .filter(due)
+                                             .order_by("next_attempt_on", "pk")
+                                             .values_list("pk", flat=True)[:batch_size])
+
+        # the conditional update is what makes the claim safe on databases without SKIP LOCKED
+        EmailOutbox.objects.filter(due, pk__in=candidates).update(status=EmailOutbox.Status.SENDING,
+                                                                  claimed_by=token,
+                                                                  next_attempt_on=now + timedelta(seconds=get_claim_timeout()),
+                                                                  modified_on=now,
+                                                                  )
+
+    return list(EmailOutbox.objects.filter(claimed_by=token, status=EmailOutbox.Status.SENDING).order_by("pk"))
+
+
+def _build_message(email: EmailOutbox, connection) -> EmailMultiAlternatives:
+    message = EmailMultiAlternatives(subject=email.subject,
+                                     body=render_to_string(email.text_template, context=email.context),
+                                     from_email=email.from_email or None,
+                                     to=[email.to_email],
+                                     connection=connection,
+                                     )
+    message.attach_alternative(render_to_string(email.html_template, context=email.context), "text/html")
+    return message
+
+
+def _create_log(email: EmailOutbox, body: str, status: str) -> EmailLogger:
+    return EmailLogger(from_email=email.from_email,
+                       to_email=email.to_email,
+                       subject=email.subject,
+                       email_body=body,
+                       status=str(status),
+                       )
+
+
+def _mark_as_sent(emails: list[EmailOutbox]) -> None:
+    if not emails:
+        return
+
+    now = timezone.now()
+    EmailOutbox.objects.filter(pk__in=[email.pk for email in emails]).update(status=EmailOutbox.Status.SENT,
+                                                                               attempts=F("attempts") + 1,
+                                                                               last_error="",
+                                                                               claimed_by="",
+                                                                               sent_on=now,
+                                                                               modified_on=now,
+                                                                               )
+
+
+def _schedule_retries(failures: list[tuple[EmailOutbox, str]], max_attempts: int) -> None:
+    now = timezone.now()
+
+    for email, error in failures:
+        attempts = email.attempts + 1
+
+        if attempts >= max_attempts:
+            status, next_attempt_on = EmailOutbox.Status.FAILED, now
+        else:
+            backoff                 = timedelta(seconds=get_retry_backoff() * 2 ** (attempts - 1))
+            status, next_attempt_on = EmailOutbox.Status.PENDING, now + min(backoff, MAXIMUM_BACKOFF)
+
+        EmailOutbox.objects.filter(pk=email.pk).update(status=status,
+                                                       attempts=attempts,
+                                                       last_error=error,
+                                                       claimed_by="",
+                                                       next_attempt_on=next_attempt_on,
+                                                       modified_on=now,
+                                                       )
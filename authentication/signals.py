@@ -1,6 +1,11 @@
-from django.db.models.signals import pre_save
+from django.db.models.signals import pre_save, post_save, post_delete
 from django.dispatch import receiver
-from .models import User
+
+from account.models import Profile
+from django.core.cache import cache
+
+from .models import User, get_username_cache_key
+from .user_summary import invalidate_user_summary
 
 
 @receiver(pre_save, sender=User)
@@ -10,7 +15,15 @@ def pre_save_username(sender, instance, *args, **kwargs):
         instance.email      = instance.email.lower()
         instance.username   = instance.username.lower()
 
-    
 
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_user_caches_on_user_change(sender, instance, *args, **kwargs):
+    invalidate_user_summary(instance.pk)
+    cache.delete(get_username_cache_key(instance.username))
 
 
+@receiver(post_save, sender=Profile)
+@receiver(post_delete, sender=Profile)
+def invalidate_user_summary_on_profile_change(sender, instance, *args, **kwargs):
+    invalidate_user_summary(instance.user_id)
@@ -0,0 +1,144 @@
+import logging
+import threading
+import time
+from datetime import timedelta
+from typing import NamedTuple, Optional
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from account.models import Profile
+from account.sharding import get_shards
+from .models import User, Verification
+
+
+logger = logging.getLogger(__name__)
+
+
+class PurgeStats(NamedTuple):
+    verifications: int
+    users:         int
+    elapsed:       float
+
+
+def get_grace_period() -> timedelta:
+    return timedelta(days=getattr(settings, "VERIFICATION_PURGE_GRACE_DAYS", 7))
+
+
+def purge_verifications(batch_size: int = 1000,
+                        grace: timedelta = None,
+                        user_retention: Optional[timedelta] = None) -> PurgeStats:
+    """
+    Delete expired verifications and, optionally, users that never verified.
+
+    A verification is only deleted once it has been expired for longer than
+    `grace`, so a user who comes back shortly after their code expired can
+    still have a new one sent to them.
+
+    Users are only deleted if `user_retention` is given. A user is deleted
+    when they joined more than `user_retention` ago, never verified their
+    email, never got as far as creating a profile and aren't staff.
+
+    Args:
+        batch_size (int): The maximum number of rows deleted per statement.
+        grace (timedelta): Defaults to the `VERIFICATION_PURGE_GRACE_DAYS` setting.
+        user_retention (timedelta): How long unverified users are kept. Not deleted if None.
+
+    Returns:
+        PurgeStats: The number of verifications and users deleted and the time taken.
+    """
+    start = time.perf_counter()
+    now   = timezone.now()
+    grace = get_grace_period() if grace is None else grace
+
+    verifications = Verification.delete_expired(expired_before=now - grace, batch_size=batch_size)
+    users         = 0 if user_retention is None else _purge_unverified_users(now - user_retention, batch_size)
+
+    return PurgeStats(verifications=verifications, users=users, elapsed=time.perf_counter() - start)
+
+
+def _purge_unverified_users(joined_before, batch_size: int) -> int:
+    unverified_users = User.objects.filter(is_email_verified=False,
+                                           is_staff=False,
+                                           is_superuser=False,
+                                           joined_on__lt=joined_before,
+                                           profile__isnull=True,
+                                           )
+    deleted = 0
+    last_pk = 0
+
+    while True:
+        batch = list(unverified_users.filter(pk__gt=last_pk).order_by("pk").values_list("pk", flat=True)[:batch_size])
+        if not batch:
+            return deleted
+
+        last_pk = batch[-1]
+        batch   = _without_profiles_on_the_shards(batch)
+        if batch:
+            with transaction.atomic():
+                User.objects.filter(pk__in=batch).delete()
+            deleted += len(batch)
+
+
+def _without_profiles_on_the_shards(user_ids: list) -> list:
+    # the `profile__isnull` join only sees the profiles on `default`, a sharded profile is on a shard
+    with_profile = set()
+    for alias in get_shards():
+        with_profile.update(Profile._base_manager.using(alias)
+                                                 .filter(user_id__in=user_ids)
+                                                 .values_list("user_id", flat=True))
+    return [user_id for user_id in user_ids if user_id not in with_profile]
+
+
+class VerificationSweeper(threading.Thread):
+    """
+    Runs `purge_verifications` every `interval` seconds in a daemon thread.
+
+    For deployments without cron. It is started by the authentication app
+    when `VERIFICATION_SWEEP_INTERVAL_SECONDS` is set, otherwise run
+    `python manage.py purge_verifications` on a schedule instead.
+    """
+
+    def __init__(self, interval: float, batch_size: int = 1000, user_retention: Optional[timedelta] = None):
+        super().__init__(name="verification-sweeper", daemon=True)
+        self.interval       = interval
+        self.batch_size     = batch_size
+        self.user_retention = user_retention
+        self._stopped       = threading.Event()
+
+    def run(self):
+        while not self._stopped.wait(self.interval):
+            try:
+                stats = purge_verifications(batch_size=self.batch_size, user_retention=self.user_retention)
+                logger.info("Purged %s verification(s) and %s user(s) in %.3fs",
+                            stats.verifications, stats.users, stats.elapsed)
+            except Exception:
+                logger.exception("Failed to purge expired verifications")
+            finally:
+                connection.close()
+
+    def stop(self):
+        self._stopped.set()
+
+
+_sweeper      = None
+_sweeper_lock = threading.Lock()
+
+
+def start_sweeper() -> Optional[VerificationSweeper]:
+    """Start the in-process sweeper once per process if it is configured"""
+    global _sweeper
+
+    interval = getattr(settings, "VERIFICATION_SWEEP_INTERVAL_SECONDS", None)
+    if not interval:
+        return None
+
+    with _sweeper_lock:
+        if _sweeper is None:
+            retention_days = getattr(settings, "UNVERIFIED_USER_RETENTION_DAYS", None)
+            _sweeper       = VerificationSweeper(interval=interval,
+                                                 user_retention=timedelta(days=retention_days) if retention_days else None,
+                                                 )
+            _sweeper.start()
+    return _sweeper
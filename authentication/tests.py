@@ -1,3 +1,316 @@
-from django.test import TestCase
+from datetime import timedelta
+from unittest.mock import patch
+
+from django.test import TestCase, RequestFactory, override_settings
+from django.core import mail
+from django.core.cache import cache
+from django.core.mail.backends.locmem import EmailBackend
+from django.urls import reverse
+from django.utils import timezone
+from django.contrib.auth.models import AnonymousUser
+
+from account.models import Profile
+from .context_processors import show_user_information
+from .models import User, Verification, EmailLogger, EmailOutbox
+from .outbox import drain_outbox, queue_verification_email
+from .sweeper import purge_verifications
+
 
 # Create your tests here.
+
+
+class ShowUserInformationTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+
+        self.factory = RequestFactory()
+        self.user    = User.objects.create(
+                                first_name="Test name",
+                                surname="Test surname",
+                                username="Test username",
+                                email="test@example.com",
+                                pin="1234"
+                                )
+
+    def render_context(self):
+        request      = self.factory.get("/")
+        request.user = self.user
+        return show_user_information(request)
+
+    def test_summary_is_cached_between_requests(self):
+        self.render_context()
+
+        with self.assertNumQueries(0):
+            context = self.render_context()
+
+        self.assertFalse(context["IS_PROFILE_CREATED"])
+        self.assertEqual(context["JOINED_DATE"], self.user.joined_on)
+        self.assertEqual(context["IS_ACTIVE"], "Active account")
+
+    def test_summary_is_memoised_on_the_request(self):
+        request      = self.factory.get("/")
+        request.user = self.user
+
+        with self.assertNumQueries(1):
+            show_user_information(request)
+            show_user_information(request)
+
+    def test_creating_a_profile_invalidates_the_summary(self):
+        self.assertFalse(self.render_context()["IS_PROFILE_CREATED"])
+
+        Profile.objects.create(user=self.user, first_name="Test", surname="User")
+
+        self.assertTrue(self.render_context()["IS_PROFILE_CREATED"])
+
+    def test_deleting_a_profile_invalidates_the_summary(self):
+        profile = Profile.objects.create(user=self.user, first_name="Test", surname="User")
+        self.assertTrue(self.render_context()["IS_PROFILE_CREATED"])
+
+        profile.delete()
+
+        self.assertFalse(self.render_context()["IS_PROFILE_CREATED"])
+
+    def test_saving_the_user_invalidates_the_summary(self):
+        self.render_context()
+
+        self.user.is_active = False
+        self.user.save()
+
+        self.assertEqual(self.render_context()["IS_ACTIVE"], "Account is not active")
+
+    def test_anonymous_user_gets_the_defaults(self):
+        request      = self.factory.get("/")
+        request.user = AnonymousUser()
+
+        with self.assertNumQueries(0):
+            context = show_user_information(request)
+
+        self.assertFalse(context["IS_PROFILE_CREATED"])
+        self.assertIsNone(context["USERNAME"])
+
+
+class CountingEmailBackend(EmailBackend):
+    """A locmem backend that counts how many connections were opened"""
+
+    opened = 0
+
+    def open(self):
+        CountingEmailBackend.opened += 1
+        return True
+
+
+class FailingEmailBackend(EmailBackend):
+
+    def send_messages(self, messages):
+        raise ConnectionRefusedError("SMTP server is down")
+
+
+@override_settings(EMAIL_BACKEND="django.core.mail.backends.locmem.EmailBackend", EMAIL_HOST_USER="bank@example.com")
+class EmailOutboxTest(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create(
+                                first_name="Test name",
+                                surname="Test surname",
+                                username="test_username",
+                                email="test@example.com",
+                                pin="1234"
+                                )
+
+    def queue_emails(self, num_of_emails):
+        for _ in range(num_of_emails):
+            queue_verification_email(user=self.user, verification=Verification(user=self.user), url="http://testserver/verify/")
+
+    def test_register_queues_the_email_instead_of_sending_it(self):
+        response = self.client.post(reverse("register"), data={"email": "new@example.com",
+                                                               "username": "new_user",
+                                                               "first_name": "New",
+                                                               "password": "password123",
+                                                               "confirm_password": "password123",
+                                                               })
+
+        self.assertRedirects(response, reverse("login"), fetch_redirect_response=False)
+        self.assertEqual(len(mail.outbox), 0)
+
+        email = EmailOutbox.objects.get()
+        self.assertEqual(email.to_email, "new@example.com")
+        self.assertEqual(email.status, EmailOutbox.Status.PENDING)
+        self.assertEqual(email.context["verification_code"], Verification.objects.get(user__username="new_user").code)
+
+    def test_register_saves_nothing_if_queueing_fails(self):
+        with patch("authentication.views.queue_verification_email", side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                self.client.post(reverse("register"), data={"email": "new@example.com",
+                                                            "username": "new_user",
+                                                            "first_name": "New",
+                                                            "password": "password123",
+                                                            "confirm_password": "password123",
+                                                            })
+
+        self.assertFalse(User.objects.filter(username="new_user").exists())
+        self.assertFalse(Verification.objects.exists())
+
+    @override_settings(EMAIL_BACKEND="authentication.tests.CountingEmailBackend")
+    def test_worker_sends_a_batch_over_one_connection(self):
+        CountingEmailBackend.opened = 0
+        self.queue_emails(3)
+
+        result = drain_outbox(batch_size=10)
+
+        self.assertEqual(result.sent, 3)
+        self.assertEqual(CountingEmailBackend.opened, 1)
+        self.assertEqual(len(mail.outbox), 3)
+        self.assertEqual(mail.outbox[0].to, ["test@example.com"])
+        self.assertEqual(EmailOutbox.objects.filter(status=EmailOutbox.Status.SENT).count(), 3)
+        self.assertEqual(EmailLogger.objects.filter(to_email="test@example.com").count(), 3)
+
+    def test_worker_only_sends_an_email_once(self):
+        self.queue_emails(2)
+
+        drain_outbox()
+        drain_outbox()
+
+        self.assertEqual(len(mail.outbox), 2)
+
+    @override_settings(EMAIL_BACKEND="authentication.tests.FailingEmailBackend", EMAIL_OUTBOX_RETRY_BACKOFF_SECONDS=10)
+    def test_failed_email_is_retried_with_backoff(self):
+        self.queue_emails(1)
+
+        result = drain_outbox(max_attempts=3)
+        email  = EmailOutbox.objects.get()
+
+        self.assertEqual(result.failed, 1)
+        self.assertEqual(email.status, EmailOutbox.Status.PENDING)
+        self.assertEqual(email.attempts, 1)
+        self.assertIn("SMTP server is down", email.last_error)
+        self.assertGreater(email.next_attempt_on, timezone.now() + timedelta(seconds=9))
+
+        # not due yet, so nothing is attempted
+        self.assertEqual(drain_outbox(max_attempts=3).failed, 0)
+
+        EmailOutbox.objects.update(next_attempt_on=timezone.now())
+        drain_outbox(max_attempts=3)
+        email.refresh_from_db()
+        self.assertGreater(email.next_attempt_on, timezone.now() + timedelta(seconds=19))
+
+    @override_settings(EMAIL_BACKEND="authentication.tests.FailingEmailBackend")
+    def test_email_is_marked_as_failed_after_max_attempts(self):
+        self.queue_emails(1)
+
+        for _ in range(2):
+            EmailOutbox.objects.update(next_attempt_on=timezone.now())
+            drain_outbox(max_attempts=2)
+
+        self.assertEqual(EmailOutbox.objects.get().status, EmailOutbox.Status.FAILED)
+        self.assertEqual(EmailLogger.objects.count(), 2)
+
+
+class PurgeVerificationsTest(TestCase):
+
+    def create_user(self, username, **kwargs):
+        return User.objects.create(first_name="Test name",
+                                   surname="Test surname",
+                                   username=username,
+                                   email=f"{username}@example.com",
+                                   pin="1234",
+                                   **kwargs
+                                   )
+
+    def create_verification(self, user, expired_days_ago):
+        verification = Verification.objects.create(user=user)
+        Verification.objects.filter(pk=verification.pk).update(verify_by=timezone.now() - timedelta(days=expired_days_ago))
+        return verification
+
+    def test_only_verifications_expired_past_the_grace_period_are_deleted(self):
+        user = self.create_user("test_username")
+        long_expired     = self.create_verification(user, expired_days_ago=10)
+        recently_expired = self.create_verification(user, expired_days_ago=1)
+        current          = Verification.objects.create(user=user)
+
+        stats = purge_verifications(grace=timedelta(days=7))
+
+        self.assertEqual(stats.verifications, 1)
+        self.assertEqual(set(Verification.objects.values_list("pk", flat=True)), {recently_expired.pk, current.pk})
+        self.assertFalse(Verification.objects.filter(pk=long_expired.pk).exists())
+
+    def test_verifications_are_deleted_in_batches(self):
+        user = self.create_user("test_username")
+        for _ in range(5):
+            self.create_verification(user, expired_days_ago=10)
+
+        self.assertEqual(Verification.delete_expired(batch_size=2), 5)
+        self.assertFalse(Verification.objects.exists())
+
+    def test_users_are_kept_unless_a_retention_window_is_given(self):
+        self.create_user("unverified")
+        User.objects.update(joined_on=timezone.now() - timedelta(days=60))
+
+        self.assertEqual(purge_verifications().users, 0)
+        self.assertEqual(purge_verifications(user_retention=timedelta(days=30)).users, 1)
+        self.assertFalse(User.objects.exists())
+
+    def test_only_abandoned_registrations_are_deleted(self):
+        verified = self.create_user("verified", is_email_verified=True)
+        staff    = self.create_user("staff", is_staff=True)
+        recent   = self.create_user("recent")
+        old      = self.create_user("old")
+        User.objects.exclude(pk=recent.pk).update(joined_on=timezone.now() - timedelta(days=60))
+
+        stats = purge_verifications(user_retention=timedelta(days=30))
+
+        self.assertEqual(stats.users, 1)
+        self.assertEqual(set(User.objects.values_list("pk", flat=True)), {verified.pk, staff.pk, recent.pk})
+        self.assertFalse(User.objects.filter(pk=old.pk).exists())
+
+
+class VerificationLookupTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user         = User.objects.create(
+                                first_name="Test name",
+                                surname="Test surname",
+                                username="test_username",
+                                email="test@example.com",
+                                pin="1234"
+                                )
+        self.verification = Verification.objects.create(user=self.user)
+
+    def test_lookup_is_a_single_query_once_the_username_is_cached(self):
+        Verification.get_by_username_and_code(self.verification.code, "test_username")
+
+        with self.assertNumQueries(1):
+            verification = Verification.get_by_username_and_code(self.verification.code, "Test_Username")
+
+        self.assertEqual(verification, self.verification)
+
+    def test_lookup_with_wrong_code_or_username_returns_none(self):
+        self.assertIsNone(Verification.get_by_username_and_code("000000000", "test_username"))
+        self.assertIsNone(Verification.get_by_username_and_code(self.verification.code, "unknown"))
+
+    def test_deleting_the_user_drops_the_cached_id(self):
+        Verification.get_by_username_and_code(self.verification.code, "test_username")
+        self.user.delete()
+
+        self.assertIsNone(User.get_id_by_username("test_username"))
+
+    def test_regenerate_code_is_a_single_update(self):
+        Verification.objects.filter(pk=self.verification.pk).update(verify_by=timezone.now() - timedelta(days=1))
+        self.verification.refresh_from_db()
+
+        with self.assertNumQueries(1):
+            self.verification.regenerate_code()
+
+        self.verification.refresh_from_db()
+        self.assertFalse(self.verification.is_code_expired)
+        self.assertEqual(len(self.verification.code), 9)
+
+    def test_set_email_to_verified_is_a_single_update(self):
+        verification = Verification.objects.get(pk=self.verification.pk)
+
+        with self.assertNumQueries(1):
+            verification.set_email_to_verified()
+
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.is_email_verified)
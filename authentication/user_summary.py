@@ -0,0 +1,78 @@
+"""
+A small, cached summary of the logged-in user for the templates.
+
+`show_user_information` runs on every template render, including every admin
+page, so instead of querying for the user's profile each time it reads a
+`UserSummary` that is:
+
+    - memoised on the request, so several renders in one request share it,
+    - cached in the Django cache under a versioned, per-user key,
+    - invalidated by the `User` and `Profile` post_save/post_delete signals,
+    - built from the primary, never the read replica, even in a read-only
+      view, so a lagging replica isn't cached for the next hour.
+
+Bump `USER_SUMMARY_CACHE_VERSION` whenever the fields of `UserSummary` change
+so that entries written by an older release are ignored.
+"""
+
+from datetime import datetime
+from typing import NamedTuple, Optional
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpRequest
+
+from utils.db_router import read_from_primary
+
+
+USER_SUMMARY_CACHE_VERSION = 2
+USER_SUMMARY_REQUEST_ATTR  = "_user_summary"
+
+
+class UserSummary(NamedTuple):
+    is_profile_created: bool
+    joined_on: Optional[datetime]
+    is_active: bool
+
+
+def get_user_summary_cache_key(user_id: int) -> str:
+    return f"user-summary:v{USER_SUMMARY_CACHE_VERSION}:{user_id}"
+
+
+def build_user_summary(user) -> UserSummary:
+    from account.models import Profile
+
+    return UserSummary(is_profile_created=Profile.objects.for_user(user).filter(user=user).exists(),
+                       joined_on=user.joined_on,
+                       is_active=user.is_active,
+                       )
+
+
+def get_user_summary(request: HttpRequest) -> Optional[UserSummary]:
+    """
+    Return the summary for the request's user, or None for an anonymous user.
+
+    Looks on the request first, then in the cache, and only builds the summary
+    from the database when neither has it.
+    """
+    if not request.user.is_authenticated:
+        return None
+
+    summary = getattr(request, USER_SUMMARY_REQUEST_ATTR, None)
+    if summary is not None:
+        return summary
+
+    cache_key = get_user_summary_cache_key(request.user.pk)
+    summary   = cache.get(cache_key)
+
+    if summary is None:
+        with read_from_primary():
+            summary = build_user_summary(request.user)
+        cache.set(cache_key, summary, timeout=getattr(settings, "USER_SUMMARY_CACHE_TIMEOUT", 60 * 60))
+
+    setattr(request, USER_SUMMARY_REQUEST_ATTR, summary)
+    return summary
+
+
+def invalidate_user_summary(user_id: int) -> None:
+    cache.delete(get_user_summary_cache_key(user_id))
@@ -1,4 +1,5 @@
 from django.shortcuts import redirect, render
+from django.db import transaction
 from django.urls import reverse
 from django.conf import settings
 from django.contrib import messages
@@ -9,10 +10,9 @@ from .models import Verification, User
 from .forms import RegisterForm, LoginForm, VerifyEmailForm, AddPinForm
 from .views_helper import (extract_code_from_verification_form, 
                            extract_pin_from_form,
-                           send_verification_email, 
-                           resend_verification_email,
                            redirect_to_pin_page_if_not_set_else_home
                            )
+from .outbox import queue_verification_email, queue_resend_verification_email
 
 from .utils.utils import create_verification_url
 
@@ -29,20 +29,21 @@ def register(request):
         
         if form.is_valid():
                        
-            verification = Verification()
-            
-            user              = form.save()
-            verification_link =  create_verification_url(request, user.username)
-            
-            email = send_verification_email(user=user, verification=verification, url=verification_link)
-           
-            if email.is_email_sent:
+            # the user, their verification code and the queued email are saved together or not at all,
+            # the email itself is sent later by the `send_queued_emails` worker
+            with transaction.atomic():
+                verification = Verification()
+
+                user              = form.save()
+                verification_link =  create_verification_url(request, user.username)
+
+                queue_verification_email(user=user, verification=verification, url=verification_link)
 
                 verification.user = user
                 verification.save()
-                
-                messages.add_message(request, messages.SUCCESS, "A request has been sent to your registered email")
-                return redirect(reverse("login"))   
+
+            messages.add_message(request, messages.SUCCESS, "A request has been sent to your registered email")
+            return redirect(reverse("login"))
     
     context["form"] = form
     return render(request, "authentication/register.html", context=context)
@@ -115,11 +116,12 @@ def verify_registration_code(request, username):
                 error_msg = "The code has expired. Another one has been sent to your email"
                 messages.add_message(request, messages.ERROR, error_msg)
 
-                verification.regenerate_code()
-                resend_verification_email(user=verification.user, 
-                                          verification=verification,
-                                          url=create_verification_url(request, verification.user.username)
-                                          )
+                with transaction.atomic():
+                    verification.regenerate_code()
+                    queue_resend_verification_email(user=verification.user,
+                                                    verification=verification,
+                                                    url=create_verification_url(request, verification.user.username)
+                                                    )
 
             else:
                 verification.set_email_to_verified()
@@ -1,3 +1,17 @@
 from django.contrib import admin
 
+from .models import IdempotencyKey
+
 # Register your models here.
+
+
+class IdempotencyKeyAdmin(admin.ModelAdmin):
+    list_display       = ["id", "key", "user", "status_code", "created_on", "expires_on"]
+    list_display_links = ["id", "key"]
+    list_per_page      = 25
+    search_fields      = ["key", "user__username", "user__email"]
+    readonly_fields    = ["key", "user", "request_hash", "status_code", "content_type", "created_on", "expires_on"]
+    exclude            = ["response_body"]
+
+
+admin.site.register(IdempotencyKey, IdempotencyKeyAdmin)
@@ -0,0 +1,188 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from datetime import timedelta
+from functools import wraps
+from typing import Optional
+
+from django.conf import settings
+from django.db import IntegrityError, router
+from django.http import HttpRequest, HttpResponse
+from django.utils import timezone
+
+from account.sharding import shard_for_user
+from account.views_helper import api_response
+from utils.sqlite import immediate_atomic_on
+from .models import IdempotencyKey
+
+
+IDEMPOTENCY_HEADER          = "Idempotency-Key"
+IDEMPOTENCY_REPLAYED_HEADER = "Idempotent-Replayed"
+MAXIMUM_KEY_LENGTH          = 255
+
+
+class LRUResponseCache:
+    """
+    A small, thread-safe, in-process LRU cache of stored responses.
+
+    It sits in front of the `IdempotencyKey` table so that the common case, a
+    mobile client retrying a request a few seconds later against the same
+    worker process, is answered without a database query. Entries expire after
+    `ttl` seconds and the least recently used entry is evicted once `max_size`
+    is reached.
+    """
+
+    def __init__(self, max_size: int = 1024, ttl: float = 86400):
+        self.max_size = max_size
+        self.ttl      = ttl
+        self._entries = OrderedDict()
+        self._lock    = threading.Lock()
+
+    def get(self, key) -> Optional[IdempotencyKey]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value: IdempotencyKey, ttl: float = None) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic() + (self.ttl if ttl is None else ttl), value)
+            self._entries.move_to_end(key)
+
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+def get_idempotency_key_ttl() -> int:
+    return getattr(settings, "IDEMPOTENCY_KEY_TTL_SECONDS", 24 * 60 * 60)
+
+
+response_cache = LRUResponseCache(max_size=getattr(settings, "IDEMPOTENCY_CACHE_MAX_SIZE", 1024),
+                                  ttl=get_idempotency_key_ttl(),
+                                  )
+
+
+def idempotent(view):
+    """
+    Make a POST view safe to retry by honouring the `Idempotency-Key` header.
+
+    The first request with a given key runs the view and stores its response
+    in the same transaction as the view's own writes. Any later request from
+    the same user with the same key gets the stored response back, marked with
+    an `Idempotent-Replayed: true` header, without the view running again.
+
+    Two requests racing with the same key are resolved by the unique
+    constraint on `(user, key)`: the loser's transaction, including whatever
+    its view wrote, is rolled back and it replays the winner's response.
+
+    The transaction is an `immediate_atomic` one on the database of the
+    keys and, when the account data is sharded, on the shard of the user
+    too, so the view's own `immediate_atomic` on that shard runs inside it.
+    The two still commit one after the other, the shard first: a failure
+    between the commits leaves the view's writes without a stored key, and
+    a retry runs the view again rather than replaying a response whose
+    writes were lost.
+
+    Requests without the header, non-POST requests and anonymous requests are
+    passed straight through. Responses with a 5xx status code are not stored
+    so that the client can retry them.
+
+    Example usage:
+
+        @csrf_protect
+        @login_required
+        @idempotent
+        def add_fund_to_wallet(request):
+            ...
+    """
+
+    @wraps(view)
+    def wrapper(request: HttpRequest, *args, **kwargs):
+        key = request.headers.get(IDEMPOTENCY_HEADER)
+
+        if not key or request.method != "POST" or not request.user.is_authenticated:
+            return view(request, *args, **kwargs)
+
+        if len(key) > MAXIMUM_KEY_LENGTH:
+            return api_response(error=f"The {IDEMPOTENCY_HEADER} header must be at most {MAXIMUM_KEY_LENGTH} characters",
+                                status_code=400)
+
+        request_hash = _hash_request(request)
+        cache_key    = (request.user.pk, key)
+        stored       = response_cache.get(cache_key) or _get_stored_response(request.user, key)
+
+        if stored is not None:
+            return _replay(stored, request_hash, cache_key)
+
+        try:
+            with immediate_atomic_on(router.db_for_write(IdempotencyKey), shard_for_user(request.user)):
+                response = view(request, *args, **kwargs)
+                if response.status_code >= 500 or getattr(response, "streaming", False):
+                    return response
+                stored = _store_response(request.user, key, request_hash, response)
+
+        except IntegrityError:
+            # another request with the same key committed first, its writes stand and ours were rolled back
+            stored = _get_stored_response(request.user, key)
+            if stored is None:
+                raise
+            return _replay(stored, request_hash, cache_key)
+
+        response_cache.set(cache_key, stored, ttl=_seconds_until(stored.expires_on))
+        return response
+
+    return wrapper
+
+
+def _hash_request(request: HttpRequest) -> str:
+    return hashlib.sha256(request.method.encode() + request.path.encode() + request.body).hexdigest()
+
+
+def _get_stored_response(user, key: str) -> Optional[IdempotencyKey]:
+    return IdempotencyKey.objects.filter(user=user, key=key, expires_on__gt=timezone.now()).first()
+
+
+def _store_response(user, key: str, request_hash: str, response: HttpResponse) -> IdempotencyKey:
+    # delete an expired copy of the key, if any, so the unique constraint only ever trips on a live one
+    IdempotencyKey.objects.filter(user=user, key=key, expires_on__lte=timezone.now()).delete()
+
+    return IdempotencyKey.objects.create(key=key,
+                                         user=user,
+                                         request_hash=request_hash,
+                                         status_code=response.status_code,
+                                         content_type=response.get("Content-Type", ""),
+                                         response_body=response.content,
+                                         expires_on=timezone.now() + timedelta(seconds=get_idempotency_key_ttl()),
+                                         )
+
+
+def _replay(stored: IdempotencyKey, request_hash: str, cache_key: tuple) -> HttpResponse:
+    if stored.request_hash != request_hash:
+        return api_response(error=f"The {IDEMPOTENCY_HEADER} has already been used for a different request",
+                            status_code=422)
+
+    response_cache.set(cache_key, stored, ttl=_seconds_until(stored.expires_on))
+
+    response = HttpResponse(bytes(stored.response_body), status=stored.status_code, content_type=stored.content_type)
+    response[IDEMPOTENCY_REPLAYED_HEADER] = "true"
+    return response
+
+
+def _seconds_until(moment) -> float:
+    return max((moment - timezone.now()).total_seconds(), 0)
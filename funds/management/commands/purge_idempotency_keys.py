@@ -0,0 +1,31 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from funds.models import IdempotencyKey
+
+
+class Command(BaseCommand):
+    help = "Delete expired idempotency keys in bounded batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000, help="Number of keys deleted per DELETE statement")
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        now        = timezone.now()
+        deleted    = 0
+        start      = time.perf_counter()
+
+        # Each batch is a short DELETE on the expires_on index, so the table is never locked for long
+        while True:
+            pks = list(IdempotencyKey.objects.filter(expires_on__lte=now)
+                                             .order_by("expires_on")
+                                             .values_list("pk", flat=True)[:batch_size])
+            if not pks:
+                break
+            deleted += IdempotencyKey.objects.filter(pk__in=pks).delete()[0]
+
+        elapsed = time.perf_counter() - start
+        self.stdout.write(self.style.SUCCESS(f"Deleted {deleted} expired idempotency keys in {elapsed:.2f}s"))
@@ -1,3 +1,34 @@
 from django.db import models
 
+from authentication.models import User
+
+
 # Create your models here.
+
+
+class IdempotencyKey(models.Model):
+    """
+    The stored response of a request sent with an `Idempotency-Key` header.
+
+    When a client retries a POST with the same key, the stored response is
+    replayed instead of running the view again, so a retried funding or
+    transfer request can never move money twice. Keys are scoped to the user
+    that sent them and are kept until `expires_on`, after which the
+    `purge_idempotency_keys` command deletes them.
+    """
+    key           = models.CharField(max_length=255)
+    user          = models.ForeignKey(User, on_delete=models.CASCADE, related_name="idempotency_keys")
+    request_hash  = models.CharField(max_length=64)
+    status_code   = models.PositiveSmallIntegerField()
+    content_type  = models.CharField(max_length=100)
+    response_body = models.BinaryField()
+    created_on    = models.DateTimeField(auto_now_add=True)
+    expires_on    = models.DateTimeField(db_index=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["user", "key"], name="unique_idempotency_key_per_user"),
+        ]
+
+    def __str__(self):
+        return self.key
@@ -1,3 +1,260 @@
-from django.test import TestCase
+import json
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
+
+from django.test import TestCase, TransactionTestCase, RequestFactory, override_settings
+from django.core.management import call_command
+from django.db import IntegrityError, connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.http import JsonResponse
+from django.utils import timezone
+
+from account.models import BankAccount, Wallet, LedgerEntry
+from account.sharding import prepare_shard, shard_for_user
+from authentication.models import User
+from .idempotency import idempotent, response_cache, LRUResponseCache
+from .models import IdempotencyKey
+
 
 # Create your tests here.
+
+
+class IdempotencyTest(TestCase):
+
+    def setUp(self):
+        response_cache.clear()
+
+        self.factory = RequestFactory()
+        self.user    = User.objects.create(
+                                first_name="Test name",
+                                surname="Test surname",
+                                username="Test username",
+                                email="test@example.com",
+                                pin="1234"
+                                )
+        self.calls   = 0
+
+        @idempotent
+        def view(request):
+            self.calls += 1
+            return JsonResponse({"call": self.calls}, status=201)
+
+        self.view = view
+
+    def post(self, key=None, body='{"amount": 10}', user=None):
+        headers = {"Idempotency-Key": key} if key else {}
+        request = self.factory.post("/fund/wallet/", data=body, content_type="application/json", headers=headers)
+        request.user = user or self.user
+        return self.view(request)
+
+    def test_requests_without_a_key_always_run(self):
+        self.post()
+        self.post()
+        self.assertEqual(self.calls, 2)
+        self.assertFalse(IdempotencyKey.objects.exists())
+
+    def test_retry_replays_the_stored_response(self):
+        first  = self.post(key="abc")
+        second = self.post(key="abc")
+
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(second.status_code, 201)
+        self.assertEqual(second.content, first.content)
+        self.assertEqual(second["Idempotent-Replayed"], "true")
+
+    def test_retry_is_replayed_from_the_database_when_not_cached(self):
+        self.post(key="abc")
+        response_cache.clear()
+
+        response = self.post(key="abc")
+
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(response["Idempotent-Replayed"], "true")
+
+    def test_cached_replay_does_not_query_the_database(self):
+        self.post(key="abc")
+
+        with self.assertNumQueries(0):
+            self.post(key="abc")
+
+    def test_key_reused_with_a_different_body_is_rejected(self):
+        self.post(key="abc")
+        response = self.post(key="abc", body='{"amount": 99}')
+
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(self.calls, 1)
+
+    def test_keys_are_scoped_per_user(self):
+        other_user = User.objects.create(first_name="Other", surname="User", username="other",
+                                         email="other@example.com", pin="4321")
+        self.post(key="abc")
+        self.post(key="abc", user=other_user)
+
+        self.assertEqual(self.calls, 2)
+
+    def test_expired_key_runs_the_view_again(self):
+        self.post(key="abc")
+        IdempotencyKey.objects.update(expires_on=timezone.now() - timedelta(seconds=1))
+        response_cache.clear()
+
+        response = self.post(key="abc")
+
+        self.assertEqual(self.calls, 2)
+        self.assertNotIn("Idempotent-Replayed", response)
+        self.assertEqual(IdempotencyKey.objects.count(), 1)
+
+    def test_purge_command_deletes_only_expired_keys(self):
+        for key in ("a", "b", "c"):
+            self.post(key=key)
+        IdempotencyKey.objects.filter(key__in=["a", "b"]).update(expires_on=timezone.now() - timedelta(seconds=1))
+
+        call_command("purge_idempotency_keys", batch_size=1, stdout=StringIO())
+
+        self.assertEqual(list(IdempotencyKey.objects.values_list("key", flat=True)), ["c"])
+
+
+@override_settings(ACCOUNT_SHARDS=["shard_0", "shard_1"])
+class ShardedIdempotencyTest(TransactionTestCase):
+
+    databases = {"default", "shard_0", "shard_1"}
+
+    def setUp(self):
+        response_cache.clear()
+        for alias in ("shard_0", "shard_1"):
+            prepare_shard(alias)
+
+        self.user         = User.objects.create(
+                                first_name="Test name",
+                                surname="Test surname",
+                                username="Test username",
+                                email="test@example.com",
+                                pin="1234"
+                                )
+        self.shard        = shard_for_user(self.user)
+        self.bank_account = BankAccount.objects.create(user=self.user, amount=100)
+        self.wallet       = Wallet.objects.create(user=self.user, bank_account=self.bank_account)
+        self.client.force_login(self.user)
+
+    def fund(self, key: str):
+        return self.client.post(reverse("add_funds_to_wallet"), data=json.dumps({"amount": 10}),
+                                content_type="application/json", headers={"Idempotency-Key": key})
+
+    def test_retried_request_is_not_funded_twice(self):
+        self.fund("retry-me")
+        response = self.fund("retry-me")
+
+        self.assertEqual(response["Idempotent-Replayed"], "true")
+        self.assertEqual(Wallet.objects.using(self.shard).get(user=self.user).amount, 10)
+
+    def test_the_funds_are_rolled_back_with_the_key(self):
+        with mock.patch("funds.idempotency._store_response", side_effect=IntegrityError):
+            with self.assertRaises(IntegrityError):
+                self.fund("lost-race")
+
+        self.assertEqual(Wallet.objects.using(self.shard).get(user=self.user).amount, 0)
+
+
+class LRUResponseCacheTest(TestCase):
+
+    def test_least_recently_used_entry_is_evicted(self):
+        cache = LRUResponseCache(max_size=2, ttl=60)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+        cache.set("c", 3)
+
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("a"), 1)
+        self.assertEqual(cache.get("c"), 3)
+
+    def test_entries_expire_after_their_ttl(self):
+        cache = LRUResponseCache(max_size=2, ttl=60)
+        cache.set("a", 1, ttl=0)
+
+        self.assertIsNone(cache.get("a"))
+        self.assertEqual(len(cache), 0)
+
+
+class FundViewTest(TestCase):
+
+    def setUp(self):
+        response_cache.clear()
+
+        self.user         = User.objects.create(
+                                first_name="Test name",
+                                surname="Test surname",
+                                username="Test username",
+                                email="test@example.com",
+                                pin="1234"
+                                )
+        self.bank_account = BankAccount.objects.create(user=self.user, amount=100)
+        self.wallet       = Wallet.objects.create(user=self.user, bank_account=self.bank_account)
+        self.client.force_login(self.user)
+
+    def fund(self, url_name, amount, **headers):
+        return self.client.post(reverse(url_name), data=json.dumps({"amount": amount}),
+                                content_type="application/json", headers=headers)
+
+    def test_fund_wallet(self):
+        response = self.fund("add_funds_to_wallet", "25.50")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["DATA"], {"amount": "25.50", "balance": "25.50"})
+
+        self.wallet.refresh_from_db()
+        self.assertEqual(self.wallet.amount, Decimal("25.50"))
+
+        credit = LedgerEntry.get_by_account(self.wallet).get()
+        self.assertEqual(credit.running_balance, Decimal("25.50"))
+        self.assertEqual(LedgerEntry.objects.get(transfer_id=credit.transfer_id, leg=LedgerEntry.Leg.DEBIT).account_type,
+                         LedgerEntry.AccountType.EXTERNAL)
+
+    def test_fund_bank_account(self):
+        response = self.fund("add_funds_to_bank_account", 10)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["DATA"]["balance"], "110.00")
+
+        self.bank_account.refresh_from_db()
+        self.assertEqual(self.bank_account.amount, 110)
+
+    def test_fund_query_budget(self):
+        """Session, user, one locked fetch of wallet + bank, one UPDATE and one ledger INSERT"""
+
+        with self.assertNumQueries(9):
+            self.fund("add_funds_to_bank_account", 10)
+
+        # session + user + fetch + UPDATE + INSERT, the rest are SAVEPOINT/RELEASE statements
+        with CaptureQueriesContext(connection) as queries:
+            self.fund("add_funds_to_wallet", 10)
+
+        statements = [query["sql"].split()[0] for query in queries.captured_queries if "SAVEPOINT" not in query["sql"]]
+        self.assertEqual(statements, ["SELECT", "SELECT", "SELECT", "UPDATE", "INSERT"])
+
+    def test_retried_request_is_not_funded_twice(self):
+        self.fund("add_funds_to_wallet", 10, **{"Idempotency-Key": "retry-me"})
+        response = self.fund("add_funds_to_wallet", 10, **{"Idempotency-Key": "retry-me"})
+
+        self.assertEqual(response.json()["DATA"]["balance"], "10.00")
+        self.wallet.refresh_from_db()
+        self.assertEqual(self.wallet.amount, 10)
+
+    def test_invalid_amounts_are_rejected(self):
+        for amount in (0, -5, "abc", "1.001", None, True, "NaN"):
+            response = self.fund("add_funds_to_wallet", amount)
+            self.assertEqual(response.status_code, 400, msg=f"Expected amount {amount!r} to be rejected")
+
+        self.wallet.refresh_from_db()
+        self.assertEqual(self.wallet.amount, 0)
+
+    def test_only_post_is_allowed(self):
+        self.assertEqual(self.client.get(reverse("add_funds_to_wallet")).status_code, 405)
+
+    def test_missing_bank_account_returns_404(self):
+        self.wallet.bank_account = None
+        self.wallet.save()
+
+        self.assertEqual(self.fund("add_funds_to_bank_account", 10).status_code, 404)
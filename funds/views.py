@@ -1,23 +1,40 @@
-from django.shortcuts import render
 from django.views.decorators.csrf import csrf_protect
 from django.contrib.auth.decorators import login_required
 
+from .idempotency import idempotent
+from .views_helper import handle_fund_json
+
 # Create your views here.
 
 
 @csrf_protect
 @login_required
+@idempotent
 def add_fund_to_wallet(request):
-    pass 
+    """
+    Handle a POST request from the frontend to add funds to the user's wallet.
+
+    This view is intended to be called via JavaScript (e.g. `fetch`) with a JSON
+    body such as `{"amount": "25.50"}`. Retries sent with the same
+    `Idempotency-Key` header replay the first response instead of funding twice.
+
+    Returns:
+        JsonResponse: A JSON response containing the new wallet balance or an error.
+    """
+    return handle_fund_json(request, lambda wallet: wallet, account_name="wallet")
 
 
 @csrf_protect
 @login_required
+@idempotent
 def add_fund_to_bank_account(request):
-    pass 
+    """
+    Handle a POST request from the frontend to add funds to the bank account
+    connected to the user's wallet.
 
+    Works the same way as `add_fund_to_wallet`.
 
-@csrf_protect
-@login_required
-def add_fund_to_wallet(request):
-    pass
\ No newline at end of file
+    Returns:
+        JsonResponse: A JSON response containing the new bank balance or an error.
+    """
+    return handle_fund_json(request, lambda wallet: wallet.bank_account, account_name="bank account")
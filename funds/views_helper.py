@@ -0,0 +1,106 @@
+import json
+from decimal import Decimal, InvalidOperation
+
+from django.http import HttpRequest
+
+from account.models import Wallet, TransferService
+from account.sharding import shard_for_user
+from utils.sqlite import immediate_atomic
+from account.views_helper import api_response
+
+
+MAXIMUM_FUND_AMOUNT = Decimal("99999999.99")  # the largest value the amount columns can hold
+
+
+def handle_fund_json(request: HttpRequest, get_account, account_name: str):
+    """
+    Handles a JSON-based POST request to fund one of the user's accounts.
+
+    The request body must be a JSON object with an `amount` key, e.g.
+    `{"amount": "25.50"}`. The amount is sent as a string or a number and must
+    be greater than zero with at most two decimal places.
+
+    The hot path costs one SELECT, one UPDATE and one INSERT:
+
+        1. The user's wallet and its connected bank account are fetched and
+           locked together with a single `select_for_update().select_related()`.
+        2. `get_account` picks the account to fund from the wallet, and
+           `TransferService.fund_account` raises its balance with a conditional
+           UPDATE. Because the row is already locked, the balance in memory is
+           exact afterwards and does not need to be re-read.
+        3. The deposit is written to the ledger with a single INSERT.
+
+    Parameters:
+        request (HttpRequest): The HTTP request object, expected to contain JSON data in the body.
+        get_account (callable): Receives the user's wallet and returns the account to fund,
+                                or None if it doesn't exist.
+        account_name (str): The name of the account used in the response messages.
+
+    Returns:
+        JsonResponse: A standardised JSON response. On success `DATA` holds the
+                      funded amount and the account's new balance.
+    """
+    if request.method != "POST":
+        return api_response(error="Only POST method is allowed", status_code=405)
+
+    try:
+        amount = extract_amount_from_json(request.body)
+    except ValueError as e:
+        return api_response(error=str(e), status_code=400)
+
+    with immediate_atomic(using=shard_for_user(request.user)):
+        wallet = (Wallet.objects.for_user(request.user)
+                                .select_for_update()
+                                .select_related("bank_account")
+                                .filter(user=request.user)
+                                .first())
+
+        account = get_account(wallet) if wallet else None
+        if account is None:
+            return api_response(error=f"No {account_name} was found for this user", status_code=404)
+
+        TransferService.fund_account(account, amount, refresh=False)
+
+    return api_response(status_code=200,
+                        message=f"Successfully funded the {account_name}",
+                        success=True,
+                        data={"amount": str(amount), "balance": str(account.amount)},
+                        )
+
+
+def extract_amount_from_json(body: bytes) -> Decimal:
+    """
+    Parse and validate the `amount` from a JSON request body.
+
+    Raises:
+        ValueError: If the body is not a JSON object or the amount is missing,
+                    not a number, not positive, has more than two decimal places
+                    or is too large to be stored.
+    """
+    try:
+        data = json.loads(body.decode("utf-8"))
+    except (json.JSONDecodeError, UnicodeDecodeError) as e:
+        raise ValueError(f"Invalid JSON data: {str(e)}")
+
+    if not isinstance(data, dict):
+        raise ValueError(f"The data is not an instance of dictionary. Expected the data object to be type dictionary but got type {type(data)}")
+
+    amount = data.get("amount")
+    if isinstance(amount, bool) or not isinstance(amount, (str, int, float)):
+        raise ValueError("The amount is required and must be a number")
+
+    try:
+        amount = Decimal(str(amount))
+    except InvalidOperation:
+        raise ValueError(f"The amount must be a number but got {amount}")
+
+    if not amount.is_finite() or amount <= 0:
+        raise ValueError("The amount must be greater than zero")
+
+    if amount.as_tuple().exponent < -2:
+        raise ValueError("The amount cannot have more than two decimal places")
+
+    if amount > MAXIMUM_FUND_AMOUNT:
+        raise ValueError(f"The amount cannot be greater than {MAXIMUM_FUND_AMOUNT}")
+
+    return amount
@@ -4,10 +4,12 @@ from django.contrib.auth.decorators import login_required
 
 from account.form import ProfileForm
 from account.models import BankAccount
+from utils.db_router import use_read_replica
 
 # Create your views here.
 
 
+@use_read_replica
 @login_required(login_url="/login/")
 def home(request):
 
@@ -66,10 +66,13 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'utils.query_budget.QueryBudgetMiddleware',
+    'utils.db_router.ReadReplicaMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'utils.profiler.ProfilerMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'simple_history.middleware.HistoryRequestMiddleware',
@@ -107,9 +110,61 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
-    }
+    },
+
+    # A copy of `default` for the read-only views, kept in sync with `python manage.py sync_replica`.
+    # Only used when DATABASE_REPLICA_NAME is set, see `utils.db_router`
+    'replica': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': getenv("DATABASE_REPLICA_NAME") or BASE_DIR / 'db.replica.sqlite3',
+    },
+
+    # Shards of the account data, only used when they are listed in ACCOUNT_SHARDS, see `account.sharding`.
+    # Add a shard at the end, then `python manage.py migrate --database <alias>` and `python manage.py rebalance_shards`
+    'shard_0': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / 'db.shard_0.sqlite3',
+    },
+    'shard_1': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / 'db.shard_1.sqlite3',
+    },
+}
+
+# Keep connections open across requests, so the SQLite pragmas below are applied once per connection rather than per request
+for database in DATABASES.values():
+    database['CONN_MAX_AGE']       = int(getenv("DATABASE_CONN_MAX_AGE", 600))
+    database['CONN_HEALTH_CHECKS'] = True
+
+DATABASE_ROUTERS = ['account.sharding.AccountShardRouter', 'utils.db_router.ReadReplicaRouter']
+
+ACCOUNT_SHARDS = [alias for alias in getenv("ACCOUNT_SHARDS", "").split(",") if alias]   # e.g. ACCOUNT_SHARDS=shard_0,shard_1
+
+READ_REPLICA_ALIAS          = 'replica' if getenv("DATABASE_REPLICA_NAME") else None
+READ_REPLICA_STICKY_SECONDS = 5   # reads of a browser stay on `default` this long after it wrote, keep it above the replica lag
+
+
+# Caches
+# https://docs.djangoproject.com/en/5.2/ref/settings/#caches
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+
+    # The account lookups, see `account.lookup_cache`. Set ACCOUNT_LOOKUP_CACHE_BACKEND to a cache shared by
+    # the server processes when there is more than one, e.g. django.core.cache.backends.filebased.FileBasedCache
+    'lookups': {
+        'BACKEND': getenv("ACCOUNT_LOOKUP_CACHE_BACKEND", 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': getenv("ACCOUNT_LOOKUP_CACHE_LOCATION", 'account-lookups'),
+        'OPTIONS': {
+            'MAX_ENTRIES': 10000,
+        },
+    },
 }
 
+ACCOUNT_LOOKUP_CACHE_TIMEOUT = 5 * 60   # seconds a lookup is cached, 0 turns the cache off
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -164,6 +219,9 @@ LOGGING = {
             '()': 'utils.utils.RightIndentedFormatter', 
             'format': '[%(asctime)s] %(levelname)-8s %(name)-13s: [%(message)s]',
         },
+        'jsonl': {
+            'format': '%(message)s',
+        },
     },
     "handlers": {
         "console": {
@@ -172,9 +230,15 @@ LOGGING = {
         },
         "file": {
             "class": "logging.FileHandler",
-            "filename": "emails.log",    
+            "filename": BASE_DIR / "emails.log",
             "formatter": "right_indented",  
         },
+        "query_budget_file": {
+            "class": "logging.FileHandler",
+            "filename": BASE_DIR / "query_budget.jsonl",
+            "formatter": "jsonl",
+            "delay": True,
+        },
     },
     "loggers": {
         "email_sender": {  
@@ -182,6 +246,11 @@ LOGGING = {
             "level": "DEBUG",  
             "propagate": False,  
         },
+        "query_budget": {
+            "handlers": ["query_budget_file"],
+            "level": "INFO",
+            "propagate": False,
+        },
     },
 }
 
@@ -196,6 +265,19 @@ EMAIL_HOST_USER      = getenv("EMAIL_HOST_USER")
 EMAIL_HOST_PASSWORD  = getenv("EMAIL_HOST_PASSWORD") 
 DEFAULT_FROM_EMAIL   = EMAIL_HOST_USER  
 
+# Outbox drained by `python manage.py send_queued_emails`
+
+EMAIL_OUTBOX_MAX_ATTEMPTS          = 5        # attempts before an email is marked as failed
+EMAIL_OUTBOX_RETRY_BACKOFF_SECONDS = 30       # doubled after every failed attempt
+EMAIL_OUTBOX_CLAIM_TIMEOUT_SECONDS = 5 * 60   # after this an unfinished batch of a dead worker is picked up again
+
+
+# Expired verification clean up, see `python manage.py purge_verifications`
+
+VERIFICATION_PURGE_GRACE_DAYS       = 7      # expired codes are kept this long so a new one can still be sent
+VERIFICATION_SWEEP_INTERVAL_SECONDS = None   # set to purge from a background thread instead of cron
+UNVERIFIED_USER_RETENTION_DAYS      = None   # set to also delete users that never verified their email
+
 
 
 
@@ -209,3 +291,71 @@ STATICFILES_DIRS = [
 ]
 
 STATIC_ROOT = join(BASE_DIR, 'staticfiles') 
+
+
+# Idempotency keys for the funds and transfer endpoints
+
+IDEMPOTENCY_KEY_TTL_SECONDS = 24 * 60 * 60   # how long a stored response can be replayed
+IDEMPOTENCY_CACHE_MAX_SIZE  = 1024           # responses kept in the in-process LRU cache
+
+
+# How long the per-user summary used by the `show_user_information` context processor is cached
+
+USER_SUMMARY_CACHE_TIMEOUT = 60 * 60
+
+
+# Numbers reserved per query by the account number and sort code allocators
+
+ACCOUNT_NUMBER_BLOCK_SIZE = 1000
+
+
+# History policy of the models using `utils.history.PolicyHistoricalRecords`
+
+HISTORY_SKIP_UNCHANGED = True   # don't record a save that didn't change a tracked field
+HISTORY_BATCH_WRITES   = True   # write the history rows of a batch_history() block in bulk at its end
+HISTORY_BATCH_SIZE     = 1000   # rows waiting in a batch_history() block before they are written straight away
+
+
+# History archival, see `python manage.py archive_history`
+
+HISTORY_ARCHIVE_DIR        = BASE_DIR / "history_archive"   # gzipped JSON Lines files, one per model and day
+HISTORY_ARCHIVE_AFTER_DAYS = 365                            # history rows older than this are archived
+
+
+# SQLite tuning, applied to every new connection by `utils.sqlite.apply_sqlite_pragmas`
+
+SQLITE_PRAGMAS = {
+    "journal_mode": "WAL",        # readers and the writer don't block each other
+    "synchronous":  "NORMAL",     # with WAL, a power cut can lose the last commits but never corrupts the file
+    "busy_timeout": 5000,         # milliseconds a writer waits for the write lock before "database is locked"
+    "mmap_size":    268435456,    # read the first 256MiB of the file through memory mapping
+    "cache_size":   -32000,       # a page cache of about 32MiB per connection
+    "temp_store":   "MEMORY",     # temporary tables and indices, e.g. for sorting, stay in memory
+}
+SQLITE_IMMEDIATE_TRANSACTIONS = True   # transactions writing balances start with BEGIN IMMEDIATE, see `utils.sqlite.ImmediateAtomic`
+
+
+# Query and latency budgets per URL name, see `utils.query_budget`. A request going over its budget is logged to query_budget.jsonl
+
+QUERY_BUDGET_ENABLED = True
+QUERY_BUDGET_LOG_ALL = False   # log every request, not only the ones over budget
+QUERY_BUDGETS        = {
+    "default": {
+        "queries":           30,     # queries per request, on every database
+        "duplicate_queries": 5,      # queries whose fingerprint already ran in the request, i.e. N + 1 queries
+        "sql_ms":            200,    # milliseconds spent in SQL
+        "latency_ms":        1000,   # milliseconds from the middleware to the response
+    },
+    "home":                                 {"queries": 12},
+    # the admin counts the rows twice, with and without its filters, and reads the permissions twice
+    "admin:account_wallet_changelist":      {"duplicate_queries": 2},
+    "admin:account_bankaccount_changelist": {"duplicate_queries": 2},
+}
+
+
+# On-demand profiling of the requests of staff users, see `utils.profiler` and `python manage.py summarise_profiles`
+
+REQUEST_PROFILER_ENABLED     = True
+REQUEST_PROFILER_SAMPLE_RATE = 1.0                     # share of the requests asking for a profile that get one
+REQUEST_PROFILER_INTERVAL    = 0.001                   # seconds between two samples of the stack sampling profiler
+REQUEST_PROFILER_DIR         = BASE_DIR / "profiles"   # a pstats or collapsed stack file and a JSON file per profile
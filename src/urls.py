@@ -25,6 +25,7 @@ urlpatterns = [
     path('', include("authentication.urls")),
     path('', include("home.urls")),
     path('profile/', include('account.urls')),
+    path('fund/', include('funds.urls')),
 ]
 
 if settings.DEBUG:
@@ -13,7 +13,6 @@ export const config  = {
     NOTIFICATION_KEY: "notifications",
     isFundsUpdated: false,  
     loadFromCache: true,
-    APP_VERSION: "3.0.4",
  
 }
 
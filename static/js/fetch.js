@@ -1,5 +1,5 @@
 
-export default async function fetchData({ url, csrfToken = null, body = null, method = "POST" }) {
+export default async function fetchData({ url, csrfToken = null, body = null, method = "POST", cache = "default" }) {
 
     try {
 
@@ -27,6 +27,7 @@ export default async function fetchData({ url, csrfToken = null, body = null, me
         const options = {
             method,
             headers,
+            cache,
         };
 
     
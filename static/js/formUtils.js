@@ -140,39 +140,41 @@ export const profileCache = {
     },
 
     /**
-     * Retrieves the cached profile data. 
-     * If not in memory, attempts to fetch from localStorage.
+     * Retrieves the profile data.
+     *
+     * Within a page the in-memory copy is used. Otherwise the profile is
+     * requested from the backend with `cache: "no-cache"`, which makes the
+     * browser revalidate its HTTP-cached copy with the ETag. An unchanged
+     * profile comes back as a body-less 304 and the browser reuses the copy
+     * it already holds, so no manual invalidation is needed. If the request
+     * fails, the copy last written to localStorage is used instead.
      */
     getProfileData:  async () => {
         if (!profileCache._KEY) {
             throw new Error("The storage key is not set. Set the key before proceeding.");
         }
 
-        if (profileCache._CACHE_OBJECT === null || profileCache._CACHE_OBJECT === undefined) {
-            console.log("Fetching from localStorage...");
-            const userProfile = getSessionStorage(profileCache._KEY);
-            if (Array.isArray(userProfile) && userProfile.length === 0) {
-
-                const profileData = await profileCache._fetchProfile();
-                console.log(profileData)
-                if (profileData) {
-                    
-                    setSessionStorage(profileCache._KEY, profileData.DATA);
-                    profileCache._CACHE_OBJECT = profileData.DATA;
-                    return profileCache._CACHE_OBJECT;
-                }
-                return null;
-            }
-            profileCache._CACHE_OBJECT = userProfile;
-            return profileCache._CACHE_OBJECT
-
-        } else {
-            console.log("Fetching from in-memory cache...");
-            console.log(profileCache._CACHE_OBJECT)
+        if (profileCache._CACHE_OBJECT !== null && profileCache._CACHE_OBJECT !== undefined) {
             return profileCache._CACHE_OBJECT;
         }
 
-      
+        try {
+            const profileData = await profileCache._fetchProfile();
+            if (profileData) {
+                setSessionStorage(profileCache._KEY, profileData.DATA);
+                profileCache._CACHE_OBJECT = profileData.DATA;
+                return profileCache._CACHE_OBJECT;
+            }
+        } catch (error) {
+            console.warn("Falling back to the stored profile:", error);
+        }
+
+        const userProfile = getSessionStorage(profileCache._KEY);
+        if (Array.isArray(userProfile) && userProfile.length === 0) {
+            return null;
+        }
+        profileCache._CACHE_OBJECT = userProfile;
+        return profileCache._CACHE_OBJECT;
     },
 
      /**
@@ -184,6 +186,7 @@ export const profileCache = {
             const profileData = await fetchData({
                 url: "/profile/get/",
                 method: "GET",
+                cache: "no-cache",
             });
             return profileData;
         } catch (error) {
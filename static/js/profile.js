@@ -7,7 +7,6 @@ import { config } from "./config.js";
 import fetchData from './fetch.js'
 import { AlertUtils } from "./alerts.js";
 import { compareTwoObjects } from "./utils.js";
-import { handleAppVersionUpdate } from "./utils.js";
 
 const accountNameElement = document.getElementById("account-name");
 const accountSurnameElement = document.getElementById("account-surname");
@@ -62,7 +61,6 @@ document.addEventListener("DOMContentLoaded", () => {
 });
 
 document.addEventListener("DOMContentLoaded", () => {
-    handleAppVersionUpdate();
     profileForm = document.getElementById("profile-form");
     if (profileForm) {
         console.log("EventListener listening on profile form...");
@@ -0,0 +1,190 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+# reads of these apps always go to the primary, e.g. a session created by a login is needed straight away
+PRIMARY_ONLY_APPS = {"sessions"}
+
+READ_METHODS = ("GET", "HEAD")
+
+
+class RoutingState:
+    """Where the reads of the current request go"""
+
+    def __init__(self, use_replica: bool = False, sticky: bool = False):
+        self.use_replica = use_replica
+        self.sticky      = sticky   # the request has written, or the same browser wrote shortly before
+        self.wrote       = False
+
+
+_routing_state = ContextVar("database_routing_state", default=None)
+
+
+def get_replica_alias() -> Optional[str]:
+    """Returns the alias reads are sent to, or None if no replica is configured"""
+    alias = getattr(settings, "READ_REPLICA_ALIAS", None)
+    return alias if alias and alias in connections.settings else None
+
+
+def use_read_replica(view):
+    """
+    Mark a read-only view so its GET and HEAD requests read from the replica.
+
+    Example usage:
+
+        @use_read_replica
+        @login_required
+        def get_profile_details(request):
+            ...
+    """
+    view.use_read_replica = True
+    return view
+
+
+@contextmanager
+def read_from_replica():
+    """
+    Send the reads made inside the block to the replica.
+
+    Unless the current request has already written, in which case they keep
+    going to the primary so it reads its own writes.
+    """
+    state = _routing_state.get()
+
+    if state is None:
+        token = _routing_state.set(RoutingState(use_replica=True))
+        try:
+            yield
+        finally:
+            _routing_state.reset(token)
+        return
+
+    previous          = state.use_replica
+    state.use_replica = True
+    try:
+        yield
+    finally:
+        state.use_replica = previous
+
+
+@contextmanager
+def read_from_primary():
+    """
+    Send the reads made inside the block to the primary, even in a read-only view.
+
+    For a read whose result outlives the request, e.g. one that is cached,
+    which would otherwise keep the replica's lag for as long as it's cached.
+    """
+    state = _routing_state.get()
+    if state is None:
+        yield
+        return
+
+    previous          = state.use_replica
+    state.use_replica = False
+    try:
+        yield
+    finally:
+        state.use_replica = previous
+
+
+class ReadReplicaRouter:
+    """
+    Sends the reads of read-only views to the `READ_REPLICA_ALIAS` database and everything else to `default`.
+
+    Reads only go to the replica inside a view marked with `use_read_replica`,
+    an admin changelist, or a `read_from_replica()` block. As soon as the
+    request writes, the rest of its reads go to the primary, and
+    `ReadReplicaMiddleware` keeps the following requests of the same browser
+    on the primary for `READ_REPLICA_STICKY_SECONDS` while the replica
+    catches up.
+
+    Writes always go to `default`, even for an instance read from the
+    replica.
+    """
+
+    def db_for_read(self, model, **hints):
+        state = _routing_state.get()
+        alias = get_replica_alias()
+
+        if alias is None or state is None or not state.use_replica or state.sticky:
+            return DEFAULT_DB_ALIAS
+        if model._meta.app_label in PRIMARY_ONLY_APPS:
+            return DEFAULT_DB_ALIAS
+        return alias
+
+    def db_for_write(self, model, **hints):
+        state = _routing_state.get()
+        if state is not None and model._meta.app_label not in PRIMARY_ONLY_APPS:
+            state.sticky = state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {DEFAULT_DB_ALIAS, get_replica_alias()}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+
+class ReadReplicaMiddleware:
+    """
+    Tracks the database routing of each request for `ReadReplicaRouter`.
+
+    Place it before any middleware that reads from the database, so the
+    whole request is covered.
+    """
+
+    cookie_name = "use_primary"
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        state = RoutingState(sticky=self.cookie_name in request.COOKIES)
+        token = _routing_state.set(state)
+
+        try:
+            response = self.get_response(request)
+        finally:
+            _routing_state.reset(token)
+
+        if state.wrote and get_replica_alias() is not None:
+            response.set_cookie(self.cookie_name, "1",
+                                max_age=getattr(settings, "READ_REPLICA_STICKY_SECONDS", 5),
+                                httponly=True,
+                                samesite="Lax",
+                                )
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        state = _routing_state.get()
+        if state is not None and request.method in READ_METHODS:
+            state.use_replica = getattr(view_func, "use_read_replica", False) or self._is_admin_changelist(request)
+
+    def _is_admin_changelist(self, request) -> bool:
+        match = request.resolver_match
+        return match is not None and match.namespace == "admin" and (match.url_name or "").endswith("_changelist")
+
+
+def sync_replica(source: str = DEFAULT_DB_ALIAS, target: str = None) -> None:
+    """
+    Copy the whole SQLite database `source` into `target` with SQLite's online backup.
+
+    Stands in for replication in development and tests, where both aliases
+    are local SQLite files. A real deployment replicates in the database
+    server instead.
+    """
+    target = target or get_replica_alias()
+    if target is None:
+        raise ValueError("No read replica is configured, set READ_REPLICA_ALIAS")
+
+    for alias in (source, target):
+        if connections[alias].vendor != "sqlite":
+            raise ValueError(f"Only SQLite databases can be synced this way, '{alias}' is {connections[alias].vendor}")
+        connections[alias].ensure_connection()
+
+    connections[source].connection.backup(connections[target].connection)
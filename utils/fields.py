@@ -0,0 +1,78 @@
+from uuid import UUID
+
+from django.core.exceptions import ValidationError
+from django.db import models
+
+from .generator import generate_time_ordered_id
+
+
+class TimeOrderedIdField(models.Field):
+    """
+    A 16-byte, time-ordered (UUIDv7) identifier.
+
+    The value is a `uuid.UUID` in Python and its canonical text form
+    (`str(value)`, 36 characters) is what the API exposes. In the database it
+    is stored as 16 raw bytes, or as the native `uuid` type on PostgreSQL, so a
+    unique index on it is a quarter of the size of one on a 64-character
+    `token_hex()` string. Because the leading bits are a timestamp, new rows are
+    appended to the end of the index rather than splitting pages all over it.
+
+    A new identifier is generated for every row unless one is given.
+
+    Example usage:
+
+        class Wallet(models.Model):
+            uid = TimeOrderedIdField(unique=True)
+    """
+
+    description = "A 16-byte, time-ordered (UUIDv7) identifier"
+
+    def __init__(self, *args, **kwargs):
+        kwargs.setdefault("default", generate_time_ordered_id)
+        kwargs.setdefault("editable", False)
+        super().__init__(*args, **kwargs)
+
+    def deconstruct(self):
+        name, path, args, kwargs = super().deconstruct()
+        if kwargs.get("default") is generate_time_ordered_id:
+            del kwargs["default"]
+        if kwargs.get("editable") is False:
+            del kwargs["editable"]
+        return name, path, args, kwargs
+
+    def db_type(self, connection):
+        return {
+            "postgresql": "uuid",
+            "mysql":      "binary(16)",
+            "oracle":     "RAW(16)",
+        }.get(connection.vendor, "blob")
+
+    def from_db_value(self, value, expression, connection):
+        if value is None or isinstance(value, UUID):
+            return value
+        return UUID(bytes=bytes(value))
+
+    def to_python(self, value):
+        if value is None or isinstance(value, UUID):
+            return value
+
+        try:
+            if isinstance(value, (bytes, bytearray, memoryview)):
+                return UUID(bytes=bytes(value))
+            return UUID(str(value))
+        except ValueError:
+            raise ValidationError(f"'{value}' is not a valid identifier", code="invalid")
+
+    def get_prep_value(self, value):
+        return self.to_python(super().get_prep_value(value))
+
+    def get_db_prep_value(self, value, connection, prepared=False):
+        if not prepared:
+            value = self.get_prep_value(value)
+        if value is None or connection.vendor == "postgresql":
+            return value
+        return value.bytes
+
+    def value_to_string(self, obj):
+        value = self.value_from_object(obj)
+        return "" if value is None else str(value)
@@ -1,4 +1,8 @@
+from datetime import datetime
+from os import urandom
 from random import randint
+from time import time
+from uuid import UUID
 
 
 def generate_code(maximum_length: int = 9) -> str:
@@ -22,9 +26,68 @@ def generate_code(maximum_length: int = 9) -> str:
     return code
 
 
+def luhn_check_digit(number: str) -> str:
+    """
+    Returns the Luhn (mod 10) check digit for a string of digits.
+
+    Appending the digit to the number lets a mistyped digit, or two swapped
+    neighbouring digits, be detected before the number is looked up.
+
+    Example usage:
+
+    >>> luhn_check_digit("7992739871")
+    '3'
+
+    """
+    total = 0
+    for position, digit in enumerate(reversed(number)):
+        value = int(digit)
+        if position % 2 == 0:
+            value *= 2
+            if value > 9:
+                value -= 9
+        total += value
+    return str((10 - total % 10) % 10)
+
+
+def is_luhn_valid(number: str) -> bool:
+    """Returns True if the last digit of `number` is its Luhn check digit."""
+    return len(number) > 1 and number.isdigit() and luhn_check_digit(number[:-1]) == number[-1]
+
+
 def _get_random_number(start_number: int = 0, end_number: int = 9):
     """
     Takes a starting and ending number and generates an integer between
     and including the start and end number.
     """
-    return randint(start_number, end_number)
\ No newline at end of file
+    return randint(start_number, end_number)
+
+def generate_time_ordered_id(timestamp: datetime = None) -> UUID:
+    """
+    Generates a UUIDv7, a 128-bit identifier whose leading 48 bits are the
+    Unix time in milliseconds, followed by 74 random bits.
+
+    Identifiers generated later sort after ones generated earlier, so new rows
+    are appended to the right-hand side of a B-tree index instead of being
+    scattered across it like `token_hex()` values are.
+
+    Args:
+        timestamp (datetime): The time to embed in the identifier. Defaults to now.
+                              Used to backfill identifiers for existing rows in
+                              the order they were created.
+
+    Example usage:
+
+    >>> generate_time_ordered_id()
+    UUID('0192f4a1-6c3b-7d2e-9a41-5f0e3c8b7a12')
+
+    """
+    milliseconds = int((timestamp.timestamp() if timestamp else time()) * 1000) & 0xFFFF_FFFF_FFFF
+    random_bits  = int.from_bytes(urandom(10), "big")
+
+    value  = milliseconds << 80
+    value |= 0x7 << 76                                   # version
+    value |= ((random_bits >> 64) & 0xFFF) << 64         # 12 random bits
+    value |= 0b10 << 62                                  # RFC 4122 variant
+    value |= random_bits & 0x3FFF_FFFF_FFFF_FFFF         # 62 random bits
+    return UUID(int=value)
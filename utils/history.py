@@ -0,0 +1,214 @@
+from contextlib import ExitStack, contextmanager
+from functools import wraps
+from typing import Optional
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections, models, router, transaction
+from django.utils import timezone
+from simple_history.models import HistoricalRecords
+
+from account.sharding import shard_for_user
+
+
+class PolicyHistoricalRecords(HistoricalRecords):
+    """
+    `HistoricalRecords` that writes fewer, and cheaper, history rows.
+
+    Three policies are applied on top of django-simple-history:
+
+    - Unchanged saves are not recorded. An update is only recorded when one of
+      the tracked fields differs from the value the row was loaded with, as
+      remembered by `SaveChangedFieldsMixin`. `auto_now` timestamps are never
+      compared. Models without the mixin are always recorded.
+    - Only `track_changes_to` is compared, if it is given. E.g. a wallet can
+      record a row when its amount changes but not when its card counter
+      does. The history row is still a full snapshot of the object.
+    - Inside a `batch_history()` block, the history rows are held back and
+      written with a single `bulk_create` per history table at the end of
+      the block, still inside its transaction, so they commit or roll back
+      with the rest of it. Once `HISTORY_BATCH_SIZE` rows are waiting, they
+      are written straight away.
+
+    With `index_by_object=True` the history table gets an index on
+    `(<primary key>, history_date)`, which answers "the latest row of this
+    object at time T" without scanning the object's whole history.
+
+    The policies can be switched off with the `HISTORY_SKIP_UNCHANGED` and
+    `HISTORY_BATCH_WRITES` settings. Batched rows don't send simple-history's
+    `pre_create_historical_record`/`post_create_historical_record` signals.
+
+    Example usage:
+
+        class Wallet(SaveChangedFieldsMixin, models.Model):
+            ...
+            history = PolicyHistoricalRecords(track_changes_to=["amount", "maximum_cards"])
+
+        with batch_history():
+            for wallet in wallets:
+                wallet.save()
+    """
+
+    def __init__(self, *args, track_changes_to: list[str] = None, index_by_object: bool = False, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.track_changes_to = track_changes_to
+        self.index_by_object  = index_by_object
+
+    def get_meta_options(self, model):
+        meta_fields = super().get_meta_options(model)
+        if self.index_by_object:
+            meta_fields["indexes"] = (*meta_fields.get("indexes", ()),
+                                      models.Index(fields=[model._meta.pk.attname, "history_date"]),
+                                      )
+        return meta_fields
+
+    def post_save(self, instance, created, using=None, **kwargs):
+        if not created and getattr(settings, "HISTORY_SKIP_UNCHANGED", True) and not self.has_tracked_changes(instance):
+            return
+        super().post_save(instance, created, using=using, **kwargs)
+
+    def has_tracked_changes(self, instance) -> bool:
+        saved = instance.__dict__.get("_saved_field_values")
+        if saved is None:
+            return True
+
+        for field in self._get_compared_fields(instance):
+            if field.attname not in instance.__dict__:
+                continue
+            if field.attname not in saved or saved[field.attname] != instance.__dict__[field.attname]:
+                return True
+        return False
+
+    def create_historical_record(self, instance, history_type, using=None):
+        db     = using or router.db_for_write(type(instance), instance=instance)
+        buffer = HistoryBuffer.get_active(connections[db])
+
+        if buffer is None or not getattr(settings, "HISTORY_BATCH_WRITES", True) or self.m2m_fields:
+            return super().create_historical_record(instance, history_type, using=using)
+
+        manager = getattr(instance, self.manager_name)
+        attrs   = {field.attname: getattr(instance, field.attname) for field in self.fields_included(instance)}
+
+        if getattr(manager.model, "history_relation", None) is not None:
+            attrs["history_relation"] = instance
+
+        history_instance = manager.model(history_date=getattr(instance, "_history_date", timezone.now()),
+                                         history_type=history_type,
+                                         history_user=self.get_history_user(instance),
+                                         history_change_reason=self.get_change_reason_for_object(instance, history_type, using),
+                                         **attrs,
+                                         )
+        buffer.add(history_instance)
+
+    def _get_compared_fields(self, instance) -> list:
+        fields = self.fields_included(instance)
+        if self.track_changes_to is not None:
+            return [field for field in fields if field.name in self.track_changes_to]
+        return [field for field in fields if not getattr(field, "auto_now", False)]
+
+
+class HistoryBuffer:
+    """
+    The history rows of a `batch_history` block, written in bulk at its end.
+
+    Rows are only buffered while the block is the innermost atomic block of
+    its connection. A save inside a nested `transaction.atomic()` writes
+    its history row straight away, inside the savepoint, so the row is
+    rolled back with the savepoint.
+    """
+
+    def __init__(self, connection):
+        self.connection = connection
+        self.depth      = len(connection.atomic_blocks)
+        self.rows       = []
+
+    @classmethod
+    def get_active(cls, connection) -> Optional["HistoryBuffer"]:
+        """Returns the buffer of the innermost atomic block of `connection`, if it is a `batch_history` block"""
+        buffer = connection.__dict__.get("_history_buffer")
+        if buffer is None or buffer.depth != len(connection.atomic_blocks):
+            return None
+        return buffer
+
+    def add(self, history_instance) -> None:
+        self.rows.append(history_instance)
+        if len(self.rows) >= getattr(settings, "HISTORY_BATCH_SIZE", 1000):
+            self.flush()
+
+    def flush(self) -> None:
+        rows      = self.rows
+        self.rows = []
+
+        by_model = {}
+        for history_instance in rows:
+            by_model.setdefault(type(history_instance), []).append(history_instance)
+
+        for model, instances in by_model.items():
+            model.objects.using(self.connection.alias).bulk_create(instances)
+
+
+@contextmanager
+def batch_history(using: str = None, savepoint: bool = True):
+    """
+    An atomic block whose history rows are written with one INSERT per history table at its end.
+
+    The rows are written just before the block exits, inside its
+    transaction, and are discarded if the block raises. A `batch_history()`
+    block directly inside another hands its rows to the outer one when it
+    exits without an error, so they are still written in the same INSERTs.
+
+    Example usage:
+
+        with batch_history():
+            for wallet in wallets:
+                wallet.amount = 0
+                wallet.save()
+
+    Args:
+        using (str): The database, defaults to `default`.
+        savepoint (bool): Passed on to `transaction.atomic`.
+    """
+    connection = transaction.get_connection(using)
+
+    with transaction.atomic(using=using, savepoint=savepoint):
+        parent = connection.__dict__.get("_history_buffer")
+        buffer = HistoryBuffer(connection)
+        connection._history_buffer = buffer
+        try:
+            yield buffer
+        finally:
+            connection._history_buffer = parent
+
+        if connection.needs_rollback:
+            # e.g. a caught IntegrityError, the block rolls back on exit and its rows with it
+            return
+        if parent is not None and parent.depth == buffer.depth - 1:
+            parent.rows.extend(buffer.rows)
+        else:
+            buffer.flush()
+
+
+def batch_view_history(view):
+    """
+    Run a view that writes in `batch_history()` blocks, so the history rows of its
+    request are written in bulk just before its transaction commits.
+
+    One block on `default`, and one on the shard of the user while the account
+    data is sharded, as their history rows are written there. The whole view
+    is one transaction per database, like with `ATOMIC_REQUESTS`.
+
+    Example usage:
+
+        @csrf_protect
+        @login_required
+        @batch_view_history
+        def update_profile_details(request):
+            ...
+    """
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        with ExitStack() as stack:
+            for alias in dict.fromkeys([DEFAULT_DB_ALIAS, shard_for_user(request.user)]):
+                stack.enter_context(batch_history(using=alias))
+            return view(request, *args, **kwargs)
+
+    return wrapper
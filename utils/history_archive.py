@@ -0,0 +1,230 @@
+import gzip
+import json
+import os
+from datetime import date, datetime, time, timezone as dt_timezone
+from pathlib import Path
+from typing import Iterator, NamedTuple, Optional
+
+from django.apps import apps
+from django.conf import settings
+from django.core import serializers
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models import Exists, OuterRef, Q
+from simple_history.models import HistoricalChanges
+
+from account.sharding import get_shards, is_sharded
+
+
+class ArchiveResult(NamedTuple):
+    model:    str
+    archived: int
+    files:    int
+
+
+def get_archive_dir() -> Path:
+    return Path(getattr(settings, "HISTORY_ARCHIVE_DIR", Path(settings.BASE_DIR) / "history_archive"))
+
+
+def get_historical_models() -> list:
+    """Returns every history model created by django-simple-history"""
+    return [model for model in apps.get_models() if issubclass(model, HistoricalChanges)]
+
+
+def archive_history(model,
+                    before: datetime,
+                    archive_dir: Path = None,
+                    batch_size: int = 5000,
+                    chunk_size: int = 1000,
+                    on_batch=None) -> ArchiveResult:
+    """
+    Move the history rows of `model` older than `before` into gzipped JSON Lines files.
+
+    Rows are written to one file per day of `history_date` (UTC), under
+    `<archive_dir>/<app label>/<model name>/<YYYY-MM-DD>.jsonl.gz`, and are
+    only deleted once the file they were written to has been synced to disk.
+    A day that is archived again, e.g. by a later run with a later cutoff,
+    is appended to.
+
+    The most recent row of every object older than `before` is kept, so
+    `as_of()` and the history admin still know the state of an object that
+    hasn't changed since. It is archived by a later run once a newer row
+    replaces it.
+
+    Rows are read `batch_size` at a time, streamed with `.iterator()`, and
+    every batch is deleted in its own transaction, so neither memory use nor
+    lock time depend on the size of the table. While the account data is
+    sharded, the history of a sharded model is archived from `default` and
+    from every shard in turn.
+
+    Args:
+        model (Model): The history model, or a model with a `history` manager.
+        before (datetime): Rows with an earlier `history_date` are archived.
+        archive_dir (Path): Defaults to the `HISTORY_ARCHIVE_DIR` setting.
+        batch_size (int): The number of rows written and deleted per transaction.
+        chunk_size (int): The number of rows fetched from the database at a time.
+        on_batch (callable): Called with the running `ArchiveResult` after every batch.
+
+    Returns:
+        ArchiveResult: How many rows were archived and into how many files.
+    """
+    if batch_size <= 0 or chunk_size <= 0:
+        raise ValueError(f"The batch and chunk sizes must be positive numbers, got {batch_size} and {chunk_size}")
+
+    model       = _get_history_model(model)
+    archive_dir = get_archive_dir() if archive_dir is None else Path(archive_dir)
+    label       = model._meta.label_lower
+    # the history of a sharded model is on the shards, and on `default` for the rows from before sharding
+    databases   = [DEFAULT_DB_ALIAS, *get_shards()] if get_shards() and is_sharded(model) else [None]
+
+    archived = 0
+    files    = set()
+
+    for using in databases:
+        for ids in _archive_batches(model, before, using, archive_dir, batch_size, chunk_size, files):
+            archived += len(ids)
+            if on_batch is not None:
+                on_batch(ArchiveResult(model=label, archived=archived, files=len(files)))
+
+    return ArchiveResult(model=label, archived=archived, files=len(files))
+
+
+def _archive_batches(model, before: datetime, using: Optional[str], archive_dir: Path,
+                     batch_size: int, chunk_size: int, files: set) -> Iterator[list]:
+    """Archive the rows of `model` on `using`, see `archive_history`, yielding the ids of every batch deleted"""
+    object_id  = model.instance_type._meta.pk.attname
+    older      = model._default_manager.using(using).filter(history_date__lt=before)
+    newer      = older.filter(Q(history_date__gt=OuterRef("history_date"))
+                              | Q(history_date=OuterRef("history_date"), history_id__gt=OuterRef("history_id")),
+                              **{object_id: OuterRef(object_id)})
+    archivable = older.filter(Exists(newer)).order_by("history_id")
+    last_id    = 0
+
+    while True:
+        batch = archivable.filter(history_id__gt=last_id)[:batch_size]
+        ids   = []
+
+        with _PartitionWriter(archive_dir / model._meta.app_label / model._meta.model_name) as writer:
+            for history_instance in batch.iterator(chunk_size=chunk_size):
+                writer.write(history_instance)
+                ids.append(history_instance.history_id)
+            files.update(writer.paths)
+
+        if not ids:
+            return
+
+        with transaction.atomic(using=using):
+            model._default_manager.using(using).filter(history_id__in=ids).delete()
+
+        last_id = ids[-1]
+        yield ids
+
+
+def read_history_archive(model,
+                         start: Optional[datetime] = None,
+                         end: Optional[datetime] = None,
+                         archive_dir: Path = None) -> Iterator:
+    """
+    Lazily rehydrate archived history rows of `model` between `start` and `end`.
+
+    Only the files of the days in the range are opened, one line at a time,
+    so an audit of a long range doesn't load it into memory. The rows are
+    unsaved instances of the history model and can be inspected like rows
+    read from the database, or saved to restore them.
+
+    Example usage:
+
+        for row in read_history_archive(Wallet, start=datetime(2024, 1, 1, tzinfo=timezone.utc)):
+            print(row.history_date, row.amount)
+
+    Args:
+        model (Model): The history model, or a model with a `history` manager.
+        start (datetime): The earliest `history_date` included. From the first archived row if None.
+        end (datetime): The `history_date` at which the range stops, exclusive. Up to the last archived row if None.
+        archive_dir (Path): Defaults to the `HISTORY_ARCHIVE_DIR` setting.
+
+    Returns:
+        Iterator: The history instances, oldest day first.
+    """
+    model       = _get_history_model(model)
+    archive_dir = get_archive_dir() if archive_dir is None else Path(archive_dir)
+    directory   = archive_dir / model._meta.app_label / model._meta.model_name
+
+    if not directory.is_dir():
+        return
+
+    for path in sorted(directory.glob("*.jsonl.gz")):
+        day = date.fromisoformat(path.name.split(".", 1)[0])
+
+        if (start is not None and day < _to_utc_date(start)) or (end is not None and day > _to_utc_date(end)):
+            continue
+
+        # an interrupted run archives its last batch again, the copies land in the same file
+        seen = set()
+
+        with gzip.open(path, "rt", encoding="utf-8") as file:
+            for line in file:
+                if not line.strip():
+                    continue
+
+                history_instance = next(serializers.deserialize("python", [json.loads(line)])).object
+                if history_instance.history_id in seen:
+                    continue
+                seen.add(history_instance.history_id)
+
+                if start is not None and history_instance.history_date < start:
+                    continue
+                if end is not None and history_instance.history_date >= end:
+                    continue
+                yield history_instance
+
+
+class _PartitionWriter:
+    """Appends history rows to the gzipped file of their day and syncs the files to disk on exit"""
+
+    def __init__(self, directory: Path):
+        self.directory = directory
+        self.files     = {}
+
+    @property
+    def paths(self) -> list[Path]:
+        return list(self.files)
+
+    def write(self, history_instance) -> None:
+        path = self.directory / f"{_to_utc_date(history_instance.history_date).isoformat()}.jsonl.gz"
+
+        if path not in self.files:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            raw              = open(path, "ab")
+            self.files[path] = (raw, gzip.GzipFile(fileobj=raw, mode="ab"))
+
+        row = serializers.serialize("python", [history_instance])[0]
+        self.files[path][1].write((json.dumps(row, default=_to_json) + "\n").encode("utf-8"))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        for raw, compressed in self.files.values():
+            compressed.close()
+            raw.flush()
+            os.fsync(raw.fileno())
+            raw.close()
+
+
+def _get_history_model(model):
+    if issubclass(model, HistoricalChanges):
+        return model
+    return model.history.model
+
+
+def _to_json(value) -> str:
+    # unlike `DjangoJSONEncoder`, keeps the microseconds of datetimes
+    if isinstance(value, (datetime, date, time)):
+        return value.isoformat()
+    return str(value)
+
+
+def _to_utc_date(value: datetime) -> date:
+    if value.tzinfo is None:
+        return value.date()
+    return value.astimezone(dt_timezone.utc).date()
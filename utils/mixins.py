@@ -0,0 +1,90 @@
+from copy import deepcopy
+
+
+class SaveChangedFieldsMixin:
+    """
+    Makes `save()` write only the columns that changed since the row was loaded.
+
+    The value of every field is remembered when an instance is loaded from the
+    database and after every save. A bare `save()` on an existing row then
+    passes `update_fields` with just the fields whose value differs, plus the
+    fields in `touch_fields_on_save` (by default every `auto_now` field, e.g.
+    `modified_on`). If nothing changed, `save()` does nothing at all: no
+    UPDATE, no `pre_save`/`post_save` signals and so no history row.
+
+    Inserts, and saves that pass `update_fields` or `force_update`
+    themselves, behave exactly as before.
+
+    Code that changes a column behind the instance's back, with a
+    `QuerySet.update()`, and copies the new value onto the instance should
+    call `mark_fields_as_saved()` for it. Otherwise the next `save()` would
+    write the value again.
+
+    Example usage:
+
+        class Wallet(SaveChangedFieldsMixin, models.Model):
+            ...
+
+        wallet = Wallet.objects.get(pk=1)
+        wallet.maximum_cards = 5
+        wallet.save()  # UPDATE ... SET maximum_cards = 5, modified_on = ... WHERE id = 1
+        wallet.save()  # no query
+    """
+
+    touch_fields_on_save = None   # defaults to the `auto_now` fields
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance.mark_fields_as_saved()
+        return instance
+
+    def refresh_from_db(self, *args, **kwargs):
+        super().refresh_from_db(*args, **kwargs)
+        fields = kwargs.get("fields") or (args[1] if len(args) > 1 else None)
+        self.mark_fields_as_saved(*(fields or ()))
+
+    def save(self, *args, **kwargs):
+        if self._state.adding or args or kwargs.get("force_insert") or kwargs.get("force_update") \
+                or kwargs.get("update_fields") is not None:
+            super().save(*args, **kwargs)
+            self.mark_fields_as_saved(*(kwargs.get("update_fields") or ()))
+            return
+
+        changed_fields = self.get_changed_fields()
+        if not changed_fields:
+            return
+
+        kwargs["update_fields"] = changed_fields + [name for name in self._get_touch_fields() if name not in changed_fields]
+        super().save(*args, **kwargs)
+        self.mark_fields_as_saved(*kwargs["update_fields"])
+
+    def get_changed_fields(self) -> list[str]:
+        """Returns the names of the loaded fields whose value differs from the saved one"""
+        saved   = self.__dict__.get("_saved_field_values", {})
+        changed = []
+
+        for field in self._meta.concrete_fields:
+            if field.primary_key or field.attname not in self.__dict__:
+                continue
+            if field.attname not in saved or saved[field.attname] != self.__dict__[field.attname]:
+                changed.append(field.name)
+        return changed
+
+    def mark_fields_as_saved(self, *field_names: str) -> None:
+        """
+        Remember the current value of `field_names`, or of every loaded field
+        if none are given, as the value stored in the database.
+        """
+        saved  = self.__dict__.setdefault("_saved_field_values", {})
+        fields = self._meta.concrete_fields if not field_names else [self._meta.get_field(name) for name in field_names]
+
+        for field in fields:
+            if field.attname in self.__dict__:
+                value = self.__dict__[field.attname]
+                saved[field.attname] = deepcopy(value) if isinstance(value, (dict, list)) else value
+
+    def _get_touch_fields(self) -> list[str]:
+        if self.touch_fields_on_save is not None:
+            return list(self.touch_fields_on_save)
+        return [field.name for field in self._meta.concrete_fields if getattr(field, "auto_now", False)]
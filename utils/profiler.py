@@ -0,0 +1,285 @@
+"""
+On-demand profiling of single requests, for staff users.
+
+A staff user asks for a request to be profiled with the `X-Profile` header
+or the `_profile` query parameter:
+
+    curl -H "X-Profile: 1" ...            # cProfile, written as a pstats file
+    /profile/update/?_profile=stacks      # stack sampling, written as collapsed stacks
+
+`REQUEST_PROFILER_SAMPLE_RATE` of the requests asking for it are profiled.
+`ProfilerMiddleware` writes every profile to `REQUEST_PROFILER_DIR` as:
+
+    - `<name>.prof`, a pstats file, e.g. for `python -m pstats` or snakeviz,
+      or `<name>.collapsed`, one `frame;frame;frame count` line per stack,
+      the input of flamegraph.pl and speedscope,
+    - `<name>.json`, the URL name, the latency and the queries and time
+      spent in SQL of the request.
+
+The response carries the name in the `X-Profile-Id` header. `python manage.py
+summarise_profiles` lists the hottest functions across the profiles.
+"""
+
+import cProfile
+import json
+import pstats
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from functools import lru_cache
+from pathlib import Path
+from secrets import token_hex
+from typing import NamedTuple, Optional
+
+from django.conf import settings
+from django.utils import timezone
+
+from .query_budget import QueryRecorder
+
+
+PROFILE_HEADER    = "X-Profile"
+PROFILE_PARAM     = "_profile"
+PROFILE_ID_HEADER = "X-Profile-Id"
+
+CPROFILE = "cprofile"
+STACKS   = "stacks"
+MODES    = {"1": CPROFILE, "true": CPROFILE, CPROFILE: CPROFILE, STACKS: STACKS, "sampling": STACKS}
+
+UNSAFE_FILE_NAME_CHARACTERS = re.compile(r"[^\w.-]+")
+
+
+class FunctionStats(NamedTuple):
+    function: str
+    calls: Optional[int]   # None for sampled profiles, which don't count calls
+    own_seconds: float
+    total_seconds: float
+
+
+class ProfileSummary(NamedTuple):
+    profiles: int
+    requests: dict          # url name -> {"count", "latency_ms", "sql_ms", "queries"}, the averages of its profiles
+    functions: list[FunctionStats]
+
+
+def get_profile_dir() -> Path:
+    return Path(getattr(settings, "REQUEST_PROFILER_DIR", None) or Path(settings.BASE_DIR) / "profiles")
+
+
+class StackSampler:
+    """
+    Samples the stack of a thread every `interval` seconds from a background thread.
+
+    Pure Python, so it works without any extension, at the price of a GIL
+    switch per sample: keep the interval around a millisecond or more.
+
+    Example usage:
+
+        sampler = StackSampler(threading.get_ident(), interval=0.001)
+        with sampler:
+            view(request)
+        sampler.counts   # Counter of "outer;inner;innermost" -> samples
+    """
+
+    def __init__(self, thread_id: int, interval: float = 0.001, root=None):
+        self.thread_id = thread_id
+        self.interval  = interval
+        self.root      = root        # the frame the stacks are collapsed up to, excluded
+        self.counts    = Counter()
+        self._stop     = threading.Event()
+        self._thread   = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+
+    def __enter__(self) -> "StackSampler":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            # once stopping, the thread is only waiting for this one
+            if frame is not None and not self._stop.is_set():
+                self.counts[self._collapse(frame)] += 1
+
+    def _collapse(self, frame) -> str:
+        names = []
+        while frame is not None and frame is not self.root:
+            code = frame.f_code
+            names.append(f"{code.co_name} ({_short_path(code.co_filename)}:{code.co_firstlineno})")
+            frame = frame.f_back
+        return ";".join(reversed(names))
+
+
+class ProfilerMiddleware:
+    """
+    Profiles the requests of staff users asking for it, see the module docstring.
+
+    Place it after `AuthenticationMiddleware`, it needs `request.user`.
+    Everything after it, including the view, is profiled.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        mode = self._get_mode(request)
+        if mode is None:
+            return self.get_response(request)
+
+        start = time.perf_counter()
+        with QueryRecorder() as recorder:
+            if mode == CPROFILE:
+                profiler = cProfile.Profile()
+                response = profiler.runcall(self.get_response, request)
+            else:
+                sampler  = StackSampler(threading.get_ident(),
+                                        interval=getattr(settings, "REQUEST_PROFILER_INTERVAL", 0.001),
+                                        root=sys._getframe(),
+                                        )
+                with sampler:
+                    response = self.get_response(request)
+        latency_ms = (time.perf_counter() - start) * 1000
+
+        match    = request.resolver_match
+        url_name = match.view_name if match is not None else None
+        stats    = recorder.get_stats()
+        name     = self._get_file_name(url_name)
+        metadata = {"time": timezone.now().isoformat(),
+                    "method": request.method,
+                    "path": request.path,
+                    "url_name": url_name,
+                    "status": response.status_code,
+                    "mode": mode,
+                    "latency_ms": round(latency_ms, 3),
+                    "queries": stats.queries,
+                    "sql_ms": stats.sql_ms,
+                    }
+
+        directory = get_profile_dir()
+        directory.mkdir(parents=True, exist_ok=True)
+        if mode == CPROFILE:
+            profiler.dump_stats(directory / f"{name}.prof")
+        else:
+            lines = (f"{stack} {count}\n" for stack, count in sampler.counts.most_common())
+            (directory / f"{name}.collapsed").write_text("".join(lines))
+        (directory / f"{name}.json").write_text(json.dumps(metadata))
+
+        response[PROFILE_ID_HEADER] = name
+        return response
+
+    def _get_mode(self, request) -> Optional[str]:
+        value = request.headers.get(PROFILE_HEADER) or request.GET.get(PROFILE_PARAM)
+
+        if PROFILE_PARAM in request.GET:
+            # hidden from the view, e.g. the admin changelists reject a query parameter they don't know
+            request.GET = request.GET.copy()
+            del request.GET[PROFILE_PARAM]
+
+        if not value or not getattr(settings, "REQUEST_PROFILER_ENABLED", True):
+            return None
+
+        user = getattr(request, "user", None)
+        if user is None or not user.is_staff:
+            return None
+        if random.random() >= getattr(settings, "REQUEST_PROFILER_SAMPLE_RATE", 1.0):
+            return None
+        return MODES.get(value.lower())
+
+    def _get_file_name(self, url_name: Optional[str]) -> str:
+        label = UNSAFE_FILE_NAME_CHARACTERS.sub("_", url_name or "unresolved")
+        return f"{timezone.now():%Y%m%dT%H%M%S}-{label}-{token_hex(4)}"
+
+
+def summarise_profiles(directory: Path = None, url_name: str = None, top: int = 20, sort: str = "own") -> ProfileSummary:
+    """
+    Add up the profiles in `directory` and return the hottest functions.
+
+    The pstats files are merged with `pstats.Stats`. For the collapsed
+    stacks, a function's own time is its share of the samples in which it
+    is the innermost frame, and its total time its share of the samples it
+    is anywhere in, scaled by the latency of each request.
+
+    Example usage:
+
+        summary = summarise_profiles(url_name="home", top=10)
+        for function in summary.functions:
+            print(function.function, function.own_seconds)
+
+    Args:
+        directory (Path): Defaults to `REQUEST_PROFILER_DIR`.
+        url_name (str): Only the profiles of this URL name.
+        top (int): The number of functions returned.
+        sort (str): "own" or "total" time.
+
+    Returns:
+        ProfileSummary: The profiles read, the averages per URL name and the functions.
+    """
+    directory    = Path(directory or get_profile_dir())
+    requests     = {}
+    own          = Counter()
+    total        = Counter()
+    calls        = Counter()
+    pstats_files = []
+    count        = 0
+
+    for metadata_file in sorted(directory.glob("*.json")):
+        metadata = json.loads(metadata_file.read_text())
+        if url_name is not None and metadata["url_name"] != url_name:
+            continue
+
+        base = metadata_file.with_suffix("")
+        if base.with_suffix(".prof").exists():
+            pstats_files.append(str(base.with_suffix(".prof")))
+        elif base.with_suffix(".collapsed").exists():
+            _add_collapsed(base.with_suffix(".collapsed"), metadata["latency_ms"] / 1000, own, total)
+        else:
+            continue
+
+        count += 1
+        averages = requests.setdefault(metadata["url_name"], {"count": 0, "latency_ms": 0, "sql_ms": 0, "queries": 0})
+        averages["count"] += 1
+        for key in ("latency_ms", "sql_ms", "queries"):
+            averages[key] += (metadata[key] - averages[key]) / averages["count"]
+
+    if pstats_files:
+        stats = pstats.Stats(*pstats_files)
+        for (filename, line, function), (_, total_calls, own_time, total_time, _) in stats.stats.items():
+            key         = f"{function} ({_short_path(filename)}:{line})"
+            own[key]   += own_time
+            total[key] += total_time
+            calls[key] += total_calls
+
+    ranking   = own if sort == "own" else total
+    functions = [FunctionStats(function, calls.get(function), own[function], total[function])
+                 for function, _ in ranking.most_common(top)
+                 ]
+    return ProfileSummary(profiles=count, requests=requests, functions=functions)
+
+
+def _add_collapsed(path: Path, seconds: float, own: Counter, total: Counter) -> None:
+    stacks  = []
+    samples = 0
+    for line in path.read_text().splitlines():
+        stack, _, count = line.rpartition(" ")
+        stacks.append((stack.split(";"), int(count)))
+        samples += int(count)
+
+    for frames, count in stacks:
+        share = seconds * count / samples
+        own[frames[-1]] += share
+        for frame in set(frames):
+            total[frame] += share
+
+
+@lru_cache(maxsize=4096)
+def _short_path(filename: str) -> str:
+    """The path of `filename` from the project or the site-packages directory it is in"""
+    for root in (str(settings.BASE_DIR), *[path for path in sys.path if path.endswith("site-packages")]):
+        if filename.startswith(root):
+            return filename[len(root):].lstrip("/\\")
+    return filename
@@ -0,0 +1,234 @@
+"""
+Query and latency budgets per request.
+
+`QueryBudgetMiddleware` records, for every request, the number of queries,
+the time spent in SQL, the queries run more than once and the time the
+view took. A request going over the budget of its URL name is logged to
+the `query_budget` logger as one JSON object per line, ready to be
+aggregated, e.g. with `jq`:
+
+    jq -s 'group_by(.url_name) | map({url_name: .[0].url_name, requests: length})' query_budget.jsonl
+
+Budgets are set per URL name in `QUERY_BUDGETS`, on top of its `default`
+entry. An admin page is named like `admin:account_wallet_changelist`.
+
+    QUERY_BUDGETS = {
+        "default": {"queries": 30, "duplicate_queries": 5, "sql_ms": 200, "latency_ms": 500},
+        "home":    {"queries": 10},
+    }
+
+A query is a duplicate when a query with the same fingerprint, i.e. the
+same SQL with its literals and parameters left out, already ran in the
+request. A few duplicates growing with the number of rows on the page is
+the N + 1 query problem. `assert_query_budget` checks the same budgets in
+a test.
+"""
+
+import json
+import logging
+import re
+import time
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+from hashlib import blake2b
+from typing import NamedTuple, Optional
+
+from django.conf import settings
+from django.db import connections
+from django.utils import timezone
+
+
+logger = logging.getLogger("query_budget")
+
+BUDGET_NAMES = ("queries", "duplicate_queries", "sql_ms", "latency_ms")
+
+# Duplicated queries listed in a log record or an assertion error
+REPORTED_DUPLICATES = 5
+
+LITERAL      = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+PLACEHOLDERS = re.compile(r"\((?:\s*(?:%s|\?)\s*,)+\s*(?:%s|\?)\s*\)")
+WHITESPACE   = re.compile(r"\s+")
+
+
+class DuplicateQuery(NamedTuple):
+    fingerprint: str
+    count: int
+    sql: str
+
+
+class QueryStats(NamedTuple):
+    queries: int
+    sql_ms: float
+    duplicate_queries: int
+    duplicates: list[DuplicateQuery]
+
+
+def fingerprint_sql(sql: str) -> tuple[str, str]:
+    """
+    Returns the fingerprint of `sql` and the normalised SQL it was made from.
+
+    The literals are replaced with `?` and a list of placeholders, e.g. of
+    an `IN` lookup, with `(...)`, so the same query with other values has
+    the same fingerprint.
+
+    Example usage:
+
+        fingerprint_sql("SELECT * FROM account_wallet WHERE id IN (%s, %s) LIMIT 21")
+        # ("3f1c...", "SELECT * FROM account_wallet WHERE id IN (...) LIMIT ?")
+    """
+    normalised = WHITESPACE.sub(" ", LITERAL.sub("?", sql)).strip()
+    normalised = PLACEHOLDERS.sub("(...)", normalised)
+    return blake2b(normalised.encode(), digest_size=6).hexdigest(), normalised
+
+
+class QueryRecorder:
+    """
+    Records the queries run on every database, in the current thread, while it's active.
+
+    Uses `connection.execute_wrapper`, so it works whatever `DEBUG` is, and
+    keeps the time of each query and how often each SQL statement ran.
+
+    Example usage:
+
+        with QueryRecorder() as recorder:
+            response = view(request)
+        stats = recorder.get_stats()
+    """
+
+    def __init__(self):
+        self.timings   = []          # seconds per query
+        self.counts    = Counter()   # SQL -> number of times run, fingerprinted once the block is over
+        self._wrappers = None
+
+    def __enter__(self) -> "QueryRecorder":
+        self._wrappers = ExitStack()
+        for connection in connections.all():
+            self._wrappers.enter_context(connection.execute_wrapper(self))
+        return self
+
+    def __exit__(self, *exc_info):
+        self._wrappers.close()
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.timings.append(time.perf_counter() - start)
+            self.counts[sql] += 1
+
+    def get_stats(self) -> QueryStats:
+        counts     = Counter()
+        normalised = {}
+        for sql, count in self.counts.items():
+            fingerprint, normalised[fingerprint] = fingerprint_sql(sql)
+            counts[fingerprint] += count
+
+        duplicates = [DuplicateQuery(fingerprint, count, normalised[fingerprint])
+                      for fingerprint, count in counts.most_common()
+                      if count > 1
+                      ]
+        return QueryStats(queries=len(self.timings),
+                          sql_ms=round(sum(self.timings) * 1000, 3),
+                          duplicate_queries=sum(duplicate.count - 1 for duplicate in duplicates),
+                          duplicates=duplicates,
+                          )
+
+
+def get_query_budget(url_name: Optional[str]) -> dict:
+    """Returns the budget of `url_name`, its entry in `QUERY_BUDGETS` over the `default` one"""
+    budgets = getattr(settings, "QUERY_BUDGETS", None) or {}
+    return {**budgets.get("default", {}), **budgets.get(url_name, {})}
+
+
+def get_exceeded_budgets(budget: dict, stats: QueryStats, latency_ms: float = None) -> list[str]:
+    """Returns the names of the limits of `budget` that `stats` and `latency_ms` go over"""
+    values = {**stats._asdict(), "latency_ms": latency_ms}
+    return [name for name in BUDGET_NAMES
+            if budget.get(name) is not None and values[name] is not None and values[name] > budget[name]
+            ]
+
+
+def format_duplicates(duplicates: list[DuplicateQuery]) -> list[dict]:
+    return [{"fingerprint": duplicate.fingerprint, "count": duplicate.count, "sql": duplicate.sql[:500]}
+            for duplicate in duplicates[:REPORTED_DUPLICATES]
+            ]
+
+
+class QueryBudgetMiddleware:
+    """
+    Logs the requests going over the query and latency budget of their URL name.
+
+    Place it near the top of `MIDDLEWARE`, so the queries of the session and
+    authentication middleware are counted too. With `QUERY_BUDGET_LOG_ALL`
+    every request is logged, at INFO rather than WARNING.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not getattr(settings, "QUERY_BUDGET_ENABLED", True):
+            return self.get_response(request)
+
+        start = time.perf_counter()
+        with QueryRecorder() as recorder:
+            response = self.get_response(request)
+        latency_ms = round((time.perf_counter() - start) * 1000, 3)
+
+        match    = request.resolver_match
+        url_name = match.view_name if match is not None else None
+        budget   = get_query_budget(url_name)
+        stats    = recorder.get_stats()
+        exceeded = get_exceeded_budgets(budget, stats, latency_ms)
+
+        if exceeded or getattr(settings, "QUERY_BUDGET_LOG_ALL", False):
+            record = {"time": timezone.now().isoformat(),
+                      "method": request.method,
+                      "path": request.path,
+                      "url_name": url_name,
+                      "status": response.status_code,
+                      "latency_ms": latency_ms,
+                      "queries": stats.queries,
+                      "sql_ms": stats.sql_ms,
+                      "duplicate_queries": stats.duplicate_queries,
+                      "duplicates": format_duplicates(stats.duplicates),
+                      "budget": budget,
+                      "exceeded": exceeded,
+                      }
+            logger.log(logging.WARNING if exceeded else logging.INFO, json.dumps(record))
+        return response
+
+
+@contextmanager
+def assert_query_budget(url_name: str = None, **budget):
+    """
+    Fail the test if the block goes over a query budget.
+
+    The budget is the one configured for `url_name` if given, with the
+    limits passed as keywords over it. Latency isn't checked, tests are
+    too noisy for it.
+
+    Example usage:
+
+        with assert_query_budget(queries=12, duplicate_queries=0):
+            self.client.get(reverse("admin:account_wallet_changelist"))
+
+        with assert_query_budget("home"):
+            self.client.get(reverse("home"))
+
+    Raises:
+        AssertionError: Listing the limits gone over and the duplicated queries.
+    """
+    budget = {**(get_query_budget(url_name) if url_name else {}), **budget}
+    budget.pop("latency_ms", None)
+
+    with QueryRecorder() as recorder:
+        yield recorder
+
+    stats    = recorder.get_stats()
+    exceeded = get_exceeded_budgets(budget, stats)
+    if exceeded:
+        lines = [f"{name}: {getattr(stats, name)} > {budget[name]}" for name in exceeded]
+        lines += [f"{duplicate.count}x [{duplicate.fingerprint}] {duplicate.sql}" for duplicate in stats.duplicates[:REPORTED_DUPLICATES]]
+        raise AssertionError("Query budget exceeded:\n    " + "\n    ".join(lines))
@@ -0,0 +1,116 @@
+import re
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import DEFAULT_DB_ALIAS, transaction
+
+
+# a pragma's value can't be passed as a query parameter, so only plain words and numbers are let through
+PRAGMA_NAME  = re.compile(r"^[a-z_]+$")
+PRAGMA_VALUE = re.compile(r"^-?\w+$")
+
+
+def apply_sqlite_pragmas(sender, connection, **kwargs):
+    """
+    `connection_created` handler applying `SQLITE_PRAGMAS` to every new SQLite connection.
+
+    The pragmas are per connection, so they cost a few statements each time a
+    connection is opened. Keep `CONN_MAX_AGE` above 0 so a connection, and
+    its page cache, lives for many requests. A database with its own
+    `timeout` in `OPTIONS` keeps it instead of the `busy_timeout` pragma.
+
+    Example settings:
+
+        SQLITE_PRAGMAS = {
+            "journal_mode": "WAL",
+            "synchronous": "NORMAL",
+            "busy_timeout": 5000,
+        }
+    """
+    if connection.vendor != "sqlite":
+        return
+
+    pragmas = getattr(settings, "SQLITE_PRAGMAS", None) or {}
+    with connection.cursor() as cursor:
+        for name, value in pragmas.items():
+            if name == "busy_timeout" and "timeout" in connection.settings_dict["OPTIONS"]:
+                continue
+            if not PRAGMA_NAME.match(name) or not PRAGMA_VALUE.match(str(value)):
+                raise ImproperlyConfigured(f"SQLITE_PRAGMAS has an invalid pragma: {name} = {value!r}")
+            cursor.execute(f"PRAGMA {name} = {value}")
+
+
+class ImmediateAtomic(transaction.Atomic):
+    """
+    `transaction.atomic` whose outermost block starts with `BEGIN IMMEDIATE` on SQLite.
+
+    A plain `BEGIN` only takes the write lock at the first write. A
+    transaction that reads before it writes, e.g. to check a balance, can
+    then find another writer got there first. SQLite can't wait for that
+    writer without risking a deadlock, so it fails straight away with
+    "database is locked". `BEGIN IMMEDIATE` takes the write lock up front and
+    waits for it for up to `busy_timeout`, so the transaction either gets the
+    lock or times out before doing any work.
+
+    A nested block, another database, or `SQLITE_IMMEDIATE_TRANSACTIONS =
+    False` behaves exactly like `transaction.atomic`.
+    """
+
+    def __enter__(self):
+        connection = transaction.get_connection(self.using)
+
+        if (connection.vendor != "sqlite" or connection.in_atomic_block
+                or not getattr(settings, "SQLITE_IMMEDIATE_TRANSACTIONS", True)):
+            return super().__enter__()
+
+        # the transaction mode is read from the settings when the connection is opened, so open it first
+        connection.ensure_connection()
+        previous                    = connection.transaction_mode
+        connection.transaction_mode = "IMMEDIATE"
+        try:
+            return super().__enter__()
+        finally:
+            connection.transaction_mode = previous
+
+
+def immediate_atomic(using=None, savepoint: bool = True, durable: bool = False):
+    """
+    Like `transaction.atomic`, for a transaction that writes, see `ImmediateAtomic`.
+
+    Example usage:
+
+        with immediate_atomic():
+            wallet = Wallet.objects.get(pk=wallet_id)
+            if wallet.amount >= amount:
+                ...
+
+        @immediate_atomic
+        def pay(...):
+            ...
+    """
+    if callable(using):
+        return ImmediateAtomic(DEFAULT_DB_ALIAS, savepoint, durable)(using)
+    return ImmediateAtomic(using, savepoint, durable)
+
+
+@contextmanager
+def immediate_atomic_on(*aliases):
+    """
+    One `immediate_atomic` block per database, for a change written to more than one.
+
+    The blocks are opened in the order given, once per alias, and committed
+    in the reverse order, so put the database whose commit must come last
+    first. Keep the same order everywhere to keep two transactions from
+    waiting on each other's write locks. Each database still commits on its
+    own: a failure between two commits leaves the ones already made.
+
+    Example usage:
+
+        with immediate_atomic_on(DEFAULT_DB_ALIAS, shard_for_user(user)):
+            ...
+    """
+    with ExitStack() as stack:
+        for alias in dict.fromkeys(aliases):
+            stack.enter_context(immediate_atomic(using=alias))
+        yield